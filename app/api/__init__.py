@@ -1,5 +1,6 @@
 # app/api/v1/__init__.py
 
 from .webhook import webhook_router
+from .wallet import wallet_router
 
-__all__ = ["webhook_router"]
\ No newline at end of file
+__all__ = ["webhook_router", "wallet_router"]
\ No newline at end of file
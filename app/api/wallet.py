@@ -0,0 +1,186 @@
+# app/api/wallet.py
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+import orjson
+from fastapi import APIRouter, HTTPException, WebSocket, status
+
+from ..utils.setup import runtime
+from ..utils.woodlogs import get_logger
+from ..utils.deps import verify_id_token_uid
+from ..src.crud import FIREBASE_AUTH_SIGNATURE, get_token_balance, on_balance_change
+
+logger = get_logger(__name__)
+
+wallet_router = APIRouter()
+
+class WalletHub:
+    """
+    Registry of wallet WebSockets by user, pushing token balance updates.
+
+    `publish` only records the user's latest balance and wakes a single
+    dispatcher task, so balance writes never wait on sockets. Updates for
+    users without open sockets are dropped at once, and several updates of
+    one user between two dispatches are sent as one. A socket that does
+    not accept a push within `send_timeout` is closed.
+
+    Connections cost the registry entry and the endpoint coroutine only,
+    there is no task or queue per socket.
+
+    Args:
+        load_balance: Coroutine function reading a user's balance, for updates published without one.
+        max_connections: Open sockets accepted before new ones are refused.
+        send_timeout: Seconds one push to one socket may take.
+    """
+
+    def __init__(
+        self,
+        load_balance: Callable[[str], Awaitable[float]],
+        max_connections: int = 50_000,
+        send_timeout: float = 5.0,
+    ):
+        self.load_balance = load_balance
+        self.max_connections = max_connections
+        self.send_timeout = send_timeout
+
+        self._sockets: dict[str, list[WebSocket]] = {}
+        self._pending: dict[str, float | None] = {}
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+        self.connections = 0
+        self.pushed = 0
+        self.send_failures = 0
+
+    @property
+    def full(self) -> bool:
+        return self.connections >= self.max_connections
+
+    # Registry
+    def register(self, user_id: str, websocket: WebSocket):
+        self._sockets.setdefault(user_id, []).append(websocket)
+        self.connections += 1
+        self.start()
+
+    def unregister(self, user_id: str, websocket: WebSocket):
+        sockets = self._sockets.get(user_id)
+        if sockets and websocket in sockets:
+            sockets.remove(websocket)
+            self.connections -= 1
+            if not sockets:
+                del self._sockets[user_id]
+
+    # Fan-out
+    def publish(self, user_id: str, balance: float | None = None):
+        """Queue a balance update for the user's sockets without waiting. None reads the balance before sending."""
+
+        if user_id not in self._sockets or self._wakeup is None:
+            return
+        self._pending[user_id] = balance
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._dispatch(), name="wallet-hub")
+
+    async def _dispatch(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            pending, self._pending = self._pending, {}
+            await asyncio.gather(*(self._push(user_id, balance) for user_id, balance in pending.items()))
+
+    async def _push(self, user_id: str, balance: float | None):
+        if user_id not in self._sockets:
+            return
+        try:
+            if balance is None:
+                balance = await self.load_balance(user_id)
+        except Exception as e:
+            logger.warning("Could not read token balance of %s for wallet sockets: %s", user_id, e)
+            return
+
+        # encoded once for every socket of the user
+        message = orjson.dumps({"type": "wallet", "tokenBalance": balance}).decode()
+        await asyncio.gather(*(self._send(user_id, websocket, message) for websocket in list(self._sockets.get(user_id, ()))))
+
+    async def _send(self, user_id: str, websocket: WebSocket, message: str):
+        try:
+            await asyncio.wait_for(websocket.send_text(message), timeout=self.send_timeout)
+            self.pushed += 1
+        except Exception:
+            # slow or gone, the client reconnects and receives the current balance
+            self.send_failures += 1
+            self.unregister(user_id, websocket)
+            try:
+                await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+            except Exception:
+                pass
+
+    async def close(self):
+        """Stop dispatching and close every socket, e.g. on shutdown."""
+
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        sockets = [(user_id, websocket) for user_id, open_sockets in self._sockets.items() for websocket in open_sockets]
+        self._sockets.clear()
+        self.connections = 0
+        await asyncio.gather(
+            *(websocket.close(code=status.WS_1001_GOING_AWAY) for _, websocket in sockets),
+            return_exceptions=True,
+        )
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "connections": self.connections,
+            "users": len(self._sockets),
+            "pushed": self.pushed,
+            "send_failures": self.send_failures,
+        }
+
+wallet_hub = WalletHub(
+    get_token_balance,
+    max_connections=runtime.wallet_max_connections,
+    send_timeout=runtime.wallet_send_timeout,
+)
+# every committed balance write is pushed to the user's open sockets
+on_balance_change(wallet_hub.publish)
+
+@wallet_router.websocket("/ws/wallet")
+async def wallet_socket(websocket: WebSocket):
+    """Push the user's tokenBalance on connect and after every balance change.
+
+    Authenticated with a Firebase ID token in the x-firebase-user-auth
+    header or, for browsers, the `token` query parameter. Raw uids are
+    refused. Balances are keyed by uid, so no profile is looked up, created
+    or migrated. Messages from the client are ignored.
+    """
+
+    id_token = websocket.headers.get(FIREBASE_AUTH_SIGNATURE) or websocket.query_params.get("token")
+    if not id_token:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=f"Missing {FIREBASE_AUTH_SIGNATURE} header or token parameter.")
+        return
+
+    try:
+        user_id = await verify_id_token_uid(id_token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="A valid Firebase ID token is required.")
+        return
+
+    if wallet_hub.full:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Too many wallet connections.")
+        return
+
+    await websocket.accept()
+    wallet_hub.register(user_id, websocket)
+    try:
+        # current balance first, later pushes follow balance writes
+        wallet_hub.publish(user_id)
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        wallet_hub.unregister(user_id, websocket)
@@ -1,26 +1,314 @@
 # app/api/webhook.py
 
-import stripe
+import json
+import logging
+from typing import Any
+from dataclasses import dataclass
 from fastapi import (
     APIRouter,
     HTTPException,
 )
-from ..utils.setup import platform
+from ..utils.setup import platform, runtime
 from ..utils.woodlogs import get_logger
+from ..utils.workers import WorkerPool
+from ..utils.metrics import Collected, label_request, register, set_outcome, track
+from ..utils.tracing import SpanContext, current_context, root_span, span
+from ..src.wal import WriteAheadLog
+from ..src.events import StripeEvent
 from ..src.schema import StripeFirebaseRequest
-from ..utils.deps import StripeFirebaseAuthorize
+from ..utils.deps import StripeFirebaseAuthorize, requires_identity, verify_member_profile
 from ..src.crud import (
     CHECKOUT_LINKS,
-    store_transaction_record,
-    update_user_token_balance
+    commit_checkout,
+    event_ledger,
 )
 
-stripe.api_key = platform.account.api_key
-
-logger = get_logger(__file__)
+logger = get_logger(__name__)
 
 webhook_router = APIRouter()
 
+# checkout handlers credit a Firebase user, other event types are acknowledged without lookups
+requires_identity(*CHECKOUT_LINKS)
+
+@dataclass
+class WebhookJob:
+    """A verified checkout event and everything needed to apply it."""
+    service_app_id: str
+    product_id: str
+    product: Any
+    event: Any
+    user_id: str | None = None
+    # set instead of user_id when identity resolution was deferred to a worker
+    auth_token: str | None = None
+    # sequence number in the write-ahead log, settled once processing finishes
+    wal_seq: int | None = None
+    # trace of the request that received the event, continued by background workers
+    trace: SpanContext | None = None
+
+# Durable log of verified checkout events, replayed until they are processed
+event_log = WriteAheadLog(
+    runtime.wal_path,
+    segment_max_bytes=runtime.wal_segment_bytes,
+    commit_interval=runtime.wal_commit_interval,
+    max_attempts=runtime.wal_max_attempts,
+) if runtime.wal_enabled else None
+
+def logged_event_data(inputs: StripeFirebaseRequest) -> dict:
+    """Return the event as plain JSON data for the write-ahead log."""
+
+    if isinstance(inputs.event, StripeEvent):
+        # already decoded by the fast path
+        return inputs.event.raw
+    return json.loads(inputs.payload) if inputs.payload else dict(inputs.event)
+
+async def settle_logged_event(job: WebhookJob, done: bool):
+    """Mark the job's write-ahead log entry done, or leave it to the replayer."""
+
+    if event_log is None or job.wal_seq is None:
+        return
+    if done:
+        await event_log.mark_done(job.wal_seq)
+    else:
+        event_log.release(job.wal_seq)
+
+async def process_checkout_event(job: WebhookJob) -> dict:
+    """Store the transaction and credit tokens for a verified checkout event.
+
+    Errors are logged and reported as {"processed": False} rather than raised,
+    so the same function serves the request path and the background workers.
+    """
+
+    # background jobs have no request, their stage timings, outcome and spans are recorded here
+    with track(job.service_app_id, job.event["type"]), root_span(
+        "process_checkout_event",
+        parent=job.trace,
+        kind="internal",
+        **{"stripe.event_id": job.event["id"], "stripe.event_type": job.event["type"]},
+    ):
+        return await _apply_checkout_event(job)
+
+async def _apply_checkout_event(job: WebhookJob) -> dict:
+    event_type = job.event["type"]
+    event_id = job.event["id"]
+    product = job.product
+    # every product endpoint receives the event once, so dedupe per endpoint
+    ledger_key = event_ledger.key(event_id, job.service_app_id, job.product_id)
+
+    # Stripe retries deliver the same event id, acknowledge them without side effects
+    if await event_ledger.begin(ledger_key):
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Duplicate event acknowledged",
+                extra={
+                    "event_id": event_id,
+                    "event_type": event_type,
+                    "user_id": job.user_id,
+                    **event_ledger.stats(),
+                }
+            )
+        await settle_logged_event(job, done=True)
+        set_outcome("duplicate")
+        return {"received": True, "duplicate": True}
+
+    try:
+        if job.user_id is None:
+            _, profile = await verify_member_profile(job.auth_token)
+            job.user_id = str(profile.id)
+            if event_log is not None and job.wal_seq is not None:
+                # replays must not depend on an ID token that expires within the hour
+                await event_log.record_user(job.wal_seq, job.user_id)
+
+        session = job.event["data"]["object"]
+        session_id = session.get("id")
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Processing checkout event",
+                extra={
+                    "event_id": event_id,
+                    "event_type": event_type,
+                    "session_id": session_id,
+                    "user_id": job.user_id,
+                    "product_type": product.type,
+                }
+            )
+
+        # transaction record, token credit and ledger entry land in one atomic update,
+        # unconditionally, see EventLedger for what that means across processes
+        ledger_update = {
+            event_ledger.record_path(ledger_key): {
+                "type": event_type,
+                "user_id": job.user_id,
+                "processedAt": {".sv": "timestamp"},
+            }
+        }
+
+        if product.type == "tokens":
+            with span("credit_tokens", **{"user.id": job.user_id, "tokens": product.add_count, "product.id": job.product_id}):
+                await commit_checkout(session, job.user_id, product.add_count, extra_updates=ledger_update)
+
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "Successfully credited tokens",
+                    extra={
+                        "event_id": event_id,
+                        "user_id": job.user_id,
+                        "tokens_added": product.add_count,
+                        "product_id": job.product_id,
+                    }
+                )
+
+        else:
+            await commit_checkout(session, job.user_id, extra_updates=ledger_update)
+
+            # Log unsupported product type but return 200 (don't fail the webhook)
+            logger.warning(
+                "Unsupported product type - event acknowledged but not processed",
+                extra={
+                    "event_id": event_id,
+                    "product_type": product.type,
+                    "product_id": job.product_id,
+                    "service_app_id": job.service_app_id,
+                }
+            )
+
+        # the ledger record was part of the checkout update
+        await event_ledger.complete(ledger_key, persist=False)
+
+    except Exception as e:
+        event_ledger.release(ledger_key)
+        await settle_logged_event(job, done=False)
+        # Log unexpected errors but still return 200 to prevent retries
+        logger.exception(
+            "Error processing webhook event",
+            extra={
+                "event_id": event_id,
+                "event_type": event_type,
+                "user_id": job.user_id,
+                "error": str(e),
+            }
+        )
+        # Return 200 to acknowledge receipt even if processing failed
+        # The write-ahead log replayer retries it when enabled
+        set_outcome("unprocessed")
+        return {"received": True, "processed": False}
+
+    await settle_logged_event(job, done=True)
+    set_outcome("processed")
+    return {"received": True}
+
+async def replay_logged_event(data: dict) -> bool:
+    """Re-run a checkout event from the write-ahead log. Returns True once it needs no further retries."""
+
+    service_app = platform.apps.get(data["service_app_id"], None)
+    product = service_app.get(data["product_id"], None) if service_app else None
+
+    if not product:
+        logger.error(
+            "Dropping logged event for removed product configuration",
+            extra={
+                "event_id": data["event"]["id"],
+                "service_app_id": data["service_app_id"],
+                "product_id": data["product_id"],
+            }
+        )
+        return True
+
+    result = await process_checkout_event(WebhookJob(
+        service_app_id=data["service_app_id"],
+        product_id=data["product_id"],
+        product=product,
+        event=data["event"],
+        user_id=data["user_id"],
+        auth_token=data["auth_token"],
+    ))
+    return result.get("processed", True)
+
+# Acknowledge-then-process: verified checkout events drained in the background
+event_queue = WorkerPool(
+    process_checkout_event,
+    workers=runtime.webhook_workers,
+    maxsize=runtime.webhook_queue_size,
+    put_timeout=runtime.webhook_enqueue_timeout,
+    name="webhook",
+)
+# backlog of the queue, served at /metrics
+register(Collected(
+    "webhook_queue_depth",
+    "Verified webhook jobs waiting for a background worker.",
+    (),
+    lambda: [((), event_queue.depth)],
+))
+register(Collected(
+    "webhook_queue_oldest_job_lag_seconds",
+    "Seconds the oldest queued webhook job has waited for a worker.",
+    (),
+    lambda: [((), event_queue.oldest_lag)],
+))
+
+async def dispatch_checkout_event(service_app_id: str, product_id: str, product: Any, inputs: StripeFirebaseRequest) -> dict:
+    """Validate the product of a checkout event, log it and process or queue it."""
+
+    event_id = inputs.event["id"]
+    user_id = inputs.user.id if inputs.user else None
+
+    if product.type == "tokens" and getattr(product, "add_count", None) is None:
+        # 400 Bad Request - product misconfiguration
+        logger.error(
+            "Product configuration error: missing add_count",
+            extra={
+                "event_id": event_id,
+                "service_app_id": service_app_id,
+                "product_id": product_id,
+                "product_type": product.type,
+            }
+        )
+        raise HTTPException(
+            status_code=400,
+            detail=f"Product misconfiguration: 'add_count' is missing for product '{product_id}'. Please update your product configuration."
+        )
+
+    job = WebhookJob(
+        service_app_id=service_app_id,
+        product_id=product_id,
+        product=product,
+        event=inputs.event,
+        user_id=user_id,
+        auth_token=inputs.auth_token,
+        trace=current_context(),
+    )
+
+    if event_log is not None:
+        # durable before any processing, so a crash or Firebase outage cannot lose the credit
+        if not event_log.opened:
+            await event_log.open()
+        job.wal_seq = await event_log.append({
+            "service_app_id": service_app_id,
+            "product_id": product_id,
+            "user_id": str(user_id) if user_id is not None else None,
+            # only needed while the uid is unknown, see WriteAheadLog.record_user
+            "auth_token": inputs.auth_token if user_id is None else None,
+            "event": logged_event_data(inputs),
+        })
+
+    if runtime.webhook_ack_mode and await event_queue.submit(job):
+        set_outcome("queued")
+        return {"received": True}
+
+    return await process_checkout_event(job)
+
+def log_ignored_event(inputs: StripeFirebaseRequest):
+    # Event type not in CHECKOUT_LINKS - acknowledge but don't process
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Event type not processed: %s",
+            inputs.event["type"],
+            extra={
+                "event_id": inputs.event["id"],
+                "event_type": inputs.event["type"],
+            }
+        )
+
 @webhook_router.post("/webhook/{service_app_id}/{product_id}")
 async def stripe_webhook(service_app_id: str, product_id: str, inputs: StripeFirebaseAuthorize):
     """Handle Stripe webhook events for a specific service app and product.
@@ -32,18 +320,21 @@ async def stripe_webhook(service_app_id: str, product_id: str, inputs: StripeFir
 
     event_type = inputs.event["type"]
     event_id = inputs.event["id"]
+    user_id = inputs.user.id if inputs.user else None
 
     # Log all incoming webhook events
-    logger.info(
-        f"Webhook received: {event_type}",
-        extra={
-            "event_id": event_id,
-            "event_type": event_type,
-            "service_app_id": service_app_id,
-            "product_id": product_id,
-            "user_id": inputs.user.id,
-        }
-    )
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "Webhook received: %s",
+            event_type,
+            extra={
+                "event_id": event_id,
+                "event_type": event_type,
+                "service_app_id": service_app_id,
+                "product_id": product_id,
+                "user_id": user_id,
+            }
+        )
 
     # Validate service app and product configuration
     service_app = platform.apps.get(service_app_id, None)
@@ -52,7 +343,7 @@ async def stripe_webhook(service_app_id: str, product_id: str, inputs: StripeFir
     if not service_app or not product:
         # 400 Bad Request - client configuration error, don't retry
         logger.error(
-            f"Invalid service app or product configuration",
+            "Invalid service app or product configuration",
             extra={
                 "event_id": event_id,
                 "service_app_id": service_app_id,
@@ -65,96 +356,69 @@ async def stripe_webhook(service_app_id: str, product_id: str, inputs: StripeFir
             detail=f"Invalid configuration: service_app_id '{service_app_id}' or product_id '{product_id}' not found. Please verify your webhook URL."
         )
 
+    label_request(service_app_id=service_app_id)
+
     # Process checkout-related events
     if event_type in CHECKOUT_LINKS:
-        session = inputs.event["data"]["object"]
-        session_id = session.get("id")
+        return await dispatch_checkout_event(service_app_id, product_id, product, inputs)
+
+    log_ignored_event(inputs)
+    set_outcome("ignored")
+
+    # Success response - Stripe only cares about HTTP 200 status
+    return {"received": True}
+
+@webhook_router.post("/webhook/{service_app_id}")
+async def stripe_app_webhook(service_app_id: str, inputs: StripeFirebaseAuthorize):
+    """Handle Stripe webhook events for every product of a service app.
+
+    The product is resolved from the event's metadata or line items through
+    the price_id / product_id / lookup_key index, so one Stripe endpoint
+    serves the whole app. Same status code rules as stripe_webhook.
+    """
 
+    event_type = inputs.event["type"]
+    event_id = inputs.event["id"]
+
+    if logger.isEnabledFor(logging.INFO):
         logger.info(
-            f"Processing checkout event",
+            "Webhook received: %s",
+            event_type,
             extra={
                 "event_id": event_id,
                 "event_type": event_type,
-                "session_id": session_id,
-                "user_id": inputs.user.id,
-                "product_type": product.type,
+                "service_app_id": service_app_id,
+                "user_id": inputs.user.id if inputs.user else None,
             }
         )
 
-        try:
-            # Store transaction record (includes idempotency check in the future)
-            await store_transaction_record(session, inputs.user.id)
-
-            if product.type == "tokens":
-                if not hasattr(product, "add_count") or product.add_count is None:
-                    # 400 Bad Request - product misconfiguration
-                    logger.error(
-                        f"Product configuration error: missing add_count",
-                        extra={
-                            "event_id": event_id,
-                            "service_app_id": service_app_id,
-                            "product_id": product_id,
-                            "product_type": product.type,
-                        }
-                    )
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Product misconfiguration: 'add_count' is missing for product '{product_id}'. Please update your product configuration."
-                    )
-
-                await update_user_token_balance(inputs.user.id, product.add_count)
+    if service_app_id not in platform.apps:
+        logger.error(
+            "Invalid service app configuration",
+            extra={"event_id": event_id, "service_app_id": service_app_id}
+        )
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid configuration: service_app_id '{service_app_id}' not found. Please verify your webhook URL."
+        )
 
-                logger.info(
-                    f"Successfully credited tokens",
-                    extra={
-                        "event_id": event_id,
-                        "user_id": inputs.user.id,
-                        "tokens_added": product.add_count,
-                        "product_id": product_id,
-                    }
-                )
+    label_request(service_app_id=service_app_id)
 
-            else:
-                # Log unsupported product type but return 200 (don't fail the webhook)
-                logger.warning(
-                    f"Unsupported product type - event acknowledged but not processed",
-                    extra={
-                        "event_id": event_id,
-                        "product_type": product.type,
-                        "product_id": product_id,
-                        "service_app_id": service_app_id,
-                    }
-                )
-                # Return 200 anyway - this isn't an error worth retrying
-                return {"received": True}
-
-        except HTTPException:
-            # Re-raise HTTP exceptions (400 errors)
-            raise
-        except Exception as e:
-            # Log unexpected errors but still return 200 to prevent retries
-            logger.exception(
-                f"Error processing webhook event",
-                extra={
-                    "event_id": event_id,
-                    "event_type": event_type,
-                    "user_id": inputs.user.id,
-                    "error": str(e),
-                }
-            )
-            # Return 200 to acknowledge receipt even if processing failed
-            # This prevents infinite retries for transient database issues
-            return {"received": True, "processed": False}
+    if event_type not in CHECKOUT_LINKS:
+        log_ignored_event(inputs)
+        set_outcome("ignored")
+        return {"received": True}
 
-    else:
-        # Event type not in CHECKOUT_LINKS - acknowledge but don't process
-        logger.debug(
-            f"Event type not processed: {event_type}",
-            extra={
-                "event_id": event_id,
-                "event_type": event_type,
-            }
+    match = platform.index.resolve_object(service_app_id, inputs.event["data"]["object"])
+    if match is None:
+        logger.error(
+            "No configured product matches checkout event",
+            extra={"event_id": event_id, "event_type": event_type, "service_app_id": service_app_id}
+        )
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid configuration: no product of service_app_id '{service_app_id}' matches the event's price, product or lookup key. Please update your product configuration."
         )
 
-    # Success response - Stripe only cares about HTTP 200 status
-    return {"received": True}
\ No newline at end of file
+    product_id, product = match
+    return await dispatch_checkout_event(service_app_id, product_id, product, inputs)
@@ -1,35 +1,103 @@
 # main.py
 
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from .api import webhook_router
-from .utils.setup import platform
-from app.utils.woodlogs import get_logger
+from .api import wallet_router, webhook_router
+from .utils.setup import CORS_ORIGINS, platform, runtime
+from .src.crud import close_database, flush_pending_writes, get_database, warm_up_database
+from .utils.deps import warm_up_identity
+from .utils.warmup import WarmUp
+from .utils.metrics import MetricsMiddleware, render as render_metrics
+from .utils.tracing import TracingMiddleware
+from .api.webhook import event_log, event_queue, replay_logged_event
+from .api.wallet import wallet_hub
+from app.utils.woodlogs import get_logger, shutdown_logging
 from .utils.exceptions import (
     internal_error_handler,
 )
 
-logger = get_logger(__file__)
+logger = get_logger(__name__)
+
+# Firebase app, access tokens and pooled connections, ready before /ready reports it
+warmup = WarmUp(
+    {
+        "rtdb": lambda: warm_up_database(runtime.warmup_connections),
+        "identity_toolkit": warm_up_identity,
+    } if runtime.warmup_enabled else {},
+    timeout=runtime.warmup_timeout,
+    retry_interval=runtime.warmup_retry_interval,
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # products, Stripe account and Firebase settings, kept off the import path
+    await asyncio.to_thread(platform.load)
+    warmup.start()
+    token_refresher = None
+    if runtime.warmup_enabled:
+        token_refresher = asyncio.create_task(get_database().keep_token_fresh())
+    replayer = None
+    if event_log is not None:
+        await event_log.open()
+        replayer = asyncio.create_task(event_log.run_replayer(
+            replay_logged_event,
+            interval=runtime.wal_replay_interval,
+            min_age=runtime.wal_replay_min_age,
+        ))
+    if runtime.webhook_ack_mode:
+        event_queue.start()
+    catalog_watcher = None
+    if runtime.catalog_watch_interval > 0:
+        catalog_watcher = asyncio.create_task(platform.apps.watch(runtime.catalog_watch_interval))
+    yield
+    await warmup.stop()
+    if token_refresher is not None:
+        token_refresher.cancel()
+    if catalog_watcher is not None:
+        catalog_watcher.cancel()
+    # finish acknowledged events before releasing their database connections
+    await event_queue.drain(timeout=runtime.webhook_drain_timeout)
+    if replayer is not None:
+        replayer.cancel()
+        await event_log.close()
+    # write out coalesced checkouts still inside their window
+    await flush_pending_writes()
+    # close wallet sockets before their balance reads lose the database
+    await wallet_hub.close()
+    # release pooled Realtime Database connections
+    await close_database()
+    # write out log records still queued for the background writer
+    shutdown_logging()
 
 app = FastAPI(
     title="Stripe Payment Service X Firebase Realtime DB",
     description="API service for handling Stripe payments and webhooks.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=platform.cors,
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# stage latency histograms and outcome counters of webhook requests, served at /metrics
+app.add_middleware(MetricsMiddleware)
+# root span of every request, outermost so it covers the other middleware
+app.add_middleware(TracingMiddleware)
+
 # Register exception handlers
 app.add_exception_handler(Exception, internal_error_handler)
 
 app.include_router(webhook_router)
+app.include_router(wallet_router)
 
 @app.get("/")
 async def read_root():
@@ -40,4 +108,15 @@ async def read_health():
     return {
         "status": "ok",
         "message": "Stripe Payment Service is running."
-    }
\ No newline at end of file
+    }
+
+@app.get("/ready")
+async def read_ready():
+    # 503 until the warm-up stages have completed
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics")
+async def read_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,201 @@
+# app/profile_startup.py
+# Import-time and setup-step profiler for cold-start regressions
+#
+#   python -m app.profile_startup --output startup_profile.json
+#   python -m app.profile_startup --baseline previous_release.json
+#
+# Imports are measured with `python -X importtime` in a fresh interpreter:
+# first `app.main` with everything it pulls in, then the SDKs it defers to
+# first use, so their cost shows up even though the app no longer pays it
+# at import. The setup steps are timed in this process afterwards.
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform as host
+import subprocess
+from pathlib import Path
+from dataclasses import asdict, dataclass
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# imported lazily by the app, profiled after app.main
+DEFERRED_MODULES = ("stripe", "firebase_admin", "firebase_admin.auth", "firebase_admin.credentials", "yaml")
+
+# packages always listed in the report, imported at startup or not
+WATCHED_PACKAGES = ("app", "fastapi", "starlette", "pydantic", "stripe", "firebase_admin", "httpx", "orjson", "yaml")
+
+PHASE_MARKER = "--profile-startup: deferred--"
+
+@dataclass
+class ModuleImport:
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+    phase: str
+
+    @property
+    def package(self) -> str:
+        return self.name.split(".", 1)[0]
+
+@dataclass
+class SetupStep:
+    name: str
+    seconds: float
+    ok: bool
+    error: str | None = None
+
+def parse_importtime(output: str) -> list[ModuleImport]:
+    """Parse `-X importtime` stderr, split into the app.main and deferred phases by PHASE_MARKER."""
+
+    modules = []
+    phase = "app.main"
+    for line in output.splitlines():
+        if line.strip() == PHASE_MARKER:
+            phase = "deferred"
+            continue
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        modules.append(ModuleImport(name.strip(), int(self_us), int(cumulative_us), depth, phase))
+    return modules
+
+def profile_imports(target: str = "app.main", deferred: tuple[str, ...] = DEFERRED_MODULES) -> list[ModuleImport]:
+    """Import target, then the deferred modules, in a fresh interpreter and return every module's cost."""
+
+    code = "; ".join([
+        "import sys",
+        f"import {target}",
+        f"sys.stderr.write({PHASE_MARKER!r} + '\\n')",
+        *(f"import {name}" for name in deferred),
+    ])
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {target} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+def time_step(name: str, step) -> tuple[SetupStep, object]:
+    start = time.perf_counter()
+    try:
+        value = step()
+    except Exception as e:
+        return SetupStep(name, time.perf_counter() - start, False, str(e)), None
+    return SetupStep(name, time.perf_counter() - start, True), value
+
+def profile_setup() -> list[SetupStep]:
+    """Time each platform setup step in this process."""
+
+    steps = []
+    step, setup = time_step("import app.utils.setup", lambda: __import__("app.utils.setup", fromlist=["setup"]))
+    steps.append(step)
+    if setup is None:
+        return steps
+
+    for name in ("setup_directory", "setup_workspace", "setup_stripe_account"):
+        step, _ = time_step(name, getattr(setup, name))
+        steps.append(step)
+
+    step, crud = time_step("import app.src.crud", lambda: __import__("app.src.crud", fromlist=["crud"]))
+    steps.append(step)
+    if crud is not None:
+        step, _ = time_step("setup_firebase", crud.setup_firebase)
+        steps.append(step)
+    return steps
+
+def summarize(modules: list[ModuleImport], steps: list[SetupStep]) -> dict:
+    """Build the machine-readable profile."""
+
+    packages: dict[str, dict[str, int]] = {}
+    for module in modules:
+        totals = packages.setdefault(module.phase, {})
+        totals[module.package] = totals.get(module.package, 0) + module.self_us
+
+    return {
+        "created": time.time(),
+        "python": sys.version.split()[0],
+        "platform": host.platform(),
+        "import_us": {phase: sum(totals.values()) for phase, totals in packages.items()},
+        "packages": {phase: dict(sorted(totals.items(), key=lambda kv: -kv[1])) for phase, totals in packages.items()},
+        "modules": [asdict(module) for module in modules],
+        "steps": [asdict(step) for step in steps],
+    }
+
+def compare(profile: dict, baseline: dict) -> list[str]:
+    """Describe package import and setup step changes against a baseline profile."""
+
+    lines = []
+    for phase, totals in profile["packages"].items():
+        before = baseline.get("packages", {}).get(phase, {})
+        for package in sorted(set(totals) | set(before), key=lambda p: -abs(totals.get(p, 0) - before.get(p, 0))):
+            delta = totals.get(package, 0) - before.get(package, 0)
+            if delta:
+                lines.append(f"{phase:<9} {package:<28} {before.get(package, 0) / 1000:>9.1f} -> {totals.get(package, 0) / 1000:>9.1f} ms ({delta / 1000:+.1f})")
+
+    before_steps = {step["name"]: step["seconds"] for step in baseline.get("steps", [])}
+    for step in profile["steps"]:
+        if step["name"] in before_steps:
+            delta = step["seconds"] - before_steps[step["name"]]
+            lines.append(f"step      {step['name']:<28} {before_steps[step['name']] * 1000:>9.1f} -> {step['seconds'] * 1000:>9.1f} ms ({delta * 1000:+.1f})")
+    return lines
+
+def report(profile: dict, top: int = 25) -> str:
+    """Render the profile as a plain text report, costliest first."""
+
+    lines = []
+    for phase, total in profile["import_us"].items():
+        lines.append(f"Imports ({phase}): {total / 1000:.1f} ms")
+
+    lines.append("")
+    lines.append(f"{'package':<28} {'app.main ms':>12} {'deferred ms':>12}")
+    packages = profile["packages"]
+    names = set(packages.get("app.main", {})) | set(packages.get("deferred", {}))
+    for name in sorted(names, key=lambda n: -sum(p.get(n, 0) for p in packages.values()))[:top]:
+        lines.append(f"{name:<28} {packages.get('app.main', {}).get(name, 0) / 1000:>12.1f} {packages.get('deferred', {}).get(name, 0) / 1000:>12.1f}")
+    for name in WATCHED_PACKAGES:
+        if name not in names:
+            lines.append(f"{name:<28} {'not imported':>12}")
+
+    lines.append("")
+    lines.append(f"{'module (self time)':<48} {'self ms':>9} {'cumul ms':>9}  phase")
+    for module in sorted(profile["modules"], key=lambda m: -m["self_us"])[:top]:
+        lines.append(f"{module['name']:<48} {module['self_us'] / 1000:>9.1f} {module['cumulative_us'] / 1000:>9.1f}  {module['phase']}")
+
+    lines.append("")
+    lines.append(f"{'setup step':<48} {'ms':>9}")
+    for step in sorted(profile["steps"], key=lambda s: -s["seconds"]):
+        status = "" if step["ok"] else f"  failed: {step['error']}"
+        lines.append(f"{step['name']:<48} {step['seconds'] * 1000:>9.1f}{status}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the import time and setup steps of app.main.")
+    parser.add_argument("--output", type=Path, default=Path("startup_profile.json"), help="JSON profile to write.")
+    parser.add_argument("--baseline", type=Path, help="Earlier JSON profile to compare against.")
+    parser.add_argument("--top", type=int, default=25, help="Number of packages and modules to list.")
+    parser.add_argument("--no-setup", action="store_true", help="Only profile imports.")
+    args = parser.parse_args()
+
+    modules = profile_imports()
+    steps = [] if args.no_setup else profile_setup()
+    profile = summarize(modules, steps)
+
+    args.output.write_text(json.dumps(profile, indent=2))
+    print(report(profile, top=args.top))
+    print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        print(f"\nChanges against {args.baseline}:")
+        print("\n".join(compare(profile, json.loads(args.baseline.read_text()))) or "none")
+
+if __name__ == "__main__":
+    main()
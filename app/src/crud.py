@@ -1,15 +1,29 @@
 # app/src/crud.py
 
+import asyncio
 from uuid import UUID
-import firebase_admin
 from pathlib import Path
 from fastapi import Depends
-from typing import Annotated
-from firebase_admin import credentials, db
-from firebase_admin._user_mgt import UserRecord
+from typing import TYPE_CHECKING, Annotated, Any, Callable
 
 from .schema import UserProfile
-from ..utils.setup import platform
+from .rtdb import RealtimeDatabase
+from .ledger import EventLedger
+from ..utils.cache import TTLCache
+from ..utils.batching import WriteCoalescer
+from ..utils.setup import platform, runtime
+from ..utils.lazy import LazyModule
+from ..utils.metrics import timed
+from ..utils.woodlogs import get_logger
+
+logger = get_logger(__name__)
+
+if TYPE_CHECKING:
+    from firebase_admin._user_mgt import UserRecord
+
+# the Firebase Admin SDK is imported on first use, off the cold-start path
+firebase_admin = LazyModule("firebase_admin")
+credentials = LazyModule("firebase_admin.credentials")
 
 STRIPE_SIGNATURE = "stripe-signature"
 FIREBASE_AUTH_SIGNATURE = "x-firebase-user-auth"
@@ -20,18 +34,19 @@ class RecordPaths:
     ACCOUNTS = "accounts"
     TRANSACTIONS = "transactions"
     TIMELINE = "timeline"
+    EVENTS = "processed_events"
 
 # setup firebase admin sdk
 def setup_firebase(
-    service_account_path: Path = platform.database._service_account_path,
-    database_url: str = platform.database.url,
+    service_account_path: Path | None = None,
+    database_url: str | None = None,
 ):
     try:
 
         if not firebase_admin._apps:
-            file_path = str(service_account_path)
+            file_path = str(service_account_path or platform.database._service_account_path)
             cred = credentials.Certificate(file_path)
-            firebase_admin.initialize_app(cred, {"databaseUrl": database_url})
+            firebase_admin.initialize_app(cred, {"databaseUrl": database_url or platform.database.url})
 
     except Exception:
         raise RuntimeError(
@@ -40,8 +55,45 @@ def setup_firebase(
             "refer to Google Firebase setup."
         )
 
+# shared async Realtime Database client
+_database: RealtimeDatabase | None = None
+
+def get_database() -> RealtimeDatabase:
+    """Return the pooled Realtime Database client, creating it on first use."""
+
+    global _database
+    if _database is None:
+        _database = RealtimeDatabase(
+            url=platform.database.url,
+            service_account_path=platform.database._service_account_path,
+            max_connections=runtime.rtdb_max_connections,
+            max_keepalive=runtime.rtdb_max_keepalive,
+            keepalive_expiry=runtime.rtdb_keepalive_expiry,
+            timeout=runtime.rtdb_timeout,
+        )
+    return _database
+
+async def close_database():
+    """Release pooled Realtime Database connections."""
+
+    if _database is not None:
+        await _database.aclose()
+
+async def warm_up_database(connections: int = 1):
+    """Initialize the Firebase app, mint the RTDB access token and open pooled connections."""
+
+    # credential loading is blocking
+    await asyncio.to_thread(setup_firebase)
+    await get_database().warm_up(connections)
+
+# processed Stripe event ids, checked before any webhook side effects
+event_ledger = EventLedger(get_database, path=RecordPaths.EVENTS, maxsize=runtime.event_ledger_size)
+
+# validated user profiles keyed by uid, written through on create and migrate
+profile_cache = TTLCache(maxsize=runtime.profile_cache_size, ttl=runtime.profile_cache_ttl)
+
 # User Profiling Operations
-async def _migrate_auth_to_db(user: UserRecord, profile: dict):
+async def _migrate_auth_to_db(user: "UserRecord", profile: dict):
     """Migrate Firebase Authentication user to Realtime Database profile."""
 
     final = {}
@@ -60,36 +112,37 @@ async def _migrate_auth_to_db(user: UserRecord, profile: dict):
         "tenant_id": user.tenant_id
     }
 
+    database = get_database()
+
     # migrate all timelines datasets over to new google account id
     old_id = profile.get("id", None)
     if old_id and old_id != user.uid:
         # find old timeline records and migrate to new user id
-        old_id_ref = db.reference(f"/timeline/{old_id}").get()
+        old_timeline = await database.get(f"/timeline/{old_id}")
 
-        if old_id_ref:
+        if old_timeline:
             # copy old sessions to new user id
-            new_ref = db.reference(f"/timeline/{user.uid}")
-            new_ref.update(old_id_ref)
+            await database.update(f"/timeline/{user.uid}", old_timeline)
             # delete old record
-            db.reference(f"/timeline/{old_id}").delete()
+            await database.delete(f"/timeline/{old_id}")
 
     # update with any other profile fields that exist
     final.update(**{k: v for k, v in profile.items() if k not in final and v})
-    # update final profile record and store in database
-    final_ref = db.reference(f"/users/{user.uid}")
     # validate final profile structure
     new_profile = UserProfile(**final)
-    final_ref.set(new_profile.model_dump_json())
+    # update final profile record and store it where _load_user_profile reads it,
+    # as an object rather than a JSON string so the next read validates it
+    await database.set(f"/{RecordPaths.PROFILES}/{user.uid}", new_profile.model_dump(mode="json"))
+    profile_cache.set(user.uid, new_profile)
     return new_profile
 
-async def create_new_profile(user: UserRecord):
+async def create_new_profile(user: "UserRecord"):
     """Create a new user profile in Firebase Realtime Database. Note: It is expected that any new user profile returned from this function should be of member userType. Otherwise, anonymous users should not reach this code path as an error will be raised."""
     # Placeholder for creating a new user profile logic
 
     if not user.provider_data:
         raise RuntimeError(f"Cannot create profile for anonymous user without provider data. User ID: {user.uid} and Email: {user.email}. Please manually upgrade anonymous user to member account via frontend authentication flow or resolve via Firebase Console.")
 
-    ref = db.reference(f"/profiles/{user.uid}")
     new_profile = UserProfile(
         id=str(user.uid),
         userType="member",
@@ -99,15 +152,21 @@ async def create_new_profile(user: UserRecord):
 
     )
 
-    ref.set(new_profile.model_dump_json())
+    await get_database().set(f"/{RecordPaths.PROFILES}/{user.uid}", new_profile.model_dump(mode="json"))
+    profile_cache.set(user.uid, new_profile)
     return new_profile
 
+@timed("get_user_profile")
 async def get_user_profile(user):
+    """Fetch user profile, served from the profile cache for users seen recently."""
+
+    return await profile_cache.get_or_load(user.uid, lambda: _load_user_profile(user))
+
+async def _load_user_profile(user):
     """Fetch user profile from Firebase Realtime Database."""
 
     user_id = user.uid
-    ref = db.reference(f"/profiles/{user_id}")
-    profile_data = ref.get()
+    profile_data = await get_database().get(f"/profiles/{user_id}")
 
     if not isinstance(profile_data, dict) or not profile_data:
         # If no profile found, this is a new user or has previously upgraded from anonymous without profile reading migration setup.
@@ -124,25 +183,90 @@ async def get_user_profile(user):
         return UserProfile(**profile_data)
 
 # Stripe Transaction Records
-async def store_transaction_record(record: dict, user_id: str | UUID):
-    """Store a transaction record in Firebase Realtime Database."""
+def transaction_record_path(record: dict, user_id: str | UUID) -> str:
+    """Return the /transactions path a record is stored under."""
 
     timestamp = record.get("timestamp")
 
     if not user_id or not timestamp:
         raise ValueError("Transaction record must contain 'user_id' and 'timestamp' fields.")
 
-    ref = db.reference(f"{RecordPaths.TRANSACTIONS}/{str(user_id)}/{timestamp}")
-    ref.set(record)
+    return f"{RecordPaths.TRANSACTIONS}/{str(user_id)}/{timestamp}"
+
+@timed("commit_checkout")
+async def commit_checkout(
+    record: dict,
+    user_id: str | UUID,
+    amount: float | None = None,
+    extra_updates: dict[str, Any] | None = None,
+):
+    """Apply every write of a checkout event in one atomic multi-path update.
+
+    Stores the transaction record, credits amount tokens with a server-side
+    increment when given, and writes any extra_updates (ledger, audit or
+    timeline paths relative to the database root) in a single request, so
+    either all of them land or none do. With a coalescing window, checkouts
+    for the same user are merged into one such update.
+    """
+
+    updates = {transaction_record_path(record, user_id): record}
+    updates.update(extra_updates or {})
+
+    await checkout_writes.submit(str(user_id), (updates, amount or 0))
+
+async def _flush_checkouts(user_id: str, checkouts: list[tuple[dict, float]]):
+    """Write a batch of one user's checkouts as a single multi-path update."""
+
+    updates = {}
+    amount = 0
+    for paths, credit in checkouts:
+        updates.update(paths)
+        amount += credit
+    if amount:
+        updates[f"{RecordPaths.ACCOUNTS}/{user_id}/tokenBalance"] = {".sv": {"increment": amount}}
+
+    await get_database().update("/", updates)
+    if amount:
+        # the server applied the increment, listeners read the new balance if they need it
+        notify_balance_change(user_id)
 
 # User Account Operations Handlers
-async def update_user_token_balance(user_id: str | UUID, amount: float):
-    """Update user's token balance in Firebase Realtime Database."""
+async def get_token_balance(user_id: str | UUID) -> float:
+    """Read the user's current token balance, 0 when none is stored."""
+
+    balance = await get_database().get(f"{RecordPaths.ACCOUNTS}/{user_id}/tokenBalance")
+    return balance if isinstance(balance, (int, float)) else 0
+
+# Token balance change listeners, e.g. the wallet WebSocket hub
+balance_listeners: list[Callable[[str, float | None], None]] = []
+
+def on_balance_change(listener: Callable[[str, float | None], None]):
+    """Register listener(user_id, balance) to run after every committed balance write.
+
+    Listeners run on the write path, so they must only hand the update off.
+    balance is None when the write does not return it, e.g. a checkout's
+    multi-path update.
+    """
+
+    balance_listeners.append(listener)
+    return listener
+
+def notify_balance_change(user_id: str, balance: float | None = None):
+    for listener in balance_listeners:
+        try:
+            listener(str(user_id), balance)
+        except Exception:
+            logger.exception("Token balance listener failed")
+
+# per-user coalescing of checkout writes, a window of 0 writes every checkout on its own
+checkout_writes = WriteCoalescer(
+    _flush_checkouts,
+    window=runtime.balance_coalesce_window,
+    max_batch=runtime.balance_coalesce_max_batch,
+    name="checkout",
+)
 
-    account_ref = db.reference(f"{RecordPaths.ACCOUNTS}/{str(user_id)}/tokenBalance")
-    current_balance = account_ref.get()
-    curr = current_balance if isinstance(current_balance, (int, float)) else 0.0
-    new_balance = curr + amount
-    account_ref.set(new_balance)
+async def flush_pending_writes():
+    """Write out every coalesced batch still waiting for its window."""
 
-    return new_balance
+    await checkout_writes.flush_all()
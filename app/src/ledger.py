@@ -0,0 +1,139 @@
+# app/src/ledger.py
+# Processed Stripe event ledger used to make webhook deliveries idempotent
+
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Any, Callable
+
+from ..utils.cache import TTLCache
+from ..utils.woodlogs import get_logger
+
+if TYPE_CHECKING:
+    from .rtdb import RealtimeDatabase
+
+logger = get_logger(__name__)
+
+class EventLedger:
+    """
+    Record of Stripe event ids that have already been fully processed.
+
+    Entries are keyed by `key`, the event id scoped to the endpoint that
+    received it: Stripe sends the same event id to every subscribed
+    endpoint, and each product endpoint must process it once.
+
+    The durable copy lives in the Realtime Database under `{path}/{key}`,
+    fronted by an in-memory LRU so retries that land on the same instance are
+    answered without any I/O. Concurrent deliveries of one event on this
+    instance wait for the first one to finish instead of processing twice.
+
+    Deduplication is exact within one process only. The durable record is
+    written together with the checkout it belongs to, not claimed up front,
+    so two processes receiving the same event at the same moment may both
+    miss it. Stripe retries arrive minutes apart, by which time the first
+    delivery's record is visible to every process.
+
+    Args:
+        database: Callable returning the Realtime Database client, or None to keep the ledger in memory only.
+        path: Realtime Database node holding processed event records.
+        maxsize: Event ids remembered in memory.
+        ttl: Seconds an event id is remembered in memory. Stripe retries for up to three days.
+    """
+
+    def __init__(
+        self,
+        database: Callable[[], RealtimeDatabase] | None,
+        path: str = "processed_events",
+        maxsize: int = 100_000,
+        ttl: float = 3 * 24 * 3600,
+    ):
+        self.database = database
+        self.path = path
+        self._seen = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight: dict[str, asyncio.Future] = {}
+
+        self.memory_hits = 0
+        self.ledger_hits = 0
+        self.misses = 0
+        self.inflight_waits = 0
+
+    @staticmethod
+    def key(event_id: str, *scope: str) -> str:
+        """Return the ledger key of event_id as delivered to the endpoint named by scope, e.g. app and product."""
+
+        return "/".join((*scope, event_id))
+
+    def record_path(self, key: str) -> str:
+        return f"{self.path}/{key}"
+
+    async def begin(self, key: str) -> bool:
+        """Return True if the event under key was already processed, otherwise reserve it for the caller.
+
+        A caller that gets False must finish with `complete` or `release`.
+        """
+
+        while pending := self._inflight.get(key):
+            self.inflight_waits += 1
+            await asyncio.shield(pending)
+
+        if key in self._seen:
+            self.memory_hits += 1
+            return True
+
+        # reserve before the ledger lookup suspends, so concurrent deliveries wait on it
+        self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            persisted = await self._persisted(key)
+        except BaseException:
+            self.release(key)
+            raise
+
+        if persisted:
+            self.ledger_hits += 1
+            self._seen.set(key, True)
+            self.release(key)
+            return True
+
+        self.misses += 1
+        return False
+
+    async def complete(self, key: str, record: dict[str, Any] | None = None, persist: bool = True):
+        """Mark the event under key as processed and wake concurrent deliveries waiting on it.
+
+        Pass persist=False when the ledger record was already written as part
+        of another update, see `record_path`.
+        """
+
+        self._seen.set(key, True)
+        try:
+            if persist and self.database is not None:
+                await self.database().set(self.record_path(key), {**(record or {}), "processedAt": {".sv": "timestamp"}})
+        finally:
+            self.release(key)
+
+    def release(self, key: str):
+        """Drop the reservation without marking the event processed, e.g. after a failure."""
+
+        if pending := self._inflight.pop(key, None):
+            pending.set_result(None)
+
+    async def _persisted(self, key: str) -> bool:
+        if self.database is None:
+            return False
+        try:
+            return await self.database().get(self.record_path(key), shallow="true") is not None
+        except Exception as e:
+            # without the ledger we cannot tell, so let the delivery through
+            logger.warning("Processed event ledger lookup failed for %s: %s", key, e)
+            return False
+
+    def stats(self) -> dict[str, Any]:
+        """Return dedupe counters."""
+
+        return {
+            "memory_hits": self.memory_hits,
+            "ledger_hits": self.ledger_hits,
+            "misses": self.misses,
+            "inflight_waits": self.inflight_waits,
+            "remembered": len(self._seen),
+        }
@@ -0,0 +1,257 @@
+# app/src/rtdb.py
+# Async Firebase Realtime Database REST client
+
+import os
+import json
+import time
+import asyncio
+from pathlib import Path
+from typing import Any, Callable
+
+import httpx
+
+from ..utils.woodlogs import get_logger
+from ..utils.tracing import span
+
+logger = get_logger(__name__)
+
+# refresh OAuth access tokens this many seconds before Google expires them
+TOKEN_REFRESH_MARGIN = 300
+EMULATOR_HOST_ENV = "FIREBASE_DATABASE_EMULATOR_HOST"
+# conditional writes against a location that holds no data use this ETag
+NULL_ETAG = "null_etag"
+
+class RealtimeDatabaseError(RuntimeError):
+    """Raised when the Realtime Database REST API returns a non-2xx response."""
+
+    def __init__(self, message: str, status_code: int | None = None, path: str | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.path = path
+
+class RealtimeDatabase:
+    """
+    Pooled keep-alive client for the Firebase Realtime Database REST API.
+
+    All calls are native coroutines on top of a shared httpx.AsyncClient, so
+    concurrent webhooks multiplex over the same connection pool instead of
+    blocking the event loop like firebase_admin.db does.
+
+    Args:
+        url: Realtime Database URL, e.g. https://<db>.firebaseio.com
+        service_account_path: Service account used to mint OAuth access tokens.
+        max_connections: Upper bound of open connections in the pool.
+        max_keepalive: Idle connections kept open for reuse.
+        keepalive_expiry: Seconds an idle connection is kept alive.
+        timeout: Per-request timeout in seconds.
+        transport: Optional httpx transport, e.g. httpx.MockTransport in tests.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        service_account_path: Path | None = None,
+        *,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 10.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.url = url.rstrip("/")
+        self.service_account_path = service_account_path
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = timeout
+        self.transport = transport
+
+        self._emulator_host = os.getenv(EMULATOR_HOST_ENV, "")
+        self._credential = None
+        self._token: str | None = None
+        self._token_expiry: float = 0.0
+
+        # the pool and lock are bound to the event loop that created them
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._token_lock: asyncio.Lock | None = None
+
+    # Connection management
+    def _http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, transport=self.transport)
+            self._token_lock = asyncio.Lock()
+            self._loop = loop
+        return self._client
+
+    async def aclose(self):
+        """Close pooled connections. Safe to call more than once."""
+
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+
+    # Authentication
+    def _mint_token(self) -> tuple[str, float]:
+        # blocking: loads the key and performs the OAuth exchange
+        from firebase_admin import credentials
+
+        if self._credential is None:
+            self._credential = credentials.Certificate(str(self.service_account_path))
+
+        token = self._credential.get_access_token()
+        expiry = token.expiry.timestamp() if token.expiry else time.time() + 3600
+        return token.access_token, expiry
+
+    async def access_token(self) -> str:
+        """Return a cached OAuth access token, minting a new one off-loop when needed."""
+
+        if self._emulator_host:
+            return "owner"
+
+        if self._token and time.time() < self._token_expiry - TOKEN_REFRESH_MARGIN:
+            return self._token
+
+        self._http()
+        async with self._token_lock:
+            if not self._token or time.time() >= self._token_expiry - TOKEN_REFRESH_MARGIN:
+                self._token, self._token_expiry = await asyncio.to_thread(self._mint_token)
+
+        return self._token
+
+    async def keep_token_fresh(self, retry_interval: float = 30.0):
+        """Background loop minting the access token shortly before it expires, so no request waits on the OAuth exchange."""
+
+        if self._emulator_host:
+            return
+
+        while True:
+            try:
+                await self.access_token()
+                delay = max(self._token_expiry - TOKEN_REFRESH_MARGIN - time.time(), 0.0) + 1.0
+            except Exception as e:
+                # requests still mint on demand, try again later
+                logger.warning("Realtime Database access token refresh failed: %s", e)
+                delay = retry_interval
+            await asyncio.sleep(delay)
+
+    async def warm_up(self, connections: int = 1, path: str = ""):
+        """Mint the access token and open pooled keep-alive connections ahead of the first request."""
+
+        await self.access_token()
+        # concurrent requests each establish their own connection, kept in the pool afterwards
+        connections = max(1, min(connections, self.limits.max_keepalive_connections or connections))
+        await asyncio.gather(*(
+            self.request("GET", path, params={"shallow": "true"}, expect=(401, 403, 404))
+            for _ in range(connections)
+        ))
+
+    # REST operations
+    def _endpoint(self, path: str) -> tuple[str, dict]:
+        path = path.strip("/")
+        if self._emulator_host:
+            # emulator namespaces databases by the first label of the hostname
+            namespace = httpx.URL(self.url).host.split(".")[0]
+            return f"http://{self._emulator_host}/{path}.json", {"ns": namespace}
+        return f"{self.url}/{path}.json", {}
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        body: Any = None,
+        params: dict | None = None,
+        headers: dict | None = None,
+        expect: tuple[int, ...] = (),
+    ) -> httpx.Response:
+        """Send a raw REST request and raise RealtimeDatabaseError on failure.
+
+        Statuses listed in expect are returned to the caller instead of raising.
+        """
+
+        client = self._http()
+        url, query = self._endpoint(path)
+        query.update(params or {})
+        request_headers = {"Authorization": f"Bearer {await self.access_token()}"}
+        request_headers.update(headers or {})
+
+        content = None
+        if body is not None:
+            content = json.dumps(body)
+            request_headers["Content-Type"] = "application/json"
+
+        with span(f"rtdb.{method}", **{"db.path": f"/{path.strip('/')}"}) as trace:
+            try:
+                response = await client.request(method, url, params=query, content=content, headers=request_headers)
+            except httpx.HTTPError as e:
+                raise RealtimeDatabaseError(f"Realtime Database {method} /{path} failed: {e}", path=path) from e
+            if trace is not None:
+                trace.set_attribute("http.status_code", response.status_code)
+
+        if response.is_error and response.status_code not in expect:
+            raise RealtimeDatabaseError(
+                f"Realtime Database {method} /{path} returned {response.status_code}: {response.text}",
+                status_code=response.status_code,
+                path=path,
+            )
+        return response
+
+    async def get(self, path: str, **params) -> Any:
+        """Read the value at path. Returns None when nothing is stored there."""
+
+        response = await self.request("GET", path, params=params)
+        return response.json()
+
+    async def set(self, path: str, value: Any, *, silent: bool = True) -> Any:
+        """Overwrite the value at path."""
+
+        response = await self.request("PUT", path, body=value, params={"print": "silent"} if silent else None)
+        return None if silent else response.json()
+
+    async def update(self, path: str, value: dict, *, silent: bool = True) -> Any:
+        """Merge the children of value into path. Keys may be nested slash paths."""
+
+        response = await self.request("PATCH", path, body=value, params={"print": "silent"} if silent else None)
+        return None if silent else response.json()
+
+    async def delete(self, path: str):
+        """Remove the value at path."""
+
+        await self.request("DELETE", path)
+
+    async def increment(self, path: str, amount: float) -> Any:
+        """Atomically add amount to the number at path on the server and return the new value.
+
+        Non-numeric or missing values are replaced by amount.
+        """
+
+        response = await self.request("PUT", path, body={".sv": {"increment": amount}})
+        return response.json()
+
+    async def transaction(self, path: str, transform: Callable[[Any], Any], max_retries: int = 25) -> Any:
+        """Apply transform to the value at path with an ETag compare-and-set loop.
+
+        The write only succeeds if nobody else changed the value since it was
+        read; on conflict the server returns the current value and a new ETag
+        and transform is retried against it.
+        """
+
+        response = await self.request("GET", path, headers={"X-Firebase-ETag": "true"})
+        for _ in range(max_retries):
+            new_value = transform(response.json())
+            response = await self.request(
+                "PUT",
+                path,
+                body=new_value,
+                headers={"if-match": response.headers.get("ETag", NULL_ETAG)},
+                expect=(412,),
+            )
+            if response.status_code != 412:
+                return new_value
+
+        raise RealtimeDatabaseError(f"Transaction on /{path} aborted after {max_retries} conflicting attempts.", status_code=412, path=path)
@@ -2,8 +2,6 @@
 
 from uuid import UUID
 from pydantic import BaseModel
-from stripe._event import Event
-from firebase_admin._user_mgt import UserRecord
 
 from datetime import datetime
 from typing import Any, Literal, Optional, Dict, Union
@@ -51,6 +49,13 @@ class TransactionRecord(BaseModel):
 # REST API Request Schemas
 class StripeFirebaseRequest(BaseModel):
     event: Any
-    user: UserProfile
-    auth: UserRecord | None = None
+    user: UserProfile | None = None
+    # firebase_admin UserRecord, not imported here to keep the SDK off the import path
+    auth: Any = None
+    # raw x-firebase-user-auth header, kept when identity resolution is deferred
+    auth_token: str | None = None
+    # verified request body, used to durably log the event
+    payload: bytes | None = None
+    # seconds spent in each verification stage
+    timings: dict[str, float] = {}
     model_config = {"arbitrary_types_allowed": True}
\ No newline at end of file
@@ -0,0 +1,243 @@
+# app/src/signing.py
+# Stripe webhook signing secrets per service app, with rotation support
+
+import hmac
+import time
+import hashlib
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Mapping, TypeVar
+
+from .events import DEFAULT_TOLERANCE, EventSignatureError, parse_signature_header
+from ..utils.woodlogs import get_logger
+
+logger = get_logger(__name__)
+
+# secrets accepted for every service app
+DEFAULT_SCOPE = "default"
+
+T = TypeVar("T")
+
+@dataclass(eq=False)
+class SigningSecret:
+    """One webhook signing secret with its HMAC key schedule prepared once."""
+    secret: str
+    mac: Any
+    # verified requests by scope
+    matches: dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def prepare(cls, secret: str) -> "SigningSecret":
+        return cls(secret=secret, mac=hmac.new(secret.encode(), digestmod=hashlib.sha256))
+
+    @property
+    def label(self) -> str:
+        # enough to tell secrets apart in logs and metrics without exposing them
+        return f"...{self.secret[-4:]}"
+
+    def sign(self, signed_payload: bytes) -> bytes:
+        mac = self.mac.copy()
+        mac.update(signed_payload)
+        return mac.hexdigest().encode()
+
+def load_webhook_secrets(path: Path) -> dict[str, list[str]]:
+    """Read a YAML mapping of service_app_id (or "default") to its active secrets."""
+
+    import yaml
+
+    with open(path, "r") as f:
+        data = yaml.safe_load(f) or {}
+
+    if not isinstance(data, dict):
+        raise ValueError(f"Invalid webhook secrets file {path}: expected a mapping of service_app_id to secrets.")
+
+    secrets = {}
+    for scope, values in data.items():
+        values = [values] if isinstance(values, str) else values
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise ValueError(f"Invalid webhook secrets for '{scope}' in {path}: expected a list of strings.")
+        secrets[str(scope)] = values
+    return secrets
+
+class SignatureVerifier:
+    """
+    Verifies webhook signatures against the active secrets of a service app.
+
+    Each scope (service_app_id) accepts its own secrets plus the default
+    ones. Secrets are tried most recently matched first, so during a
+    rotation a request normally costs a single HMAC. Secrets listed in
+    `secrets_file` are merged in and re-read when the file changes, so old
+    secrets can be retired without a redeploy.
+
+    Args:
+        secrets: Secrets by scope, DEFAULT_SCOPE applies to every service app.
+        tolerance: Maximum age in seconds of a signed timestamp.
+        secrets_file: Optional YAML file of additional secrets by scope.
+        reload_interval: Seconds between checks of secrets_file for changes.
+    """
+
+    def __init__(
+        self,
+        secrets: Mapping[str, Iterable[str]],
+        tolerance: int = DEFAULT_TOLERANCE,
+        secrets_file: Path | None = None,
+        reload_interval: float = 5.0,
+    ):
+        self.tolerance = tolerance
+        self.secrets_file = secrets_file
+        self.reload_interval = reload_interval
+
+        self._static = {scope: list(values) for scope, values in secrets.items()}
+        self._file_mtime: float | None = None
+        self._checked_at = 0.0
+        self._prepared: dict[str, SigningSecret] = {}
+        self._scopes: dict[str, list[str]] = {}
+        self._order: dict[str, list[SigningSecret]] = {}
+
+        self.reloads = 0
+        self.reload_failures = 0
+        self.rejected = 0
+
+        self._apply(self._static)
+        self.maybe_reload(force=True)
+
+    # Secret sets
+    def _apply(self, secrets: Mapping[str, Iterable[str]]):
+        scopes = {}
+        for scope, values in secrets.items():
+            # empty secrets would accept signatures anyone can compute
+            scopes[scope] = list(dict.fromkeys(v for v in values if v))
+
+        # keep prepared keys and counters of secrets that stay active
+        active = {s for values in scopes.values() for s in values}
+        self._prepared = {s: self._prepared.get(s) or SigningSecret.prepare(s) for s in active}
+        self._scopes = scopes
+        self._order = {}
+
+    def maybe_reload(self, force: bool = False):
+        """Re-read secrets_file if it changed since the last check."""
+
+        if self.secrets_file is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+
+        mtime = None
+        try:
+            mtime = self.secrets_file.stat().st_mtime
+            if mtime == self._file_mtime:
+                return
+            from_file = load_webhook_secrets(self.secrets_file)
+        except Exception as e:
+            # keep verifying with the secrets already loaded, and retry only once the file changes
+            self._file_mtime = mtime
+            self.reload_failures += 1
+            logger.error("Failed to load webhook secrets from %s: %s", self.secrets_file, e)
+            return
+
+        merged = {scope: list(values) for scope, values in self._static.items()}
+        for scope, values in from_file.items():
+            merged.setdefault(scope, []).extend(values)
+
+        self._apply(merged)
+        self._file_mtime = mtime
+        self.reloads += 1
+        logger.info("Loaded webhook secrets for %d scopes from %s", len(merged), self.secrets_file)
+
+    def _scope_key(self, scope: str) -> str:
+        # scope comes from the unauthenticated URL, unknown ones share the default order
+        return scope if scope in self._scopes else DEFAULT_SCOPE
+
+    def configured(self, scope: str) -> list[SigningSecret]:
+        """Secrets accepted for scope in configured order, the scope's own before the default ones."""
+
+        scope = self._scope_key(scope)
+        names = dict.fromkeys([*self._scopes.get(scope, ()), *self._scopes.get(DEFAULT_SCOPE, ())])
+        return [self._prepared[name] for name in names]
+
+    def candidates(self, scope: str) -> list[SigningSecret]:
+        """Secrets accepted for scope, most recently matched first."""
+
+        scope = self._scope_key(scope)
+        if (order := self._order.get(scope)) is None:
+            order = self._order[scope] = self.configured(scope)
+        return order
+
+    def _matched(self, scope: str, entry: SigningSecret):
+        scope = self._scope_key(scope)
+        entry.matches[scope] = entry.matches.get(scope, 0) + 1
+        order = self._order[scope]
+        if order[0] is not entry:
+            order.remove(entry)
+            order.insert(0, entry)
+
+    # Verification
+    def verify(self, scope: str, payload: bytes, sig_header: str) -> SigningSecret:
+        """Check the payload signature against the scope's secrets and return the one that matched."""
+
+        self.maybe_reload()
+        order = self.candidates(scope)
+        if not order:
+            raise EventSignatureError(f"No webhook signing secret configured for '{scope}'.")
+
+        timestamp, signatures = parse_signature_header(sig_header)
+        signed_payload = b"%d." % timestamp + payload
+
+        for entry in order:
+            expected = entry.sign(signed_payload)
+            if any(hmac.compare_digest(expected, signature) for signature in signatures):
+                if self.tolerance and timestamp < time.time() - self.tolerance:
+                    raise EventSignatureError("Timestamp outside the tolerance zone.")
+                self._matched(scope, entry)
+                return entry
+
+        self.rejected += 1
+        raise EventSignatureError("No signatures found matching the expected signature for payload.")
+
+    def match(self, scope: str, check: Callable[[str], T]) -> T:
+        """Return check(secret) for the first of the scope's secrets it does not raise for.
+
+        For verifiers that take a single secret, such as stripe.Webhook.construct_event.
+        """
+
+        self.maybe_reload()
+        order = self.candidates(scope)
+        if not order:
+            raise EventSignatureError(f"No webhook signing secret configured for '{scope}'.")
+
+        error = None
+        for entry in list(order):
+            try:
+                result = check(entry.secret)
+            except Exception as e:
+                error = e
+                continue
+            self._matched(scope, entry)
+            return result
+
+        self.rejected += 1
+        raise error
+
+    def match_counts(self) -> list[tuple[tuple[str, str], int]]:
+        """Return ((scope, secret index), matches) pairs, index 0 being the scope's primary secret."""
+
+        return [
+            ((scope, str(index)), entry.matches.get(scope, 0))
+            for scope in self._scopes
+            for index, entry in enumerate(self.configured(scope))
+        ]
+
+    def stats(self) -> dict[str, Any]:
+        """Return per-secret match counters by scope and reload counters."""
+
+        return {
+            "matches": {
+                scope: {entry.label: entry.matches.get(scope, 0) for entry in self.configured(scope)}
+                for scope in self._scopes
+            },
+            "rejected": self.rejected,
+            "reloads": self.reloads,
+            "reload_failures": self.reload_failures,
+        }
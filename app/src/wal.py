@@ -0,0 +1,362 @@
+# app/src/wal.py
+# Durable local write-ahead log for verified webhook events
+
+import os
+import json
+import time
+import fcntl
+import asyncio
+import itertools
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from ..utils.woodlogs import get_logger
+
+logger = get_logger(__name__)
+
+SEGMENT_SUFFIX = ".wal"
+LOCK_FILE = "LOCK"
+DEAD_LETTER_FILE = "dead-letter.jsonl"
+
+class WriteAheadLog:
+    """
+    Append-only log of webhook events, stored as JSON-lines segment files.
+
+    Appends are group committed: every record written while a commit is in
+    progress is flushed by the next single write + fsync, so the per-event
+    cost stays low at high event rates. Each event is later marked done; a
+    replayer retries events that never were, and segments whose events are
+    all done are deleted by `compact`. Events still failing after
+    `max_attempts` replays are moved to a dead-letter file.
+
+    Every process logs to its own `worker-<n>` folder below directory,
+    claimed with an exclusive lock, so worker processes never replay each
+    other's events. A restarted worker claims the first free folder and
+    picks up what a previous process left there.
+
+    Args:
+        directory: Folder holding one segment folder per process.
+        segment_max_bytes: Size after which a new segment file is started.
+        commit_interval: Seconds to wait for more records before each commit.
+        max_attempts: Replays of an event before it is dead-lettered.
+        fsync: Disable only for tests or throwaway environments.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        segment_max_bytes: int = 16 * 1024 * 1024,
+        commit_interval: float = 0.002,
+        max_attempts: int = 60,
+        fsync: bool = True,
+    ):
+        self.root = Path(directory)
+        self.directory = self.root
+        self.segment_max_bytes = segment_max_bytes
+        self.commit_interval = commit_interval
+        self.max_attempts = max_attempts
+        self.fsync = fsync
+
+        self._next_seq = 1
+        self._pending: dict[int, dict] = {}
+        self._claimed: set[int] = set()
+        self._segments: dict[Path, set[int]] = {}
+        self._done: set[int] = set()
+        self._attempts: dict[int, int] = {}
+        self._lock_file = None
+
+        self._active: Path | None = None
+        self._file = None
+        self._buffer: list[tuple[bytes, asyncio.Future]] = []
+        self._wakeup: asyncio.Event | None = None
+        self._committer: asyncio.Task | None = None
+        self._closing = False
+
+        self.appended = 0
+        self.commits = 0
+        self.replayed = 0
+        self.dead_lettered = 0
+
+    @property
+    def opened(self) -> bool:
+        return self._committer is not None
+
+    # Lifecycle
+    async def open(self):
+        """Recover pending events from existing segments and start the committer."""
+
+        if self.opened:
+            return
+
+        await asyncio.to_thread(self._recover)
+        # always start a fresh segment so a torn tail is never appended to
+        self._rotate()
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._committer = asyncio.create_task(self._commit_loop(), name="wal-committer")
+        logger.info("Write-ahead log opened at %s with %d pending events", self.directory, len(self._pending))
+
+    async def close(self):
+        """Flush buffered records and close the active segment."""
+
+        if not self.opened:
+            return
+
+        # let the committer finish its current batch and exit
+        self._closing = True
+        self._wakeup.set()
+        await self._committer
+        self._committer = None
+        if self._buffer:
+            await self._commit()
+        if self._file:
+            self._file.close()
+            self._file = None
+        if self._lock_file:
+            # closing the file releases the folder lock
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _claim_directory(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        for slot in itertools.count():
+            directory = self.root / f"worker-{slot}"
+            directory.mkdir(exist_ok=True)
+            lock_file = open(directory / LOCK_FILE, "ab")
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # owned by another live process
+                lock_file.close()
+                continue
+            self.directory = directory
+            self._lock_file = lock_file
+            return
+
+    def _recover(self):
+        self._claim_directory()
+        events: dict[int, dict] = {}
+
+        for segment in sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}")):
+            seqs = set()
+            with open(segment, "rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # torn write from a crash, nothing after it was acknowledged
+                        break
+                    seq = record["seq"]
+                    self._next_seq = max(self._next_seq, seq + 1)
+                    if record["op"] == "event":
+                        events[seq] = record
+                        seqs.add(seq)
+                    elif record["op"] == "user":
+                        if event := events.get(record["ref"]):
+                            self._apply_user(event, record["user_id"])
+                    else:
+                        self._done.add(record["ref"])
+            self._segments[segment] = seqs
+
+        self._pending = {seq: record for seq, record in events.items() if seq not in self._done}
+
+    def _rotate(self):
+        # on the event loop, the only place segments are added
+        if self._file:
+            self._file.close()
+        self._active = self.directory / f"{self._next_seq:020d}{SEGMENT_SUFFIX}"
+        self._segments.setdefault(self._active, set())
+        self._file = open(self._active, "ab")
+
+    # Appends and group commit
+    async def append(self, data: dict[str, Any]) -> int:
+        """Durably log data and return its sequence number once it is on disk."""
+
+        seq = self._next_seq
+        self._next_seq += 1
+        record = {"seq": seq, "op": "event", "ts": time.time(), "data": data}
+        segment = await self._write(record)
+
+        self._pending[seq] = record
+        self._claimed.add(seq)
+        self._segments[segment].add(seq)
+        self.appended += 1
+        return seq
+
+    async def mark_done(self, seq: int):
+        """Record that the event with sequence number seq was fully processed."""
+
+        if seq not in self._pending:
+            return
+
+        done_seq = self._next_seq
+        self._next_seq += 1
+        await self._write({"seq": done_seq, "op": "done", "ref": seq})
+        self._pending.pop(seq, None)
+        self._claimed.discard(seq)
+        self._done.add(seq)
+
+    async def record_user(self, seq: int, user_id: str):
+        """Replace the logged auth token of event seq with the uid it resolved to.
+
+        ID tokens expire within an hour, the uid keeps the event replayable.
+        """
+
+        if (record := self._pending.get(seq)) is None:
+            return
+
+        user_seq = self._next_seq
+        self._next_seq += 1
+        await self._write({"seq": user_seq, "op": "user", "ref": seq, "user_id": user_id})
+        self._apply_user(record, user_id)
+
+    @staticmethod
+    def _apply_user(record: dict, user_id: str):
+        record["data"]["user_id"] = user_id
+        record["data"]["auth_token"] = None
+
+    def release(self, seq: int):
+        """Hand a failed event back to the replayer."""
+
+        self._claimed.discard(seq)
+
+    async def _write(self, record: dict) -> Path:
+        # resolves to the segment the record landed in once it is on disk
+        future = asyncio.get_running_loop().create_future()
+        self._buffer.append((json.dumps(record, separators=(",", ":")).encode() + b"\n", future))
+        self._wakeup.set()
+        return await future
+
+    async def _commit_loop(self):
+        while not self._closing:
+            await self._wakeup.wait()
+            # let concurrent appends join this commit
+            await asyncio.sleep(self.commit_interval)
+            self._wakeup.clear()
+            await self._commit()
+
+    async def _commit(self):
+        batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        segment = self._active
+        try:
+            size = await asyncio.to_thread(self._flush, b"".join(line for line, _ in batch))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        if size >= self.segment_max_bytes:
+            self._rotate()
+        self.commits += 1
+        for _, future in batch:
+            if not future.done():
+                future.set_result(segment)
+
+    def _flush(self, data: bytes) -> int:
+        # in a worker thread, only touches the active file
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    # Replay and compaction
+    async def replay(self, handler: Callable[[dict], Awaitable[bool]], min_age: float = 30.0) -> int:
+        """Retry pending events older than min_age. handler returns True when an event is done."""
+
+        cutoff = time.time() - min_age
+        replayed = 0
+        for seq, record in list(self._pending.items()):
+            if seq in self._claimed or record["ts"] > cutoff:
+                continue
+
+            self._claimed.add(seq)
+            try:
+                done = await handler(record["data"])
+            except Exception:
+                logger.exception("Replay of write-ahead log event %d failed", seq)
+                done = False
+
+            if done:
+                self._attempts.pop(seq, None)
+                await self.mark_done(seq)
+                replayed += 1
+                continue
+
+            self._attempts[seq] = attempts = self._attempts.get(seq, 0) + 1
+            if attempts >= self.max_attempts:
+                await self.dead_letter(seq)
+            else:
+                self.release(seq)
+
+        self.replayed += replayed
+        return replayed
+
+    async def dead_letter(self, seq: int):
+        """Move event seq to the dead-letter file and stop retrying it."""
+
+        if (record := self._pending.get(seq)) is None:
+            return
+
+        line = json.dumps({**record, "attempts": self._attempts.pop(seq, 0), "dead_at": time.time()}, separators=(",", ":")).encode() + b"\n"
+        await asyncio.to_thread(self._append_dead_letter, line)
+        await self.mark_done(seq)
+        self.dead_lettered += 1
+        logger.error(
+            "Dead-lettered write-ahead log event %d after %d attempts",
+            seq,
+            self.max_attempts,
+            extra={"wal_seq": seq, "dead_letter_file": str(self.directory / DEAD_LETTER_FILE)},
+        )
+
+    def _append_dead_letter(self, line: bytes):
+        with open(self.directory / DEAD_LETTER_FILE, "ab") as f:
+            f.write(line)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    async def compact(self) -> int:
+        """Delete the oldest closed segments whose events are all done. Returns the number removed.
+
+        Segments are only removed oldest first: a done record always lives in
+        the same or a later segment than its event, so deleting a prefix can
+        never resurrect an event that is still on disk.
+        """
+
+        removed = 0
+        for segment in sorted(self._segments):
+            seqs = self._segments[segment]
+            if segment == self._active or not seqs <= self._done:
+                break
+            await asyncio.to_thread(segment.unlink, True)
+            del self._segments[segment]
+            self._done -= seqs
+            removed += 1
+        return removed
+
+    async def run_replayer(self, handler: Callable[[dict], Awaitable[bool]], interval: float = 30.0, min_age: float = 30.0):
+        """Background loop replaying pending events and compacting segments every interval seconds."""
+
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if replayed := await self.replay(handler, min_age=min_age):
+                    logger.info("Replayed %d webhook events from the write-ahead log", replayed)
+                await self.compact()
+            except Exception:
+                logger.exception("Write-ahead log replay cycle failed")
+
+    def stats(self) -> dict[str, Any]:
+        """Return append, commit and backlog counters."""
+
+        return {
+            "pending": len(self._pending),
+            "segments": len(self._segments),
+            "appended": self.appended,
+            "commits": self.commits,
+            "replayed": self.replayed,
+            "dead_lettered": self.dead_lettered,
+        }
@@ -0,0 +1,126 @@
+# app/utils/batching.py
+# Per-key write coalescing for bursts of small database updates
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable
+
+from .woodlogs import get_logger
+
+logger = get_logger(__name__)
+
+@dataclass
+class _Batch:
+    items: list = field(default_factory=list)
+    futures: list[asyncio.Future] = field(default_factory=list)
+    timer: asyncio.TimerHandle | None = None
+
+class WriteCoalescer:
+    """
+    Merges writes submitted for the same key within a short window into one flush.
+
+    The first write for a key opens a batch that is flushed `window` seconds
+    later, or as soon as it holds `max_batch` writes, so no write waits longer
+    than the window. Every caller waits for the flush that carried its write
+    and receives its result, or its exception if the flush failed.
+
+    Args:
+        flush: Coroutine function called with a key and the list of writes batched for it.
+        window: Seconds a batch stays open for more writes. 0 disables coalescing.
+        max_batch: Writes after which a batch is flushed early.
+        name: Label used in logs.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[Hashable, list], Awaitable[Any]],
+        window: float = 0.01,
+        max_batch: int = 50,
+        name: str = "writes",
+    ):
+        self.flush = flush
+        self.window = window
+        self.max_batch = max_batch
+        self.name = name
+
+        self._pending: dict[Hashable, _Batch] = {}
+        self._flushing: set[asyncio.Task] = set()
+
+        self.submitted = 0
+        self.flushes = 0
+        self.failed = 0
+        self.largest_batch = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_batch > 1
+
+    async def submit(self, key: Hashable, item: Any) -> Any:
+        """Add item to the open batch for key and return the result of the flush that wrote it."""
+
+        self.submitted += 1
+        if not self.enabled:
+            self.flushes += 1
+            return await self.flush(key, [item])
+
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = _Batch()
+            batch.timer = loop.call_later(self.window, self._dispatch, key, batch)
+
+        future = loop.create_future()
+        batch.items.append(item)
+        batch.futures.append(future)
+        if len(batch.items) >= self.max_batch:
+            self._dispatch(key, batch)
+
+        # the write goes ahead even if this caller stops waiting for it
+        return await asyncio.shield(future)
+
+    def _dispatch(self, key: Hashable, batch: _Batch):
+        if self._pending.get(key) is not batch:
+            return
+        del self._pending[key]
+        batch.timer.cancel()
+
+        task = asyncio.get_running_loop().create_task(self._flush_batch(key, batch))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _flush_batch(self, key: Hashable, batch: _Batch):
+        self.flushes += 1
+        self.largest_batch = max(self.largest_batch, len(batch.items))
+        try:
+            result = await self.flush(key, batch.items)
+        except Exception as e:
+            self.failed += 1
+            logger.warning("Coalesced %s flush of %d writes for %s failed: %s", self.name, len(batch.items), key, e)
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future in batch.futures:
+            if not future.done():
+                future.set_result(result)
+
+    async def flush_all(self):
+        """Flush every open batch now and wait for all flushes in progress."""
+
+        for key, batch in list(self._pending.items()):
+            self._dispatch(key, batch)
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
+
+    def stats(self) -> dict[str, Any]:
+        """Return batching counters."""
+
+        return {
+            "open_batches": len(self._pending),
+            "submitted": self.submitted,
+            "flushes": self.flushes,
+            "failed": self.failed,
+            "largest_batch": self.largest_batch,
+            "avg_batch": self.submitted / self.flushes if self.flushes else 0.0,
+        }
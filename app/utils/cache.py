@@ -0,0 +1,124 @@
+# app/utils/cache.py
+# Bounded in-process caches shared by the dependency and CRUD layers
+
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Bounded LRU cache with per-entry time-to-live.
+
+    Concurrent `get_or_load` calls for the same key share a single in-flight
+    load, so a burst of webhooks for one user only triggers one lookup.
+    Failed loads are never cached.
+
+    Args:
+        maxsize: Maximum number of entries kept before evicting the least recently used.
+        ttl: Seconds an entry stays valid. Zero or less disables caching entirely.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.maxsize > 0
+
+    def get(self, key: Hashable, default: Any = None, *, count: bool = True) -> Any:
+        """Return a fresh cached value or default."""
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return value
+            del self._entries[key]
+
+        if count:
+            self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        """Store value under key, evicting the least recently used entries when full."""
+
+        if not self.enabled:
+            return
+
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable | None = None):
+        """Drop one key, or every entry when key is None."""
+
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key, awaiting loader() once on a miss."""
+
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        if pending := self._inflight.get(key):
+            # collapse onto the lookup that is already running
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # only swallow the leader being cancelled, then load ourselves
+                if not pending.cancelled():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except Exception as e:
+            future.set_exception(e)
+            # mark retrieved so an unshared failure does not log "never retrieved"
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict[str, Any]:
+        """Return hit/miss counters and current size."""
+
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
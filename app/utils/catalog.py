@@ -0,0 +1,236 @@
+# app/utils/catalog.py
+# Lookup structures over the configured Stripe products
+
+import time
+import asyncio
+from pathlib import Path
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Iterator, Mapping
+
+from .woodlogs import get_logger
+
+logger = get_logger(__name__)
+
+# Stripe identifiers a product can be resolved by, in the order they are tried
+INDEX_FIELDS = ("price_id", "product_id", "lookup_key")
+
+# metadata keys read from checkout sessions and invoices, mapped to the index field they hold
+METADATA_FIELDS = {
+    "price_id": "price_id",
+    "product_id": "product_id",
+    "lookup_key": "lookup_key",
+    "product_name": "name",
+}
+
+class ProductIndex:
+    """
+    Immutable index from Stripe identifiers to configured products.
+
+    Built with each product catalog version and resolved with a single dict
+    lookup per identifier. Identifiers shared by several products of one service app
+    (e.g. one lookup_key on every pack) cannot pick a product, so they are
+    left out and listed in `ambiguous`.
+
+    Args:
+        entries: (service_app_id, field, value) to (product name, product config).
+        ambiguous: (service_app_id, field, value) keys matching several products.
+    """
+
+    def __init__(self, entries: Mapping[tuple[str, str, str], tuple[str, Any]], ambiguous: frozenset = frozenset()):
+        self._entries = MappingProxyType(dict(entries))
+        self.ambiguous = ambiguous
+
+    @classmethod
+    def build(cls, apps: Mapping[str, Mapping[str, Any]]) -> "ProductIndex":
+        """Index every product of every service app by name, price_id, product_id and lookup_key."""
+
+        entries = {}
+        ambiguous = set()
+        for service_app_id, products in apps.items():
+            for name, product in products.items():
+                for field in ("name", *INDEX_FIELDS):
+                    value = name if field == "name" else getattr(product, field, None)
+                    if not value:
+                        continue
+                    key = (service_app_id, field, value)
+                    if key in entries and entries[key][1] is not product:
+                        ambiguous.add(key)
+                    entries[key] = (name, product)
+
+        for key in ambiguous:
+            del entries[key]
+        return cls(entries, frozenset(ambiguous))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, service_app_id: str, field: str, value: str) -> tuple[str, Any] | None:
+        """Return (product name, product config) for one identifier, or None."""
+
+        return self._entries.get((service_app_id, field, value))
+
+    def resolve(
+        self,
+        service_app_id: str,
+        *,
+        price_id: str | None = None,
+        product_id: str | None = None,
+        lookup_key: str | None = None,
+    ) -> tuple[str, Any] | None:
+        """Return the product matching the most specific identifier given."""
+
+        for field, value in zip(INDEX_FIELDS, (price_id, product_id, lookup_key)):
+            if value and (match := self.get(service_app_id, field, value)):
+                return match
+        return None
+
+    def resolve_object(self, service_app_id: str, obj: Mapping[str, Any]) -> tuple[str, Any] | None:
+        """Resolve the product of a checkout session or invoice from its metadata or line items."""
+
+        metadata = obj.get("metadata") or {}
+        for key, field in METADATA_FIELDS.items():
+            if (value := metadata.get(key)) and (match := self.get(service_app_id, field, value)):
+                return match
+
+        for price in _line_item_prices(obj):
+            product = price.get("product")
+            match = self.resolve(
+                service_app_id,
+                price_id=price.get("id"),
+                product_id=product.get("id") if isinstance(product, Mapping) else product,
+                lookup_key=price.get("lookup_key"),
+            )
+            if match:
+                return match
+        return None
+
+def _line_item_prices(obj: Mapping[str, Any]) -> Iterator[Mapping[str, Any]]:
+    # invoices carry `lines`, checkout sessions `line_items` when expanded
+    for key in ("lines", "line_items"):
+        items = obj.get(key)
+        for item in (items.get("data") or []) if isinstance(items, Mapping) else []:
+            if isinstance(price := item.get("price"), Mapping):
+                yield price
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """One immutable, validated version of every service app's products."""
+    apps: Mapping[str, Mapping[str, Any]]
+    index: ProductIndex
+    version: int
+    loaded_at: float
+
+    @classmethod
+    def build(cls, apps: Mapping[str, Mapping[str, Any]], version: int) -> "CatalogSnapshot":
+        frozen = MappingProxyType({name: MappingProxyType(dict(products)) for name, products in apps.items()})
+        return cls(apps=frozen, index=ProductIndex.build(frozen), version=version, loaded_at=time.time())
+
+class ProductCatalog(Mapping):
+    """
+    Live product configuration, read as a mapping of service_app_id to products.
+
+    Reads go to the current snapshot. A reload builds and validates a whole
+    new snapshot before swapping it in with a single assignment, so requests
+    in flight keep the version they started with and never see a partial
+    update. A reload that fails keeps the last good snapshot.
+
+    Args:
+        load: Callable returning {service_app_id: {product name: product config}}, raising on invalid config.
+        source: Directory whose files are watched for changes.
+        pattern: Glob of the watched files in source.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], Mapping[str, Mapping[str, Any]]],
+        source: Path | None = None,
+        pattern: str = "*.yml",
+    ):
+        self._load = load
+        self.source = source
+        self.pattern = pattern
+
+        self.reloads = 0
+        self.reload_failures = 0
+        self.last_error: str | None = None
+
+        self._fingerprint = self._scan()
+        # the first load has no fallback, so its errors propagate
+        self._snapshot = CatalogSnapshot.build(load(), version=1)
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        return self._snapshot
+
+    @property
+    def index(self) -> ProductIndex:
+        return self._snapshot.index
+
+    def __getitem__(self, service_app_id: str) -> Mapping[str, Any]:
+        return self._snapshot.apps[service_app_id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._snapshot.apps)
+
+    def __len__(self) -> int:
+        return len(self._snapshot.apps)
+
+    def reload(self) -> bool:
+        """Load and validate the configuration and swap it in. Returns False and keeps the current one on failure."""
+
+        try:
+            snapshot = CatalogSnapshot.build(self._load(), version=self._snapshot.version + 1)
+        except Exception as e:
+            self.reload_failures += 1
+            self.last_error = str(e)
+            logger.error("Product catalog reload failed, keeping version %d: %s", self._snapshot.version, e)
+            return False
+
+        self._snapshot = snapshot
+        self.reloads += 1
+        self.last_error = None
+        logger.info("Product catalog reloaded as version %d with %d apps", snapshot.version, len(snapshot.apps))
+        return True
+
+    def _scan(self) -> tuple:
+        if self.source is None or not self.source.is_dir():
+            return ()
+        return tuple(
+            (file.name, stat.st_mtime_ns, stat.st_size)
+            for file in sorted(self.source.glob(self.pattern))
+            for stat in (file.stat(),)
+        )
+
+    def changed(self) -> bool:
+        """Return True once per change of the watched files."""
+
+        fingerprint = self._scan()
+        if fingerprint == self._fingerprint:
+            return False
+        # remembered even if the reload fails, so a broken file is retried only after it changes again
+        self._fingerprint = fingerprint
+        return True
+
+    async def watch(self, interval: float = 5.0):
+        """Background loop reloading the catalog whenever the watched files change."""
+
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await asyncio.to_thread(self.changed):
+                    await asyncio.to_thread(self.reload)
+            except Exception:
+                logger.exception("Product catalog watch cycle failed")
+
+    def stats(self) -> dict[str, Any]:
+        """Return the active version and reload counters."""
+
+        return {
+            "version": self._snapshot.version,
+            "loaded_at": self._snapshot.loaded_at,
+            "apps": len(self._snapshot.apps),
+            "reloads": self.reloads,
+            "reload_failures": self.reload_failures,
+            "last_error": self.last_error,
+        }
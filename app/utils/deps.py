@@ -1,15 +1,29 @@
 # app/utils/deps.py
 # Route Exception & Dependency utilities for the Stripe Payment application
 
-import stripe
+import logging
+import asyncio
 from uuid import UUID
 from fastapi import HTTPException, Request, Depends
-from typing import Annotated
-from firebase_admin import auth
-from firebase_admin._user_mgt import UserRecord
+from typing import TYPE_CHECKING, Annotated
 
-from ..utils.setup import platform
+from ..utils.setup import platform, runtime
+from ..utils.lazy import LazyModule
+from ..utils.cache import TTLCache
+from ..utils.pipeline import run_stages
+from ..utils.metrics import Collected, label_request, observe, register, timed
+from ..utils.tracing import traced
+from ..utils.woodlogs import get_logger
+from ..utils.idtoken import (
+    DEFAULT_CERTS_CACHE_PATH,
+    FirebaseTokenVerifier,
+    SigningKeyCache,
+    looks_like_id_token,
+    user_record_from_claims,
+)
 from ..src.schema import StripeFirebaseRequest
+from ..src.events import EventSignatureError, decode_payload, parse_event
+from ..src.signing import DEFAULT_SCOPE, SignatureVerifier
 from ..src.crud import (
     STRIPE_SIGNATURE,
     FIREBASE_AUTH_SIGNATURE,
@@ -17,21 +31,167 @@ from ..src.crud import (
     get_user_profile,
 )
 
-async def verify_signature(request: Request):
-    """ Verify Stripe webhook signature from request headers. """
+logger = get_logger(__name__)
+
+if TYPE_CHECKING:
+    from firebase_admin._user_mgt import UserRecord
+
+def configure_stripe(module):
+    module.api_key = platform.account.api_key
+
+# the Stripe and Firebase SDKs are imported on first use, off the cold-start path
+stripe = LazyModule("stripe", on_load=configure_stripe)
+auth = LazyModule("firebase_admin.auth")
+
+# Firebase Authentication user records keyed by uid
+auth_user_cache = TTLCache(maxsize=runtime.auth_cache_size, ttl=runtime.auth_cache_ttl)
+
+async def get_auth_user(uid: str) -> "UserRecord":
+    """ Fetch a Firebase Authentication user, reusing a fresh cached record when available. """
+
+    # auth.get_user is blocking, keep it off the event loop
+    return await auth_user_cache.get_or_load(uid, lambda: asyncio.to_thread(auth.get_user, uid))
+
+# Firebase ID tokens verified locally against cached Google certificates
+_token_verifier: FirebaseTokenVerifier | None = None
+
+def get_token_verifier() -> FirebaseTokenVerifier:
+    """ Return the shared ID token verifier, creating it on first use. """
+
+    global _token_verifier
+    if _token_verifier is None:
+        _token_verifier = FirebaseTokenVerifier(
+            project_id=platform.database.project_id,
+            keys=SigningKeyCache(
+                cache_path=runtime.id_token_certs_cache_path or DEFAULT_CERTS_CACHE_PATH,
+                keys_file=runtime.id_token_keys_file,
+            ),
+        )
+    return _token_verifier
+
+@timed("auth.get_user")
+async def resolve_auth_user(user_auth_token: str) -> "UserRecord":
+    """ Resolve the x-firebase-user-auth header, a raw uid or a Firebase ID token, to a UserRecord. """
+
+    if runtime.id_tokens and looks_like_id_token(user_auth_token):
+        claims = await get_token_verifier().verify(user_auth_token)
+        return user_record_from_claims(claims)
+
+    return await get_auth_user(user_auth_token)
+
+# never a real user, looked up only to open the Identity Toolkit connection
+WARMUP_UID = "stripe-kitty-hooks-warmup"
+
+async def warm_up_identity():
+    """ Mint the Admin SDK access token, open the Identity Toolkit connection and prefetch ID token certificates. """
+
+    if runtime.id_tokens:
+        await get_token_verifier().keys.get_keys()
+    try:
+        await asyncio.to_thread(auth.get_user, WARMUP_UID)
+    except auth.UserNotFoundError:
+        pass
+
+# Stripe event types whose handlers need the Firebase user, see requires_identity
+IDENTITY_EVENT_TYPES: set[str] = set()
+
+def requires_identity(*event_types: str):
+    """ Register event types whose handlers need the Firebase identity resolved by verify_headers. """
+
+    IDENTITY_EVENT_TYPES.update(event_types)
+
+def peek_event(payload: bytes) -> dict | None:
+    """ Decode an unverified payload to read its type, None if it is not a JSON object. """
+
+    try:
+        data = decode_payload(payload)
+    except EventSignatureError:
+        return None
+    return data if isinstance(data, dict) else None
+
+# Stripe webhook signing secrets by service app
+_signature_verifier: SignatureVerifier | None = None
+
+def get_signature_verifier() -> SignatureVerifier:
+    """ Return the shared webhook signature verifier, creating it on first use. """
+
+    global _signature_verifier
+    if _signature_verifier is None:
+        _signature_verifier = SignatureVerifier(
+            {DEFAULT_SCOPE: [platform.account.webhook_secret or "", *platform.account.webhook_secrets]},
+            secrets_file=runtime.webhook_secrets_file,
+            reload_interval=runtime.webhook_secrets_reload,
+        )
+    return _signature_verifier
+
+# verified requests per secret, to tell when a rotated-out secret stops being used
+register(Collected(
+    "webhook_signature_secret_matches_total",
+    "Verified webhook requests by scope and index of the secret that matched, 0 being the primary one.",
+    ("scope", "secret_index"),
+    lambda: _signature_verifier.match_counts() if _signature_verifier is not None else [],
+    kind="counter",
+))
+
+@traced()
+async def verify_signature(request: Request, data: dict | None = None):
+    """ Verify Stripe webhook signature from request headers. data is the payload decoded by peek_event, if any. """
 
     if sig_header := request.headers.get(STRIPE_SIGNATURE, None):
-        event = stripe.Webhook.construct_event(
-            payload=await request.body(),
+        payload = await request.body()
+        verifier = get_signature_verifier()
+        scope = request.path_params.get("service_app_id", DEFAULT_SCOPE)
+
+        if runtime.fast_events:
+            # HMAC over the raw body and a plain decode, no StripeObject tree
+            verifier.verify(scope, payload, sig_header)
+            # the peeked decode is of these exact verified bytes, reuse it
+            return parse_event(payload, data)
+
+        event = verifier.match(scope, lambda secret: stripe.Webhook.construct_event(
+            payload=payload,
             sig_header=sig_header,
-            secret=platform.account.webhook_secret
-        )
+            secret=secret
+        ))
 
         if not event:
             raise stripe.SignatureVerificationError("Invalid Stripe webhook signature.", sig_header=sig_header)
 
         return event
 
+@traced()
+async def verify_member_auth(user_auth_token: str | UUID) -> "UserRecord":
+    """ Verify Firebase user authentication only. Reads Firebase Auth, never writes the Realtime Database. """
+
+    try:
+        setup_firebase()
+        return await resolve_auth_user(str(user_auth_token))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"System error. Invalid userType configuration. {str(e)}")
+
+@traced()
+async def load_member_profile(user: "UserRecord"):
+    """ Retrieve the profile of a verified user, creating or migrating it when needed. """
+
+    try:
+        return await get_user_profile(user)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"System error. Invalid userType configuration. {str(e)}")
+
+@traced()
+async def verify_id_token_uid(id_token: str) -> str:
+    """ Verify a Firebase ID token and return its uid. Raw uids are refused and nothing is read or written in the database. """
+
+    # a uid is not a secret, browser-facing endpoints need proof the caller is that user
+    if not looks_like_id_token(id_token):
+        raise HTTPException(status_code=401, detail="A Firebase ID token is required.")
+    try:
+        claims = await get_token_verifier().verify(id_token)
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=f"Invalid Firebase ID token: {str(e)}")
+    return claims["uid"]
+
+@traced()
 async def verify_member_profile(user_auth_token: str | UUID):
     """ Verify Firebase user authentication and retrieve user profile. """
 
@@ -42,35 +202,65 @@ async def verify_member_profile(user_auth_token: str | UUID):
     #           - /profiles/{user_id}/*
     #           - /accounts/{user_id}/tokenBalance/*
     #           - /transactions/{user_id}/{timestamp}/*
-    try:
-        setup_firebase()
-        user: UserRecord = auth.get_user(str(user_auth_token))
-        profile = await get_user_profile(user)
-        return user, profile
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"System error. Invalid userType configuration. {str(e)}")
+    user = await verify_member_auth(user_auth_token)
+    return user, await load_member_profile(user)
 
 async def verify_headers(request: Request):
     # Main verification dependency to be used in webhook routes
+    # The signature check and the Firebase Auth lookup are independent, so they
+    # run concurrently and the first failure cancels the other. The profile
+    # lookup may create or migrate profiles, so it only runs once the signature
+    # is valid. Event types nobody handles skip the Firebase lookups entirely.
     sig_key = request.headers.get(STRIPE_SIGNATURE, None)
     auth_key = request.headers.get(FIREBASE_AUTH_SIGNATURE, None)
 
     try:
-        if sig_key is None or auth_key is None:
-            if not sig_key:
-                raise stripe.SignatureVerificationError (f"Missing Stripe signature header. Please add {STRIPE_SIGNATURE} to header.", sig_header=None)
+        if not sig_key:
+            raise stripe.SignatureVerificationError (f"Missing Stripe signature header. Please add {STRIPE_SIGNATURE} to header.", sig_header=None)
+
+        payload = await request.body()
+        # unverified until the signature stage passes, which also proves the peeked type
+        peeked = peek_event(payload)
+        handled = peeked is not None and peeked.get("type") in IDENTITY_EVENT_TYPES
+
+        if handled and not auth_key:
+            raise RuntimeError(f"Missing Firebase auth header. Please add {FIREBASE_AUTH_SIGNATURE} to header.")
+
+        # identity goes first so its read-only Auth lookup overlaps the signature check
+        stages = {}
+        if handled and not runtime.webhook_ack_mode:
+            stages["identity"] = lambda: verify_member_auth(auth_key)
+        stages["signature"] = lambda: verify_signature(request, peeked)
+
+        timings = {}
+        try:
+            results = await run_stages(stages, timings)
+        finally:
+            if "signature" in timings:
+                observe("signature", timings["signature"])
+        stripe_event = results["signature"]
+        # verified, safe to use as a metric label
+        label_request(event_type=stripe_event["type"])
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Webhook verification stages: %s", timings, extra={"stage_seconds": timings})
 
-            if not auth_key:
-                raise RuntimeError(f"Missing Firebase auth header. Please add {FIREBASE_AUTH_SIGNATURE} to header.")
+        if not handled or runtime.webhook_ack_mode:
+            # unhandled types need no identity, in ack mode the background worker resolves it
+            return StripeFirebaseRequest(event=stripe_event, auth_token=auth_key, payload=payload, timings=timings)
 
-        stripe_event = await verify_signature(request)
-        user_auth, user_profile = await verify_member_profile(auth_key)
+        user_auth = results["identity"]
+        # signed by Stripe, safe to write the profile now
+        user_profile = await load_member_profile(user_auth)
 
         if stripe_event and user_auth:
             return StripeFirebaseRequest(
                 event=stripe_event,
                 user=user_profile,
-                auth=user_auth
+                auth=user_auth,
+                auth_token=auth_key,
+                payload=payload,
+                timings=timings,
             )
 
     except Exception as e:
@@ -12,7 +12,8 @@ logger = get_logger(__name__)
 async def internal_error_handler(request: Request, exc: Exception):
     """Handle unexpected server errors."""
     logger.exception(
-        f"Unhandled server error: {exc.__class__.__name__}",
+        "Unhandled server error: %s",
+        exc.__class__.__name__,
         extra={
             "path": request.url.path,
             "error_type": exc.__class__.__name__,
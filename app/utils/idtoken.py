@@ -0,0 +1,218 @@
+# app/utils/idtoken.py
+# Local Firebase ID token verification against cached Google signing certificates
+
+import os
+import re
+import json
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import httpx
+
+from .woodlogs import get_logger
+
+logger = get_logger(__name__)
+
+if TYPE_CHECKING:
+    from firebase_admin._user_mgt import UserRecord
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+DEFAULT_CERTS_CACHE_PATH = Path(tempfile.gettempdir()) / "firebase_securetoken_certs.json"
+# Firebase sign-in providers are reported differently in ID tokens and user records
+PROVIDER_ALIASES = {"email": "password"}
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+class IdTokenError(ValueError):
+    """Raised when a Firebase ID token cannot be verified."""
+
+def looks_like_id_token(value: str) -> bool:
+    """Cheap shape check that separates JWT ID tokens from raw uids."""
+
+    return value.startswith("eyJ") and value.count(".") == 2
+
+class SigningKeyCache:
+    """
+    Google public certificates used to sign Firebase ID tokens.
+
+    Certificates are kept in memory and mirrored to a JSON file on disk so a
+    fresh instance can reuse them, and they expire according to the
+    Cache-Control max-age Google sends. Shortly before expiry a background
+    refresh is scheduled while the current keys keep serving requests.
+
+    Args:
+        url: Certificate endpoint returning a {kid: pem} JSON object.
+        cache_path: File used to persist fetched certificates between processes.
+        keys_file: Static {kid: pem} file. When set, the network is never used.
+        refresh_margin: Seconds before expiry at which a background refresh starts.
+        timeout: Network timeout in seconds for certificate fetches.
+    """
+
+    def __init__(
+        self,
+        url: str = GOOGLE_CERTS_URL,
+        cache_path: Path | None = DEFAULT_CERTS_CACHE_PATH,
+        keys_file: Path | None = None,
+        refresh_margin: float = 300.0,
+        timeout: float = 5.0,
+    ):
+        self.url = url
+        self.cache_path = cache_path
+        self.keys_file = keys_file
+        self.refresh_margin = refresh_margin
+        self.timeout = timeout
+
+        self._keys: dict[str, str] = {}
+        self._expires_at: float = 0.0
+        self._refresh_task: asyncio.Task | None = None
+        self._lock: asyncio.Lock | None = None
+
+    @property
+    def fresh(self) -> bool:
+        return bool(self._keys) and time.time() < self._expires_at
+
+    async def get_keys(self) -> dict[str, str]:
+        """Return current signing certificates keyed by key id."""
+
+        if self.keys_file:
+            if not self._keys:
+                self._keys = await asyncio.to_thread(self._read_json, self.keys_file)
+                self._expires_at = float("inf")
+            return self._keys
+
+        if not self._keys:
+            await asyncio.to_thread(self._load_disk_cache)
+
+        if self.fresh:
+            if time.time() >= self._expires_at - self.refresh_margin:
+                self._schedule_refresh()
+            return self._keys
+
+        await self.refresh()
+        return self._keys
+
+    async def refresh(self):
+        """Fetch certificates from Google and update the memory and disk caches."""
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            # another caller may have refreshed while we waited
+            if self.fresh and time.time() < self._expires_at - self.refresh_margin:
+                return
+
+            async with httpx.AsyncClient(timeout=self.timeout) as client:
+                response = await client.get(self.url)
+                response.raise_for_status()
+
+            max_age = _MAX_AGE.search(response.headers.get("cache-control", ""))
+            self._keys = response.json()
+            self._expires_at = time.time() + (int(max_age.group(1)) if max_age else 3600)
+            await asyncio.to_thread(self._write_disk_cache)
+
+    def _schedule_refresh(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._background_refresh())
+
+    async def _background_refresh(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning("Background refresh of Firebase signing certificates failed: %s", e)
+
+    @staticmethod
+    def _read_json(path: Path) -> dict:
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _load_disk_cache(self):
+        if not self.cache_path or not self.cache_path.exists():
+            return
+        try:
+            data = self._read_json(self.cache_path)
+            if data.get("expires_at", 0) > time.time():
+                self._keys = data["keys"]
+                self._expires_at = data["expires_at"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable certificate cache %s: %s", self.cache_path, e)
+
+    def _write_disk_cache(self):
+        if not self.cache_path:
+            return
+        try:
+            tmp_path = self.cache_path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump({"expires_at": self._expires_at, "keys": self._keys}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning("Could not persist certificate cache to %s: %s", self.cache_path, e)
+
+class FirebaseTokenVerifier:
+    """
+    Verify Firebase ID tokens locally, without a round trip to Identity Toolkit.
+
+    Args:
+        project_id: Firebase project the tokens must be issued for.
+        keys: Source of the signing certificates.
+        clock_skew: Seconds of clock skew tolerated on exp, iat and auth_time.
+    """
+
+    def __init__(self, project_id: str, keys: SigningKeyCache, clock_skew: int = 10):
+        if not project_id:
+            raise ValueError("A Firebase project id is required to verify ID tokens. Please set GCP_PROJECT_ID.")
+
+        self.project_id = project_id
+        self.issuer = f"https://securetoken.google.com/{project_id}"
+        self.keys = keys
+        self.clock_skew = clock_skew
+
+    async def verify(self, token: str) -> dict[str, Any]:
+        """Return the decoded claims of a valid ID token or raise IdTokenError."""
+
+        from google.auth import jwt
+
+        certs = await self.keys.get_keys()
+        try:
+            claims = jwt.decode(token, certs=certs, audience=self.project_id, clock_skew_in_seconds=self.clock_skew)
+        except ValueError as e:
+            raise IdTokenError(f"Invalid Firebase ID token: {e}") from e
+
+        subject = claims.get("sub")
+        if claims.get("iss") != self.issuer:
+            raise IdTokenError(f"Firebase ID token has incorrect issuer. Expected {self.issuer}.")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise IdTokenError("Firebase ID token has an invalid subject.")
+        if claims.get("auth_time", 0) > time.time() + self.clock_skew:
+            raise IdTokenError("Firebase ID token has an auth_time in the future.")
+
+        claims["uid"] = subject
+        return claims
+
+def user_record_from_claims(claims: dict[str, Any]) -> "UserRecord":
+    """Build a UserRecord from verified ID token claims instead of calling auth.get_user."""
+
+    from firebase_admin._user_mgt import UserRecord
+
+    firebase = claims.get("firebase", {})
+    providers = [
+        {
+            "providerId": PROVIDER_ALIASES.get(provider_id, provider_id),
+            "rawId": ids[0] if ids else claims["sub"],
+        }
+        for provider_id, ids in firebase.get("identities", {}).items()
+    ]
+
+    return UserRecord({
+        "localId": claims["sub"],
+        "email": claims.get("email"),
+        "emailVerified": claims.get("email_verified", False),
+        "displayName": claims.get("name"),
+        "photoUrl": claims.get("picture"),
+        "phoneNumber": claims.get("phone_number"),
+        "providerUserInfo": providers,
+        "tenantId": firebase.get("tenant"),
+    })
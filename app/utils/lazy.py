@@ -0,0 +1,78 @@
+# app/utils/lazy.py
+# Deferred imports and initialization to keep heavy work off the cold-start path
+
+import types
+import threading
+import importlib
+from typing import Any, Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+class LazyModule(types.ModuleType):
+    """
+    Stands in for a module that is only imported when one of its attributes is first used.
+
+    Attribute reads are forwarded to the real module, so `lazy.Class.method`
+    is the real object and `unittest.mock.patch` targets through the proxy
+    keep working.
+
+    Args:
+        name: Dotted module name to import.
+        on_load: Optional callable run once with the module right after import.
+    """
+
+    def __init__(self, name: str, on_load: Callable[[types.ModuleType], None] | None = None):
+        super().__init__(name)
+        self.__dict__["_on_load"] = on_load
+        self.__dict__["_module"] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__["_module"]
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            if on_load := self.__dict__["_on_load"]:
+                on_load(module)
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+class LazyObject(Generic[T]):
+    """
+    Proxy that builds its target with `factory` on first attribute access.
+
+    Call `load()` to build it at a chosen time, e.g. in the FastAPI lifespan,
+    instead of on the first request.
+
+    Args:
+        factory: Callable building the target object.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self.__dict__["_factory"] = factory
+        self.__dict__["_target"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.__dict__["_target"] is not None
+
+    def load(self) -> T:
+        """Build the target if needed and return it."""
+
+        target = self.__dict__["_target"]
+        if target is None:
+            with self.__dict__["_lock"]:
+                target = self.__dict__["_target"]
+                if target is None:
+                    target = self.__dict__["_factory"]()
+                    self.__dict__["_target"] = target
+        return target
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.load(), attr)
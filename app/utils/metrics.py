@@ -0,0 +1,298 @@
+# app/utils/metrics.py
+# Webhook latency histograms, outcome counters and queue gauges in the Prometheus text format
+
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Iterable, Iterator
+
+# seconds, from a cached lookup to a slow Firebase round trip
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# label values used before the service app or event is known to be genuine
+UNKNOWN = "unknown"
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Sharded:
+    """
+    Metric values kept per thread, so recording never takes a lock.
+
+    Each thread writes only to its own shard. Rendering sums the shards,
+    which may miss an update in flight but never corrupts one.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+        self._local = threading.local()
+        self._shards: list[dict[tuple, Any]] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> dict[tuple, Any]:
+        shard = getattr(self._local, "values", None)
+        if shard is None:
+            shard = self._local.values = {}
+            # once per thread
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def _series(self) -> list[tuple[tuple, list]]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        totals: dict[tuple, list] = {}
+        for shard in shards:
+            for labels, values in list(shard.items()):
+                total = totals.setdefault(labels, [0] * len(values))
+                for i, value in enumerate(values):
+                    total[i] += value
+        return sorted(totals.items())
+
+class Counter(_Sharded):
+    """Monotonic count per label set."""
+
+    def inc(self, *labels: str, amount: float = 1):
+        shard = self._shard()
+        if (values := shard.get(labels)) is None:
+            values = shard[labels] = [0]
+        values[0] += amount
+
+    def value(self, *labels: str) -> float:
+        return dict(self._series()).get(labels, [0])[0]
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labels, (value,) in self._series():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+class Histogram(_Sharded):
+    """Observations in fixed buckets per label set."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...], buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        shard = self._shard()
+        if (values := shard.get(labels)) is None:
+            # one count per bucket, one for +Inf, then the sum
+            values = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        values[bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def count(self, *labels: str) -> int:
+        values = dict(self._series()).get(labels)
+        return sum(values[:-1]) if values else 0
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, values in self._series():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), values[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {values[-1]}"
+
+class Collected:
+    """
+    Values read from a callback at render time, for state another object keeps.
+
+    Args:
+        name: Metric name.
+        documentation: HELP text.
+        labelnames: Label names of the series.
+        collect: Function returning (label values, value) pairs.
+        kind: Prometheus metric type, "gauge" or "counter".
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...],
+        collect: Callable[[], Iterable[tuple[tuple, float]]],
+        kind: str = "gauge",
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.collect = collect
+        self.kind = kind
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in sorted(self.collect()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+STAGE_SECONDS = Histogram(
+    "webhook_stage_duration_seconds",
+    "Time spent in each webhook processing stage.",
+    ("stage", "service_app_id", "event_type"),
+)
+REQUEST_SECONDS = Histogram(
+    "webhook_request_duration_seconds",
+    "Total time to handle a webhook request.",
+    ("service_app_id", "event_type"),
+)
+OUTCOMES = Counter(
+    "webhook_outcomes_total",
+    "Webhook requests and background jobs by outcome.",
+    ("service_app_id", "event_type", "outcome"),
+)
+
+REGISTRY: list[Counter | Histogram | Collected] = [STAGE_SECONDS, REQUEST_SECONDS, OUTCOMES]
+
+def register(metric: Counter | Histogram | Collected):
+    """Add metric to the /metrics output."""
+
+    REGISTRY.append(metric)
+    return metric
+
+def render() -> str:
+    """Return every metric in the Prometheus text exposition format."""
+
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+class RequestMetrics:
+    """
+    Stage timings and outcome of one webhook request or background job.
+
+    Stages are recorded as they finish and only written to the histograms
+    by `finish`, labeled with the service app and event type known by then.
+    The event type is only set once the signature is verified, so forged
+    payloads cannot create label values.
+    """
+
+    __slots__ = ("service_app_id", "event_type", "outcome", "stages")
+
+    def __init__(self, service_app_id: str = UNKNOWN, event_type: str = UNKNOWN):
+        self.service_app_id = service_app_id
+        self.event_type = event_type
+        self.outcome: str | None = None
+        self.stages: list[tuple[str, float]] = []
+
+    def finish(self, total: float | None = None, outcome: str | None = None):
+        labels = (self.service_app_id, self.event_type)
+        for stage, seconds in self.stages:
+            STAGE_SECONDS.observe(seconds, stage, *labels)
+        self.stages.clear()
+        if total is not None:
+            REQUEST_SECONDS.observe(total, *labels)
+        if outcome := self.outcome or outcome:
+            OUTCOMES.inc(*labels, outcome)
+
+_current: ContextVar[RequestMetrics | None] = ContextVar("request_metrics", default=None)
+
+def current() -> RequestMetrics | None:
+    return _current.get()
+
+def label_request(service_app_id: str | None = None, event_type: str | None = None):
+    """Set the labels of the current request's metrics."""
+
+    if (metrics := _current.get()) is not None:
+        if service_app_id is not None:
+            metrics.service_app_id = service_app_id
+        if event_type is not None:
+            metrics.event_type = event_type
+
+def set_outcome(outcome: str):
+    """Record how the current request or job ended, e.g. "processed" or "ignored"."""
+
+    if (metrics := _current.get()) is not None:
+        metrics.outcome = outcome
+
+def observe(stage: str, seconds: float):
+    """Record a stage timing for the current request or job."""
+
+    if (metrics := _current.get()) is not None:
+        metrics.stages.append((stage, seconds))
+    else:
+        STAGE_SECONDS.observe(seconds, stage, UNKNOWN, UNKNOWN)
+
+@contextmanager
+def track(service_app_id: str, event_type: str):
+    """Label the current request's metrics, or collect and finish them for a job run outside a request."""
+
+    if (metrics := _current.get()) is not None:
+        metrics.service_app_id, metrics.event_type = service_app_id, event_type
+        yield metrics
+        return
+
+    metrics = RequestMetrics(service_app_id, event_type)
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+        metrics.finish()
+
+def timed(stage: str) -> Callable:
+    """Decorate a coroutine function to record its duration as stage."""
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                observe(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing webhook requests and counting their outcomes.
+
+    Handlers label the request and set its outcome through this module;
+    responses with an error status are counted by status code.
+
+    Args:
+        app: The ASGI application.
+        prefix: Paths timed by the middleware.
+    """
+
+    def __init__(self, app, prefix: str = "/webhook"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            return await self.app(scope, receive, send)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            _current.reset(token)
+            if status >= 400:
+                metrics.outcome = str(status)
+            metrics.finish(time.perf_counter() - start, outcome="ok")
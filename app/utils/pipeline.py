@@ -0,0 +1,49 @@
+# app/utils/pipeline.py
+# Concurrent execution of independent request verification stages
+
+import time
+import asyncio
+from typing import Any, Awaitable, Callable
+
+async def run_stages(
+    stages: dict[str, Callable[[], Awaitable[Any]]],
+    timings: dict[str, float] | None = None,
+) -> dict[str, Any]:
+    """Run independent stages concurrently and return their results by name.
+
+    Stages start in the given order, so a stage that awaits I/O right away
+    should come first to overlap with CPU-bound stages after it. The first
+    stage to fail cancels the others and its exception is raised as is.
+    Seconds spent in each finished stage are written to timings.
+    """
+
+    timings = {} if timings is None else timings
+
+    async def timed(name: str, stage: Callable[[], Awaitable[Any]]):
+        start = time.perf_counter()
+        try:
+            return await stage()
+        finally:
+            timings[name] = time.perf_counter() - start
+
+    if len(stages) == 1:
+        # nothing to overlap, skip the task overhead
+        (name, stage), = stages.items()
+        return {name: await timed(name, stage)}
+
+    tasks = {name: asyncio.create_task(timed(name, stage), name=f"stage-{name}") for name, stage in stages.items()}
+    try:
+        await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        # also reached when the caller itself is cancelled
+        unfinished = [task for task in tasks.values() if not task.done()]
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            await asyncio.gather(*unfinished, return_exceptions=True)
+
+    for task in tasks.values():
+        if task.done() and not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+
+    return {name: task.result() for name, task in tasks.items()}
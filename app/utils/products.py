@@ -0,0 +1,160 @@
+# app/utils/products.py
+# Validation and compilation of the Stripe product YAML configuration
+#
+# Build the compiled artifact ahead of time, e.g. in the Docker image:
+#   python -m app.utils.products app/config/prod app/config/.compiled
+
+import os
+import sys
+import pickle
+import hashlib
+from pathlib import Path
+from typing import Any, Literal
+from dataclasses import dataclass, fields
+
+# bump when StripeProductConfig or the validation rules change
+ARTIFACT_VERSION = 2
+PRODUCT_TYPES = ("tokens", "saas")
+
+class ProductConfigError(ValueError):
+    """Raised when a product YAML file does not match the product schema."""
+
+@dataclass(frozen=True)
+class StripeProductConfig:
+    name: str
+    product_id: str
+    price: float
+    price_id: str | None = None
+    lookup_key: str | None = None
+    add_count: int | None = None
+    type: Literal["tokens", "saas"] = "tokens"
+
+PRODUCT_FIELDS = {f.name for f in fields(StripeProductConfig)}
+
+def validate_product(item: Any, source: str) -> StripeProductConfig:
+    """Check one YAML product entry against the schema and return its config."""
+
+    if not isinstance(item, dict):
+        raise ProductConfigError(f"{source}: expected a mapping of product fields, got {type(item).__name__}.")
+
+    name = item.get("name")
+    where = f"{source} product '{name}'"
+
+    if unknown := set(item) - PRODUCT_FIELDS:
+        raise ProductConfigError(f"{where}: unknown fields {sorted(unknown)}, expected {sorted(PRODUCT_FIELDS)}.")
+
+    for key in ("name", "product_id"):
+        if not isinstance(item.get(key), str) or not item[key]:
+            raise ProductConfigError(f"{where}: '{key}' is required and must be a non-empty string.")
+
+    for key in ("price_id", "lookup_key"):
+        if item.get(key) is not None and not isinstance(item[key], str):
+            raise ProductConfigError(f"{where}: '{key}' must be a string.")
+
+    price = item.get("price", 0.0)
+    if isinstance(price, bool) or not isinstance(price, (int, float)) or price < 0:
+        raise ProductConfigError(f"{where}: 'price' must be a non-negative number, got {price!r}.")
+
+    product_type = item.get("type", "tokens")
+    if product_type not in PRODUCT_TYPES:
+        raise ProductConfigError(f"{where}: 'type' must be one of {PRODUCT_TYPES}, got {product_type!r}.")
+
+    add_count = item.get("add_count")
+    if add_count is not None and (isinstance(add_count, bool) or not isinstance(add_count, int) or add_count <= 0):
+        raise ProductConfigError(f"{where}: 'add_count' must be a positive integer, got {add_count!r}.")
+
+    return StripeProductConfig(
+        name=name,
+        product_id=item["product_id"],
+        price=float(price),
+        price_id=item.get("price_id"),
+        lookup_key=item.get("lookup_key"),
+        add_count=add_count,
+        type=product_type,
+    )
+
+def parse_products(config_path: Path) -> dict[str, dict[str, StripeProductConfig]]:
+    """Parse and validate the products of every service app YAML file in config_path."""
+
+    # only needed when there is no compiled artifact
+    import yaml
+
+    apps = {}
+    for file in sorted(config_path.glob("*.yml")):
+        with open(file, "r") as f:
+            data = yaml.safe_load(f)
+
+        if not isinstance(data, list) or not data:
+            raise ProductConfigError(f"Invalid data format in {file}: expected a list of products.")
+
+        products = {}
+        for item in data:
+            product = validate_product(item, file.name)
+            if product.name in products:
+                raise ProductConfigError(f"{file.name}: duplicate product name '{product.name}'.")
+            products[product.name] = product
+            if product.type == "tokens" and product.add_count is None:
+                # loads, but the webhook rejects its checkouts until a token amount is configured
+                print(f"{file.name} product '{product.name}' has no add_count, its checkouts are rejected")
+
+        apps[file.stem] = products
+    return apps
+
+def config_hash(config_path: Path) -> str:
+    """Hash the product YAML files, together with the artifact version they compile to."""
+
+    digest = hashlib.sha256(b"%d" % ARTIFACT_VERSION)
+    for file in sorted(config_path.glob("*.yml")):
+        digest.update(file.name.encode() + b"\0" + file.read_bytes() + b"\0")
+    return digest.hexdigest()
+
+def artifact_path(config_path: Path, cache_dir: Path) -> Path:
+    return cache_dir / f"products-{config_hash(config_path)[:32]}.pickle"
+
+def write_artifact(apps: dict[str, dict[str, StripeProductConfig]], path: Path):
+    """Atomically write a compiled artifact, so readers never see a partial file."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(apps, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+def compile_products(config_path: Path, cache_dir: Path | None = None) -> dict[str, dict[str, StripeProductConfig]]:
+    """Return validated products, from the compiled artifact for these YAML files when one exists.
+
+    The artifact is keyed by the YAML content hash, so edited files are
+    always re-parsed. Without cache_dir the YAML is parsed on every call.
+    """
+
+    if cache_dir is None:
+        return parse_products(config_path)
+
+    path = artifact_path(config_path, cache_dir)
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Ignoring unreadable compiled product config {path}: {e}")
+
+    apps = parse_products(config_path)
+    try:
+        write_artifact(apps, path)
+    except OSError as e:
+        # read-only filesystem, parse again next time
+        print(f"Could not write compiled product config {path}: {e}")
+    return apps
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m app.utils.products <config_path> <cache_dir>")
+
+    # pickle classes under their import path, not __main__
+    from app.utils import products
+
+    source, target = Path(sys.argv[1]), Path(sys.argv[2])
+    compiled = products.parse_products(source)
+    products.write_artifact(compiled, products.artifact_path(source, target))
+    print(f"Compiled {sum(len(p) for p in compiled.values())} products of {len(compiled)} apps to {products.artifact_path(source, target)}")
@@ -3,11 +3,16 @@
 
 import os
 import sys
-import yaml
+import json
+import tempfile
 from pathlib import Path
-from typing import Any, Literal
 from dotenv import load_dotenv
 from dataclasses import dataclass, field
+from .lazy import LazyObject
+from .woodlogs import configure_logging, parse_sample_rates
+from .tracing import build_exporter, configure_tracing
+from .catalog import ProductCatalog, ProductIndex
+from .products import StripeProductConfig, compile_products
 
 # DEFAULT LOCAL DEV PATHS
 DEFAULT_APP_ROOT_PATH = "stripe-payment"
@@ -40,16 +45,23 @@ PROD_ORIGINS = [
     "https://tarot.mimeus.com",
     "https://tarotarot-ai.web.app",
 ]
+CORS_ORIGINS = DEV_ORIGINS if DEV_MODE else PROD_ORIGINS
 
 @dataclass
 class FirebaseConfig:
     url: str
     _service_account_path: Path
+    project_id: str | None = None
 
     def __post_init__(self):
         if not self._service_account_path.exists():
             raise ValueError(f"Firebase service account file not found at {self._service_account_path}")
 
+        if not self.project_id:
+            # fall back to the project the service account belongs to
+            with open(self._service_account_path, "r") as f:
+                self.project_id = json.load(f).get("project_id")
+
 @dataclass(frozen=True)
 class StripeAccountConfig:
     api_key: str
@@ -57,24 +69,91 @@ class StripeAccountConfig:
     restricted_key: str
     webhook_secret: str | None = None
     publishable_key: str | None = None
+    # extra signing secrets accepted for every service app, e.g. while rotating
+    webhook_secrets: tuple[str, ...] = ()
 
 @dataclass(frozen=True)
-class StripeProductConfig:
-    name: str
-    product_id: str
-    price: float
-    price_id: str | None = None
-    lookup_key: str | None = None
-    add_count: int | None = None
-    type: Literal["tokens", "saas"] = "tokens"
+class RuntimeConfig:
+    # Realtime Database REST connection pool
+    rtdb_max_connections: int = 100
+    rtdb_max_keepalive: int = 20
+    rtdb_keepalive_expiry: float = 30.0
+    rtdb_timeout: float = 10.0
+    # per-user coalescing of checkout writes, seconds (0 disables) and writes per batch
+    balance_coalesce_window: float = 0.0
+    balance_coalesce_max_batch: int = 50
+    # Firebase Authentication user record cache
+    auth_cache_size: int = 4096
+    auth_cache_ttl: float = 300.0
+    # validated /profiles/{uid} records
+    profile_cache_size: int = 4096
+    profile_cache_ttl: float = 600.0
+    # local Firebase ID token verification
+    id_tokens: bool = False
+    id_token_keys_file: Path | None = None
+    id_token_certs_cache_path: Path | None = None
+    # verify and decode webhook events without stripe.Webhook.construct_event
+    fast_events: bool = False
+    # per service app webhook signing secrets, re-read when the file changes
+    webhook_secrets_file: Path | None = None
+    webhook_secrets_reload: float = 5.0
+    # seconds between checks of the product YAML files for changes, 0 disables hot reload
+    catalog_watch_interval: float = 0.0
+    # compiled product config artifacts, keyed by the YAML content hash
+    catalog_cache: bool = True
+    catalog_cache_dir: Path = APP_PATH / "config" / ".compiled"
+    # Firebase app, access token and connection warm-up before /ready reports ready
+    warmup_enabled: bool = True
+    warmup_connections: int = 2
+    warmup_timeout: float = 15.0
+    warmup_retry_interval: float = 5.0
+    # log output: uvicorn-style text or Cloud Logging JSON, optionally written by a background thread
+    log_format: str = "text"
+    log_queue: bool = False
+    log_queue_size: int = 10_000
+    log_level: str = "INFO"
+    # sampling and per-template rate limits of repetitive records, errors always pass
+    log_sample_rates: dict[str, float] = field(default_factory=dict)
+    log_rate_limit: float = 0.0
+    log_rate_burst: int = 20
+    log_summary_interval: float = 60.0
+    # head-sampled request tracing, 0 disables it
+    trace_sample_rate: float = 0.0
+    trace_exporter: str = "ring"
+    trace_file: Path | None = None
+    trace_ring_size: int = 1000
+    # processed Stripe event ids remembered in memory
+    event_ledger_size: int = 100_000
+    # acknowledge-then-process webhook mode
+    webhook_ack_mode: bool = False
+    webhook_workers: int = 8
+    webhook_queue_size: int = 1000
+    webhook_enqueue_timeout: float = 1.0
+    webhook_drain_timeout: float = 8.0
+    # /ws/wallet token balance notifications
+    wallet_max_connections: int = 50_000
+    wallet_send_timeout: float = 5.0
+    # durable write-ahead log of verified checkout events
+    wal_enabled: bool = False
+    wal_path: Path = Path(tempfile.gettempdir()) / "stripe-kitty-hooks" / "wal"
+    wal_segment_bytes: int = 16 * 1024 * 1024
+    wal_commit_interval: float = 0.002
+    wal_replay_interval: float = 30.0
+    wal_replay_min_age: float = 60.0
+    wal_max_attempts: int = 60
 
 @dataclass(frozen=True)
 class StripeAppConfig:
-    apps: dict[str, Any]
+    apps: ProductCatalog
     workspace: dict[str, Path]
     account: StripeAccountConfig
     database: FirebaseConfig
-    cors: list[str] = field(default_factory=lambda: DEV_ORIGINS if DEV_MODE else PROD_ORIGINS)
+    cors: list[str] = field(default_factory=lambda: CORS_ORIGINS)
+
+    @property
+    def index(self) -> ProductIndex:
+        # products by price_id, product_id and lookup_key of the current catalog version
+        return self.apps.index
 
 def setup_directory(base_path: Path = APP_PATH, root_base_path: Path = APP_ROOT_PATH) -> dict:
     """Setup and return important file paths."""
@@ -103,6 +182,7 @@ def setup_stripe_account() -> StripeAccountConfig:
     restricted_key = os.getenv("STRIPE_RESTRICTED_KEY", "")
     publishable_key = os.getenv("STRIPE_PUBLISHABLE_KEY", "")
     webhook_secret = os.getenv("STRIPE_WEBHOOK_SECRET", "")
+    webhook_secrets = tuple(s.strip() for s in os.getenv("STRIPE_WEBHOOK_SECRETS", "").split(",") if s.strip())
 
     if not all([secret_key, restricted_key]):
         raise RuntimeError(
@@ -118,32 +198,81 @@ def setup_stripe_account() -> StripeAccountConfig:
         restricted_key=restricted_key,
         publishable_key=publishable_key,
         webhook_secret=webhook_secret,
+        webhook_secrets=webhook_secrets,
+    )
+
+def setup_runtime() -> RuntimeConfig:
+    """Setup runtime tuning options from environment variables."""
+
+    return RuntimeConfig(
+        rtdb_max_connections=int(os.getenv("RTDB_MAX_CONNECTIONS", 100)),
+        rtdb_max_keepalive=int(os.getenv("RTDB_MAX_KEEPALIVE", 20)),
+        rtdb_keepalive_expiry=float(os.getenv("RTDB_KEEPALIVE_EXPIRY", 30.0)),
+        rtdb_timeout=float(os.getenv("RTDB_TIMEOUT", 10.0)),
+        balance_coalesce_window=float(os.getenv("TOKEN_BALANCE_COALESCE_WINDOW", 0.0)),
+        balance_coalesce_max_batch=int(os.getenv("TOKEN_BALANCE_COALESCE_MAX_BATCH", 50)),
+        auth_cache_size=int(os.getenv("FIREBASE_AUTH_CACHE_SIZE", 4096)),
+        auth_cache_ttl=float(os.getenv("FIREBASE_AUTH_CACHE_TTL", 300.0)),
+        profile_cache_size=int(os.getenv("PROFILE_CACHE_SIZE", 4096)),
+        profile_cache_ttl=float(os.getenv("PROFILE_CACHE_TTL", 600.0)),
+        fast_events=os.getenv("STRIPE_FAST_EVENTS", "false").lower() == "true",
+        webhook_secrets_file=Path(secrets_file) if (secrets_file := os.getenv("STRIPE_WEBHOOK_SECRETS_FILE")) else None,
+        webhook_secrets_reload=float(os.getenv("STRIPE_WEBHOOK_SECRETS_RELOAD", 5.0)),
+        catalog_watch_interval=float(os.getenv("PRODUCT_CATALOG_WATCH_INTERVAL", 0.0)),
+        catalog_cache=os.getenv("PRODUCT_CATALOG_CACHE", "true").lower() == "true",
+        catalog_cache_dir=Path(os.getenv("PRODUCT_CATALOG_CACHE_DIR", "") or RuntimeConfig.catalog_cache_dir),
+        warmup_enabled=os.getenv("WARMUP_ENABLED", "true").lower() == "true",
+        warmup_connections=int(os.getenv("WARMUP_CONNECTIONS", 2)),
+        warmup_timeout=float(os.getenv("WARMUP_TIMEOUT", 15.0)),
+        warmup_retry_interval=float(os.getenv("WARMUP_RETRY_INTERVAL", 5.0)),
+        log_format=os.getenv("LOG_FORMAT", "text").lower(),
+        log_queue=os.getenv("LOG_QUEUE", "false").lower() == "true",
+        log_queue_size=int(os.getenv("LOG_QUEUE_SIZE", 10_000)),
+        log_level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        log_sample_rates=parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "")),
+        log_rate_limit=float(os.getenv("LOG_RATE_LIMIT", 0.0)),
+        log_rate_burst=int(os.getenv("LOG_RATE_BURST", 20)),
+        log_summary_interval=float(os.getenv("LOG_SUMMARY_INTERVAL", 60.0)),
+        trace_sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", 0.0)),
+        trace_exporter=os.getenv("TRACE_EXPORTER", "ring").lower(),
+        trace_file=Path(trace_file) if (trace_file := os.getenv("TRACE_FILE")) else None,
+        trace_ring_size=int(os.getenv("TRACE_RING_SIZE", 1000)),
+        event_ledger_size=int(os.getenv("EVENT_LEDGER_CACHE_SIZE", 100_000)),
+        webhook_ack_mode=os.getenv("WEBHOOK_ACK_MODE", "false").lower() == "true",
+        webhook_workers=int(os.getenv("WEBHOOK_WORKERS", 8)),
+        webhook_queue_size=int(os.getenv("WEBHOOK_QUEUE_SIZE", 1000)),
+        webhook_enqueue_timeout=float(os.getenv("WEBHOOK_ENQUEUE_TIMEOUT", 1.0)),
+        webhook_drain_timeout=float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", 8.0)),
+        wallet_max_connections=int(os.getenv("WALLET_MAX_CONNECTIONS", 50_000)),
+        wallet_send_timeout=float(os.getenv("WALLET_SEND_TIMEOUT", 5.0)),
+        wal_enabled=os.getenv("WEBHOOK_WAL", "false").lower() == "true",
+        wal_path=Path(os.getenv("WEBHOOK_WAL_DIR", "") or RuntimeConfig.wal_path),
+        wal_segment_bytes=int(os.getenv("WEBHOOK_WAL_SEGMENT_BYTES", 16 * 1024 * 1024)),
+        wal_commit_interval=float(os.getenv("WEBHOOK_WAL_COMMIT_INTERVAL", 0.002)),
+        wal_replay_interval=float(os.getenv("WEBHOOK_WAL_REPLAY_INTERVAL", 30.0)),
+        wal_replay_min_age=float(os.getenv("WEBHOOK_WAL_REPLAY_MIN_AGE", 60.0)),
+        wal_max_attempts=int(os.getenv("WEBHOOK_WAL_MAX_ATTEMPTS", 60)),
+        id_tokens=os.getenv("FIREBASE_ID_TOKENS", "false").lower() == "true",
+        id_token_keys_file=Path(keys_file) if (keys_file := os.getenv("FIREBASE_ID_TOKEN_KEYS_FILE")) else None,
+        id_token_certs_cache_path=Path(cache_path) if (cache_path := os.getenv("FIREBASE_ID_TOKEN_CERTS_CACHE")) else None,
     )
 
+def load_products(config_path: Path) -> dict[str, dict[str, StripeProductConfig]]:
+    """Load the validated Stripe products of every service app YAML file in config_path."""
+
+    cache_dir = runtime.catalog_cache_dir if runtime.catalog_cache else None
+    apps = compile_products(config_path, cache_dir)
+    for app_name, products in apps.items():
+        print(f"Loading {len(products)} Products for App: {app_name}")
+    return apps
 
 def setup_workspace():
     """Setup Stripe products configuration."""
 
     try:
         dir_path = setup_directory()
-        apps = {}
-        for file in dir_path["config_path"].glob("*.yml"):
-            app_name = str(file.stem)
-
-            apps[app_name] = {}
-            with open(file, "r") as f:
-                data = yaml.safe_load(f)
-                if isinstance(data, list):
-                    for idx, item in enumerate(data):
-                        item_name = item.get("name", "unknown_product")
-                        apps[app_name][item_name] = StripeProductConfig(
-                            name=item_name,
-                            product_id=item.get("product_id", ""),
-                            price=item.get("price", 0.0),
-                        )
-                    print(f"Loading {idx + 1} Products for App: {app_name}")
-                else:
-                    raise ValueError(f"Invalid data format in {file}: expected a list of products.")
+        config_path = dir_path["config_path"]
+        apps = ProductCatalog(lambda: load_products(config_path), source=config_path)
 
         if DEV_MODE is True:
             service_account_path = dir_path["app_path"] / "config" / "_secrets" / "serviceAccount.json"
@@ -154,9 +283,13 @@ def setup_workspace():
         acc = setup_stripe_account()
         fb = FirebaseConfig(
             url=os.getenv("GCP_FIREBASE_DATABASE_URL", ""),
-            _service_account_path=service_account_path
+            _service_account_path=service_account_path,
+            project_id=os.getenv("GCP_PROJECT_ID", "") or None,
         )
-        return StripeAppConfig(apps=apps, workspace=dir_path, account=acc, database=fb)
+        config = StripeAppConfig(apps=apps, workspace=dir_path, account=acc, database=fb)
+        for service_app_id, field_name, value in sorted(config.index.ambiguous):
+            print(f"Not routing by {field_name} '{value}' for App: {service_app_id}, it is shared by several products")
+        return config
 
     except Exception as e:
         raise RuntimeError(f"Error Setting up workspace: Stripe products configuration: {e}")
@@ -164,4 +297,20 @@ def setup_workspace():
 
 print(f"SCRIPT CALLED FROM FILE: {REL_FILE_PATH}")
 print(f"APP ROOT PATH: {APP_ROOT_PATH}\nAPP PATH: {APP_PATH}")
-platform = setup_workspace()
+runtime = setup_runtime()
+configure_logging(
+    runtime.log_format,
+    use_queue=runtime.log_queue,
+    queue_size=runtime.log_queue_size,
+    level=runtime.log_level,
+    sample_rates=runtime.log_sample_rates,
+    rate_limit=runtime.log_rate_limit,
+    rate_burst=runtime.log_rate_burst,
+    summary_interval=runtime.log_summary_interval,
+)
+configure_tracing(
+    runtime.trace_sample_rate,
+    build_exporter(runtime.trace_exporter, runtime.trace_file, runtime.trace_ring_size),
+)
+# built on first use, or by platform.load() in the app lifespan, instead of at import
+platform: StripeAppConfig = LazyObject(setup_workspace)
@@ -0,0 +1,390 @@
+# app/utils/tracing.py
+# Lightweight request tracing with head sampling and pluggable span exporters
+
+import time
+import random
+import threading
+from pathlib import Path
+from collections import deque
+from functools import wraps
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Protocol
+
+import orjson
+
+from .woodlogs import get_logger
+
+logger = get_logger(__name__)
+
+SERVICE_NAME = "stripe-kitty-hooks"
+
+@dataclass(frozen=True, slots=True)
+class SpanContext:
+    """Identifies a span across tasks, workers and processes."""
+    trace_id: str
+    span_id: str
+    sampled: bool = True
+
+    @classmethod
+    def from_traceparent(cls, header: str | None) -> "SpanContext | None":
+        """Parse a W3C traceparent header, None if it is missing or malformed."""
+
+        parts = header.strip().split("-") if header else ()
+        if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+            return None
+        try:
+            int(parts[1], 16), int(parts[2], 16)
+            flags = int(parts[3], 16)
+        except ValueError:
+            return None
+        return cls(parts[1], parts[2], bool(flags & 1))
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+class _Trace:
+    """Finished spans of one trace in this process, exported together when its local root ends."""
+
+    __slots__ = ("spans", "exported")
+
+    def __init__(self):
+        self.spans: list[Span] = []
+        self.exported = False
+
+class Span:
+    """
+    One timed operation of a sampled trace.
+
+    Args:
+        name: Operation name, e.g. "verify_signature" or "rtdb.GET".
+        context: Trace and span ids of this span.
+        parent_id: Span id of the parent, None for a trace root.
+        kind: "server" for request roots, "internal" otherwise.
+        attributes: Initial span attributes.
+    """
+
+    __slots__ = ("name", "context", "parent_id", "kind", "attributes", "start_ns", "end_ns", "error", "_trace")
+
+    def __init__(self, name: str, context: SpanContext, parent_id: str | None, kind: str, attributes: dict[str, Any], trace: _Trace):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self.error: str | None = None
+        self._trace = trace
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+class SpanExporter(Protocol):
+    def export(self, spans: list[Span]): ...
+
+class RingBufferExporter:
+    """
+    Keeps the most recent finished spans in memory.
+
+    Args:
+        maxlen: Number of spans kept, older ones are discarded.
+    """
+
+    def __init__(self, maxlen: int = 1000):
+        self.spans: deque[Span] = deque(maxlen=maxlen)
+
+    def export(self, spans: list[Span]):
+        self.spans.extend(spans)
+
+    def traces(self) -> dict[str, list[Span]]:
+        """Return the buffered spans grouped by trace id."""
+
+        grouped: dict[str, list[Span]] = {}
+        for span in list(self.spans):
+            grouped.setdefault(span.context.trace_id, []).append(span)
+        return grouped
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def otlp_span(span: Span) -> dict[str, Any]:
+    """Encode a span as an OTLP/JSON span."""
+
+    encoded = {
+        "traceId": span.context.trace_id,
+        "spanId": span.context.span_id,
+        "name": span.name,
+        # SPAN_KIND_SERVER or SPAN_KIND_INTERNAL
+        "kind": 2 if span.kind == "server" else 1,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns or span.start_ns),
+        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items() if value is not None],
+        # STATUS_CODE_OK or STATUS_CODE_ERROR
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+    }
+    if span.parent_id:
+        encoded["parentSpanId"] = span.parent_id
+    return encoded
+
+class OTLPFileExporter:
+    """
+    Appends spans to a file as OTLP/JSON lines, one ExportTraceServiceRequest per trace.
+
+    The format matches the OpenTelemetry Collector file exporter, so the
+    file can be replayed into a collector or inspected in tests.
+
+    Args:
+        path: File the JSON lines are appended to.
+        service_name: service.name resource attribute.
+    """
+
+    def __init__(self, path: Path, service_name: str = SERVICE_NAME):
+        self.path = Path(path)
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    def export(self, spans: list[Span]):
+        request = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{
+                    "scope": {"name": "app.utils.tracing"},
+                    "spans": [otlp_span(span) for span in spans],
+                }],
+            }],
+        }
+        line = orjson.dumps(request) + b"\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(line)
+
+class Tracer:
+    """
+    Creates spans and hands finished traces to an exporter.
+
+    Sampling is decided once at the root of a trace: unsampled traces and
+    code running outside any trace create no spans at all, so tracing costs
+    a context variable lookup per instrumented call when it is off.
+
+    Args:
+        exporter: Receives the finished spans of each trace.
+        sample_rate: Fraction of new traces recorded, 0 disables tracing.
+    """
+
+    def __init__(self, exporter: SpanExporter | None = None, sample_rate: float = 0.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate if exporter is not None else 0.0
+        self.export_failures = 0
+
+    def _sample(self, parent: SpanContext | None) -> bool:
+        if self.exporter is None:
+            return False
+        if parent is not None:
+            return parent.sampled
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start_root(self, name: str, parent: SpanContext | None = None, kind: str = "server", **attributes) -> Span | SpanContext | None:
+        """Start the local root of a trace, continuing parent when given.
+
+        Returns a Span when sampled, otherwise the unsampled context to
+        propagate, or None when there is nothing to trace.
+        """
+
+        if not self._sample(parent):
+            return SpanContext(parent.trace_id, parent.span_id, False) if parent is not None else None
+
+        trace_id = parent.trace_id if parent is not None else f"{random.getrandbits(128):032x}"
+        context = SpanContext(trace_id, f"{random.getrandbits(64):016x}")
+        return Span(name, context, parent.span_id if parent else None, kind, attributes, _Trace())
+
+    def start_child(self, name: str, parent: Span, **attributes) -> Span:
+        context = SpanContext(parent.context.trace_id, f"{random.getrandbits(64):016x}")
+        return Span(name, context, parent.context.span_id, "internal", attributes, parent._trace)
+
+    def end(self, span: Span, local_root: bool = False):
+        span.end_ns = time.time_ns()
+        trace = span._trace
+        if local_root or trace.exported:
+            # spans of background tasks that outlive their root are exported on their own
+            spans = [*trace.spans, span] if not trace.exported else [span]
+            trace.spans = []
+            trace.exported = True
+            try:
+                self.exporter.export(spans)
+            except Exception as e:
+                self.export_failures += 1
+                logger.warning("Span export failed: %s", e)
+        else:
+            trace.spans.append(span)
+
+tracer = Tracer()
+
+# the innermost span of the running task, or the unsampled context of its trace
+_current: ContextVar[Span | SpanContext | None] = ContextVar("current_span", default=None)
+
+def configure_tracing(sample_rate: float = 0.0, exporter: SpanExporter | None = None):
+    """Replace the process tracer."""
+    global tracer
+
+    tracer = Tracer(exporter, sample_rate)
+
+def build_exporter(kind: str, path: Path | None = None, ring_size: int = 1000) -> SpanExporter | None:
+    """Return the exporter named by TRACE_EXPORTER: "ring", "otlp-file" or "none"."""
+
+    if kind == "ring":
+        return RingBufferExporter(ring_size)
+    if kind == "otlp-file":
+        if path is None:
+            raise ValueError("TRACE_FILE is required for the otlp-file trace exporter.")
+        return OTLPFileExporter(path)
+    if kind == "none":
+        return None
+    raise ValueError(f"Invalid TRACE_EXPORTER '{kind}': expected 'ring', 'otlp-file' or 'none'.")
+
+def current_span() -> Span | None:
+    """Return the active sampled span, if any."""
+
+    span = _current.get()
+    return span if isinstance(span, Span) else None
+
+def current_context() -> SpanContext | None:
+    """Return the context to hand to work continued elsewhere, e.g. a background worker."""
+
+    span = _current.get()
+    return span.context if isinstance(span, Span) else span
+
+def _record_error(span: Span, error: BaseException):
+    span.error = f"{type(error).__name__}: {error}"
+
+@contextmanager
+def root_span(name: str, parent: SpanContext | None = None, kind: str = "server", **attributes) -> Iterator[Span | None]:
+    """Open the local root span of a request or background job, continuing parent when given."""
+
+    if _current.get() is not None and (parent is None or parent == current_context()):
+        # already inside this trace, e.g. a job processed inline by its request
+        with span(name, **attributes) as child:
+            yield child
+        return
+
+    started = tracer.start_root(name, parent, kind, **attributes)
+    if started is None:
+        yield None
+        return
+
+    token = _current.set(started)
+    try:
+        yield started if isinstance(started, Span) else None
+    except BaseException as e:
+        if isinstance(started, Span):
+            _record_error(started, e)
+        raise
+    finally:
+        _current.reset(token)
+        if isinstance(started, Span):
+            tracer.end(started, local_root=True)
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span | None]:
+    """Open a child of the active span. Does nothing outside a sampled trace."""
+
+    parent = _current.get()
+    if not isinstance(parent, Span):
+        yield None
+        return
+
+    child = tracer.start_child(name, parent, **attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        _record_error(child, e)
+        raise
+    finally:
+        _current.reset(token)
+        tracer.end(child)
+
+def traced(name: str | None = None) -> Callable:
+    """Decorate a coroutine function to run in a child span named after it."""
+
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__name__
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not isinstance(_current.get(), Span):
+                return await func(*args, **kwargs)
+            with span(span_name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the root span of every HTTP request.
+
+    An incoming W3C traceparent header is continued, including its sampling
+    decision. The span is renamed to the matched route template once known.
+
+    Args:
+        app: The ASGI application.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        parent = None
+        for key, value in scope.get("headers", ()):
+            if key == b"traceparent":
+                parent = SpanContext.from_traceparent(value.decode("latin-1"))
+                break
+
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        method = scope.get("method", "GET")
+        with root_span(f"{method} {scope['path']}", parent, **{"http.method": method, "http.target": scope["path"]}) as root:
+            try:
+                await self.app(scope, receive, send_status)
+            finally:
+                if root is not None:
+                    if route := scope.get("route"):
+                        root.name = f"{method} {route.path}"
+                    root.set_attribute("http.status_code", status)
+                    if status >= 500 and root.error is None:
+                        root.error = f"HTTP {status}"
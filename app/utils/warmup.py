@@ -0,0 +1,94 @@
+# app/utils/warmup.py
+# Startup warm-up stages tracked for the readiness probe
+
+import time
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from .woodlogs import get_logger
+
+logger = get_logger(__name__)
+
+class WarmUp:
+    """
+    Runs startup stages once in the background and reports readiness.
+
+    Stages run in order and each must succeed before the next starts, so a
+    stage can rely on the ones before it. A stage that fails or times out
+    is retried after `retry_interval` seconds, and `ready` stays False
+    until every stage has succeeded once.
+
+    Args:
+        stages: Stage name to zero-argument coroutine function, in run order.
+        timeout: Seconds one attempt of a stage may take.
+        retry_interval: Seconds between attempts of a failing stage.
+    """
+
+    def __init__(
+        self,
+        stages: dict[str, Callable[[], Awaitable[Any]]],
+        timeout: float = 15.0,
+        retry_interval: float = 5.0,
+    ):
+        self.stages = stages
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+
+        self.results: dict[str, dict[str, Any]] = {name: {"ok": False, "attempts": 0} for name in stages}
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def ready(self) -> bool:
+        return all(result["ok"] for result in self.results.values())
+
+    async def run_stage(self, name: str) -> bool:
+        result = self.results[name]
+        result["attempts"] += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.stages[name](), timeout=self.timeout)
+        except Exception as e:
+            result["error"] = str(e) or type(e).__name__
+            logger.warning("Warm-up stage %s failed (attempt %d): %s", name, result["attempts"], result["error"])
+            return False
+        finally:
+            result["seconds"] = round(time.perf_counter() - start, 4)
+
+        result["ok"] = True
+        result.pop("error", None)
+        logger.info("Warm-up stage %s done in %.0f ms", name, result["seconds"] * 1000)
+        return True
+
+    async def run(self):
+        """Run every stage until it succeeds."""
+
+        self.started_at = time.time()
+        for name in self.stages:
+            while not await self.run_stage(name):
+                await asyncio.sleep(self.retry_interval)
+        self.finished_at = time.time()
+        logger.info("Warm-up complete in %.2f s", self.finished_at - self.started_at)
+
+    def start(self) -> asyncio.Task:
+        """Start the stages in a background task, so the server accepts connections meanwhile."""
+
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(), name="warmup")
+        return self._task
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def status(self) -> dict[str, Any]:
+        """Return readiness with the timing, attempts and last error of each stage."""
+
+        return {
+            "ready": self.ready,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "stages": self.results,
+        }
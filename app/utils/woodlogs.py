@@ -2,9 +2,17 @@
 # Sets up loggers with uvicorn format for FastAPI applications
 from __future__ import annotations
 
-import logging
 import sys
-from copy import copy
+import time
+import queue
+import atexit
+import logging
+import threading
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import orjson
 
 # Uvicorn color codes
 GREY = "\033[90m"
@@ -15,6 +23,9 @@ RED = "\033[91m"
 BOLD_RED = "\033[1;91m"
 RESET = "\033[0m"
 
+# attributes every LogRecord has, anything else was passed through `extra`
+RECORD_ATTRIBUTES = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "taskName"}
+
 class UvicornFormatter(logging.Formatter):
     """Custom formatter that matches uvicorn's CLI styling."""
 
@@ -27,15 +38,314 @@ class UvicornFormatter(logging.Formatter):
     }
 
     def format(self, record: logging.LogRecord) -> str:
-        # Create a copy to avoid modifying the original record
-        record = copy(record)
-
-        # Apply color to level name
+        # Apply color to level name without modifying the shared record
         level_color = self.LEVEL_COLORS.get(record.levelno, RESET)
-        record.levelname = f"{level_color}{record.levelname:<8}{RESET}"
+        levelname = f"{level_color}{record.levelname:<8}{RESET}"
 
         # Format: INFO:     taro.module - message
-        return f"{record.levelname} {BLUE}{record.name}{RESET} - {record.getMessage()}"
+        line = f"{levelname} {BLUE}{record.name}{RESET} - {record.getMessage()}"
+        if record.exc_info:
+            line = f"{line}\n{self.formatException(record.exc_info)}"
+        return line
+
+class CloudLoggingFormatter(logging.Formatter):
+    """
+    Compact one-line JSON in the structured format Cloud Logging parses.
+
+    severity, message, time and source location map onto the log entry,
+    and every `extra={...}` field is kept as a top-level jsonPayload key.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "severity": record.levelname,
+            "message": record.getMessage(),
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "logger": record.name,
+            "logging.googleapis.com/sourceLocation": {
+                "file": record.pathname,
+                "line": record.lineno,
+                "function": record.funcName,
+            },
+        }
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            # picked up by Error Reporting
+            entry["stack_trace"] = "".join(traceback.format_exception(*record.exc_info))
+
+        return orjson.dumps(entry, default=str).decode()
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Enqueues records as they are, leaving all formatting to the listener thread.
+
+    QueueHandler.prepare formats the message on the calling thread so records
+    can cross process boundaries; within one process that is wasted work on
+    the request path. Records that do not fit in the queue are dropped and
+    counted rather than blocking the caller.
+    """
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DeferredQueueHandler.dropped += 1
+
+def parse_sample_rates(value: str) -> dict[str, float]:
+    """Parse "key=rate;key=rate" where key is a logger name or a message template."""
+
+    rates = {}
+    for item in value.split(";"):
+        if not item.strip():
+            continue
+        key, sep, rate = item.rpartition("=")
+        if not sep or not key.strip():
+            raise ValueError(f"Invalid LOG_SAMPLE_RATES entry '{item}': expected <logger or message>=<rate>.")
+        rates[key.strip()] = float(rate)
+        if not 0.0 <= rates[key.strip()] <= 1.0:
+            raise ValueError(f"Invalid LOG_SAMPLE_RATES entry '{item}': rate must be between 0 and 1.")
+    return rates
+
+class _TemplateState:
+    __slots__ = ("credit", "tokens", "refilled_at", "suppressed", "level")
+
+    def __init__(self, tokens: float, now: float):
+        # the first record of a template is always kept
+        self.credit = 1.0
+        self.tokens = tokens
+        self.refilled_at = now
+        self.suppressed = 0
+        self.level = logging.NOTSET
+
+class LogSampler(logging.Filter):
+    """
+    Drops repetitive records before they are formatted or enqueued.
+
+    Each (logger, message template) pair is sampled at the rate configured for
+    its template, else for its logger or closest parent logger, and then
+    limited by a token bucket of `rate_limit` records per second. Counting
+    is deterministic, a 0.1 rate keeps the first record and every tenth after it. Records
+    at ERROR and above always pass. Every `summary_interval` seconds, one
+    "N similar messages suppressed" record per template is logged in place
+    of what was dropped.
+
+    Keys are message templates, so log with %-style arguments rather than
+    f-strings for records to be grouped.
+
+    Args:
+        sample_rates: Logger name or message template to the fraction of records kept.
+        rate_limit: Records per second kept per template, 0 for no limit.
+        burst: Records a template may log at once before the rate limit applies.
+        summary_interval: Seconds between suppression summaries.
+        max_templates: Templates tracked at once, records of further templates pass unsampled.
+    """
+
+    SUMMARY_ATTRIBUTE = "suppressed"
+
+    def __init__(
+        self,
+        sample_rates: dict[str, float] | None = None,
+        rate_limit: float = 0.0,
+        burst: int = 20,
+        summary_interval: float = 60.0,
+        max_templates: int = 1024,
+    ):
+        super().__init__()
+        self.configure(sample_rates, rate_limit, burst, summary_interval, max_templates)
+
+    def configure(
+        self,
+        sample_rates: dict[str, float] | None = None,
+        rate_limit: float = 0.0,
+        burst: int = 20,
+        summary_interval: float = 60.0,
+        max_templates: int = 1024,
+    ):
+        self.sample_rates = dict(sample_rates or {})
+        self.rate_limit = rate_limit
+        self.burst = max(burst, 1)
+        self.summary_interval = summary_interval
+        self.max_templates = max_templates
+        self.active = bool(self.sample_rates) or rate_limit > 0
+
+        self._lock = threading.Lock()
+        self._states: dict[tuple[str, str], _TemplateState] = {}
+        self._logger_rates: dict[str, float] = {}
+        self._summary_at = time.monotonic() + summary_interval
+        self.suppressed_total = 0
+
+    def _rate(self, name: str, template: str) -> float:
+        if (rate := self.sample_rates.get(template)) is not None:
+            return rate
+        if (rate := self._logger_rates.get(name)) is None:
+            # closest configured parent, e.g. "app.api" for "app.api.webhook"
+            rate, parent = 1.0, name
+            while parent:
+                if parent in self.sample_rates:
+                    rate = self.sample_rates[parent]
+                    break
+                parent = parent.rpartition(".")[0]
+            self._logger_rates[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.active or record.levelno >= logging.ERROR or hasattr(record, self.SUMMARY_ATTRIBUTE):
+            return True
+
+        now = time.monotonic()
+        key = (record.name, str(record.msg))
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                if len(self._states) >= self.max_templates:
+                    return True
+                state = self._states[key] = _TemplateState(self.burst, now)
+
+            keep = True
+            if (rate := self._rate(record.name, key[1])) < 1.0:
+                if state.credit >= 1.0 - 1e-9:
+                    state.credit -= 1.0
+                else:
+                    keep = False
+                state.credit += rate
+
+            if keep and self.rate_limit > 0:
+                state.tokens = min(self.burst, state.tokens + (now - state.refilled_at) * self.rate_limit)
+                state.refilled_at = now
+                if state.tokens >= 1.0:
+                    state.tokens -= 1.0
+                else:
+                    keep = False
+
+            if not keep:
+                state.suppressed += 1
+                state.level = max(state.level, record.levelno)
+                self.suppressed_total += 1
+
+            summarize = now >= self._summary_at
+            if summarize:
+                self._summary_at = now + self.summary_interval
+
+        if summarize:
+            self.flush()
+        return keep
+
+    def flush(self):
+        """Log a summary for every template with suppressed records and reset their counts."""
+
+        with self._lock:
+            pending = [(key, state.suppressed, state.level) for key, state in self._states.items() if state.suppressed]
+            for key, *_ in pending:
+                self._states[key].suppressed = 0
+                self._states[key].level = logging.NOTSET
+
+        for (name, template), count, level in pending:
+            logger = logging.getLogger(name)
+            if logger.isEnabledFor(level):
+                logger.log(
+                    level,
+                    "%d similar messages suppressed: %s",
+                    count,
+                    template,
+                    extra={self.SUMMARY_ATTRIBUTE: count, "template": template},
+                )
+
+# Sampling shared by every logger from get_logger, inactive until configured
+_sampler = LogSampler()
+
+# Output shared by every logger from get_logger, replaced by configure_logging
+_loggers: list[logging.Logger] = []
+_handler: logging.Handler | None = None
+_listener: QueueListener | None = None
+_level: int = logging.INFO
+
+def _stream_handler(log_format: str) -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(CloudLoggingFormatter() if log_format == "json" else UvicornFormatter())
+    return handler
+
+def configure_logging(
+    log_format: str = "text",
+    use_queue: bool = False,
+    queue_size: int = 10_000,
+    level: int | str | None = None,
+    sample_rates: dict[str, float] | None = None,
+    rate_limit: float = 0.0,
+    rate_burst: int = 20,
+    summary_interval: float = 60.0,
+):
+    """
+    Choose the output and level of every woodlogs logger.
+
+    Args:
+        log_format: "text" for uvicorn-style colored lines, "json" for Cloud Logging structured lines.
+        use_queue: Enqueue records on the calling thread and format and write them in a background thread.
+        queue_size: Records buffered in queue mode before new ones are dropped.
+        level: Minimum level logged, e.g. "WARNING". Calls below it return before building the record.
+        sample_rates: Logger name or message template to the fraction of records kept, see LogSampler.
+        rate_limit: Records per second kept per message template, 0 for no limit.
+        rate_burst: Records a template may log at once before the rate limit applies.
+        summary_interval: Seconds between "N similar messages suppressed" summaries.
+    """
+    global _listener, _level
+
+    if log_format not in ("text", "json"):
+        raise ValueError(f"Invalid LOG_FORMAT '{log_format}': expected 'text' or 'json'.")
+
+    if level is not None:
+        _level = logging.getLevelName(level.upper()) if isinstance(level, str) else level
+        if not isinstance(_level, int):
+            raise ValueError(f"Invalid LOG_LEVEL '{level}'.")
+        for logger in _loggers:
+            logger.setLevel(_level)
+
+    _sampler.flush()
+    _sampler.configure(sample_rates, rate_limit, rate_burst, summary_interval)
+
+    output = _stream_handler(log_format)
+    listener = None
+    if use_queue:
+        listener = QueueListener(queue.Queue(maxsize=queue_size), output, respect_handler_level=True)
+        handler = DeferredQueueHandler(listener.queue)
+    else:
+        handler = output
+
+    previous_listener = _listener
+    _listener = listener
+    if listener is not None:
+        listener.start()
+    _use_handler(handler)
+
+    if previous_listener is not None:
+        previous_listener.stop()
+
+def _use_handler(handler: logging.Handler):
+    global _handler
+
+    previous, _handler = _handler, handler
+    for logger in _loggers:
+        if previous is not None:
+            logger.removeHandler(previous)
+        logger.addHandler(handler)
+
+def shutdown_logging():
+    """Write out records still queued and log directly from then on. Safe to call more than once."""
+    global _listener
+
+    _sampler.flush()
+    if _listener is not None:
+        listener, _listener = _listener, None
+        _use_handler(listener.handlers[0])
+        listener.stop()
+
+atexit.register(shutdown_logging)
 
 def get_logger(name: str | None = None, **kwargs) -> logging.Logger:
     """
@@ -46,20 +356,23 @@ def get_logger(name: str | None = None, **kwargs) -> logging.Logger:
               If None, returns root logger.
 
     Returns:
-        Logger instance with uvicorn-style formatting and colors.
+        Logger instance writing through the output chosen by configure_logging.
     """
+    global _handler
+
     logger_name = name if name else "uvicorn"
     logger = logging.getLogger(logger_name)
 
     # Only configure if not already configured
     if not logger.handlers:
-        logger.setLevel(kwargs.get("debug_level", logging.INFO))
+        logger.setLevel(kwargs.get("debug_level", _level))
 
-        handler = logging.StreamHandler(sys.stdout)
-        handler.setLevel(kwargs.get("debug_level", logging.INFO))
-        handler.setFormatter(UvicornFormatter())
+        if _handler is None:
+            _handler = _stream_handler("text")
 
-        logger.addHandler(handler)
+        logger.addHandler(_handler)
+        logger.addFilter(_sampler)
         logger.propagate = False
+        _loggers.append(logger)
 
-    return logger
\ No newline at end of file
+    return logger
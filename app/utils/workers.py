@@ -0,0 +1,155 @@
+# app/utils/workers.py
+# Bounded in-process work queue drained by a pool of async workers
+
+import time
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from .woodlogs import get_logger
+
+logger = get_logger(__name__)
+
+class _TimedQueue(asyncio.Queue):
+    """FIFO queue of (enqueued_at, item) entries that can peek at its oldest entry."""
+
+    def oldest(self) -> float | None:
+        return self._queue[0][0] if self._queue else None
+
+class WorkerPool:
+    """
+    Bounded asyncio queue drained by a fixed number of worker tasks.
+
+    `submit` applies backpressure: when the queue is full it waits up to
+    `put_timeout` seconds for room and otherwise reports False so the caller
+    can do the work inline instead of dropping it.
+
+    Args:
+        handler: Coroutine function called with each submitted item.
+        workers: Number of concurrent worker tasks.
+        maxsize: Maximum number of queued items.
+        put_timeout: Seconds `submit` waits for room in a full queue.
+        name: Label used in logs and task names.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[Any]],
+        workers: int = 8,
+        maxsize: int = 1000,
+        put_timeout: float = 1.0,
+        name: str = "worker",
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.maxsize = maxsize
+        self.put_timeout = put_timeout
+        self.name = name
+
+        self._queue: _TimedQueue | None = None
+        self._tasks: list[asyncio.Task] = []
+
+        self.submitted = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self.lag_total = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    @property
+    def oldest_lag(self) -> float:
+        """Seconds the oldest queued item has waited for a worker, 0 when the queue is empty."""
+
+        enqueued_at = self._queue.oldest() if self._queue else None
+        return time.monotonic() - enqueued_at if enqueued_at is not None else 0.0
+
+    def start(self):
+        """Start the worker tasks on the running event loop."""
+
+        if self.running:
+            return
+
+        self._queue = _TimedQueue(maxsize=self.maxsize)
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"{self.name}-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info("Started %d %s workers (queue size %d)", self.workers, self.name, self.maxsize)
+
+    async def submit(self, item: Any) -> bool:
+        """Queue item for a worker. Returns False if the queue stayed full and the caller should handle it."""
+
+        if not self.running:
+            self.start()
+
+        entry = (time.monotonic(), item)
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(entry), timeout=self.put_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                logger.warning("%s queue full (%d), handling item inline", self.name, self.maxsize)
+                return False
+
+        self.submitted += 1
+        return True
+
+    async def _work(self):
+        while True:
+            enqueued_at, item = await self._queue.get()
+            lag = time.monotonic() - enqueued_at
+            self.lag_last = lag
+            self.lag_max = max(self.lag_max, lag)
+            self.lag_total += lag
+            try:
+                await self.handler(item)
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("%s worker failed to handle queued item", self.name)
+            finally:
+                self._queue.task_done()
+
+    async def drain(self, timeout: float = 10.0):
+        """Wait up to timeout seconds for queued items to finish, then stop the workers."""
+
+        if not self.running:
+            return
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error("%s queue not drained within %ss, %d items abandoned", self.name, timeout, self.depth)
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict[str, Any]:
+        """Return queue depth, throughput and lag counters."""
+
+        handled = self.processed + self.failed
+        return {
+            "depth": self.depth,
+            "maxsize": self.maxsize,
+            "workers": len(self._tasks),
+            "submitted": self.submitted,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "lag_last_seconds": self.lag_last,
+            "lag_max_seconds": self.lag_max,
+            "oldest_lag_seconds": self.oldest_lag,
+            "lag_avg_seconds": self.lag_total / handled if handled else 0.0,
+        }
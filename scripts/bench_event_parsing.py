@@ -0,0 +1,110 @@
+# scripts/bench_event_parsing.py
+# Microbenchmark of webhook event verification and parsing.
+#
+# Compares stripe.Webhook.construct_event with the fast path in
+# app/src/events.py on a signed invoice.payment_succeeded payload with many
+# line items, reporting time per event and peak memory allocated per event.
+#
+#   python scripts/bench_event_parsing.py --lines 200 --iterations 2000
+
+import sys
+import hmac
+import json
+import time
+import hashlib
+import argparse
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.src.events import construct_event
+
+SECRET = "whsec_bench"
+
+def make_invoice_event(lines: int) -> bytes:
+    """Build an invoice.payment_succeeded payload shaped like Stripe's."""
+
+    line_items = [
+        {
+            "id": f"il_{i:06d}",
+            "object": "line_item",
+            "amount": 500,
+            "currency": "usd",
+            "description": f"Token pack {i}",
+            "metadata": {"service_app_id": "bench_app", "index": str(i)},
+            "period": {"start": 1700000000, "end": 1702592000},
+            "price": {"id": f"price_{i:06d}", "object": "price", "unit_amount": 500, "currency": "usd", "product": f"prod_{i:06d}"},
+            "quantity": 1,
+        }
+        for i in range(lines)
+    ]
+    event = {
+        "id": "evt_bench",
+        "object": "event",
+        "type": "invoice.payment_succeeded",
+        "created": int(time.time()),
+        "data": {
+            "object": {
+                "id": "in_bench",
+                "object": "invoice",
+                "amount_paid": 500 * lines,
+                "currency": "usd",
+                "customer": "cus_bench",
+                "lines": {"object": "list", "data": line_items, "has_more": False},
+                "timestamp": int(time.time()),
+            }
+        },
+    }
+    return json.dumps(event).encode()
+
+def sign(payload: bytes) -> str:
+    timestamp = int(time.time())
+    signature = hmac.new(SECRET.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+def measure(parse: Callable[[], object], iterations: int) -> tuple[float, int]:
+    """Return seconds per call and peak bytes allocated by one call."""
+
+    parse()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        event = parse()
+        # what the webhook handler reads
+        event["type"], event["id"], event["data"]["object"].get("id")
+    elapsed = (time.perf_counter() - start) / iterations
+
+    tracemalloc.start()
+    parse()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description="Webhook event parsing microbenchmark.")
+    parser.add_argument("--lines", type=int, default=200, help="Invoice line items in the payload.")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    payload = make_invoice_event(args.lines)
+    header = sign(payload)
+    candidates = {"fast path (events.construct_event)": lambda: construct_event(payload, header, SECRET)}
+
+    try:
+        import stripe
+        candidates["stripe.Webhook.construct_event"] = lambda: stripe.Webhook.construct_event(payload.decode(), header, SECRET)
+    except ImportError:
+        print("stripe is not installed, only the fast path is measured")
+
+    print(f"payload: {len(payload) / 1024:.1f} KiB, {args.lines} line items, {args.iterations} iterations")
+    results = {name: measure(parse, args.iterations) for name, parse in candidates.items()}
+    for name, (elapsed, peak) in results.items():
+        print(f"{name:<40} {elapsed * 1e6:>10.1f} us/event {peak / 1024:>10.1f} KiB peak")
+
+    if len(results) == 2:
+        (fast, _), (slow, _) = results.values()
+        print(f"speedup: {slow / fast:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# scripts/bench_startup.py
+# Cold-start benchmark: time from process launch to the first HTTP 200.
+#
+# Starts `uvicorn app.main:app` in a fresh process several times and polls
+# a path until it answers 200, reporting the import time of app.main and
+# the time-to-first-200 of each run. Uses the same .env / environment the
+# service runs with.
+#
+#   python scripts/bench_startup.py --runs 5 --path /health
+
+import os
+import sys
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def import_seconds() -> float:
+    """Seconds to import app.main in a fresh interpreter."""
+
+    code = "import time; start = time.perf_counter(); import app.main; print(time.perf_counter() - start)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+def time_to_first_200(path: str, timeout: float) -> float:
+    """Launch the app and return seconds until path first answers 200."""
+
+    port = free_port()
+    url = f"http://127.0.0.1:{port}{path}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {server.returncode} before serving {path}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        raise TimeoutError(f"No 200 from {url} within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time-to-first-200 of app.main:app.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/health")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    imports = [import_seconds() for _ in range(args.runs)]
+    first_200 = [time_to_first_200(args.path, args.timeout) for _ in range(args.runs)]
+
+    print(f"runs:               {args.runs}")
+    print(f"import app.main:    median {statistics.median(imports) * 1000:.0f} ms, min {min(imports) * 1000:.0f} ms")
+    print(f"first 200 {args.path}: median {statistics.median(first_200) * 1000:.0f} ms, min {min(first_200) * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# scripts/bench_token_balance.py
+# Stress benchmark for concurrent token balance credits.
+#
+# Fires many concurrent commit_checkout calls crediting one user from
+# several worker processes and checks that the final balance equals the
+# starting balance plus every credit, i.e. that no update was lost.
+#
+# Run against the Firebase emulator (recommended) or a scratch database:
+#   FIREBASE_DATABASE_EMULATOR_HOST=127.0.0.1:9000 \
+#   python scripts/bench_token_balance.py --workers 4 --events 500 --concurrency 50
+#
+# Set TOKEN_BALANCE_COALESCE_WINDOW (e.g. 0.01) to measure per-user write coalescing.
+# Every credit also stores a transaction record under /transactions/<user-id>.
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+from multiprocessing import Pool
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+def run_worker(args: tuple[str, int, int, float]) -> list[float]:
+    """Credit the user `events` times with at most `concurrency` requests in flight."""
+
+    from app.src.crud import close_database, commit_checkout
+
+    user_id, events, concurrency, amount = args
+    latencies = []
+
+    async def credit(semaphore: asyncio.Semaphore, index: int):
+        # a unique record per credit, like one checkout event each
+        record = {"timestamp": f"{time.time_ns()}-{os.getpid()}-{index}", "amount": amount}
+        async with semaphore:
+            start = time.perf_counter()
+            await commit_checkout(record, user_id, amount)
+            latencies.append(time.perf_counter() - start)
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+        try:
+            await asyncio.gather(*(credit(semaphore, index) for index in range(events)))
+        finally:
+            await close_database()
+
+    asyncio.run(main())
+    return latencies
+
+async def read_balance(user_id: str) -> float:
+    from app.src.crud import RecordPaths, close_database, get_database
+
+    try:
+        value = await get_database().get(f"{RecordPaths.ACCOUNTS}/{user_id}/tokenBalance")
+    finally:
+        await close_database()
+    return value if isinstance(value, (int, float)) else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent token balance credit stress test.")
+    parser.add_argument("--user-id", default="bench_user_token_balance")
+    parser.add_argument("--workers", type=int, default=4, help="Processes, each with its own event loop and pool.")
+    parser.add_argument("--events", type=int, default=250, help="Credits sent by each worker.")
+    parser.add_argument("--concurrency", type=int, default=50, help="In-flight credits per worker.")
+    parser.add_argument("--amount", type=float, default=1)
+    args = parser.parse_args()
+
+    initial = asyncio.run(read_balance(args.user_id))
+
+    start = time.perf_counter()
+    with Pool(args.workers) as pool:
+        results = pool.map(run_worker, [(args.user_id, args.events, args.concurrency, args.amount)] * args.workers)
+    elapsed = time.perf_counter() - start
+
+    final = asyncio.run(read_balance(args.user_id))
+    total = args.workers * args.events
+    expected = initial + total * args.amount
+    lost = round((expected - final) / args.amount)
+    latencies = sorted(l for worker in results for l in worker)
+
+    print(f"credits sent:   {total} ({args.workers} workers x {args.events}, concurrency {args.concurrency})")
+    print(f"throughput:     {total / elapsed:.1f} credits/s")
+    print(f"latency p50:    {statistics.median(latencies) * 1000:.1f} ms")
+    print(f"latency p99:    {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms")
+    print(f"balance:        {initial} -> {final} (expected {expected})")
+    print(f"lost updates:   {lost}")
+
+    sys.exit(1 if lost else 0)
+
+if __name__ == "__main__":
+    main()
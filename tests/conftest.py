@@ -0,0 +1,26 @@
+# tests/conftest.py
+
+import os
+import sys
+import pytest
+
+# signatures are mocked in tests, but an empty secret is never accepted
+os.environ.setdefault("STRIPE_WEBHOOK_SECRET", "whsec_test")
+
+
+@pytest.fixture(autouse=True)
+def reset_process_caches(monkeypatch):
+    """Keep in-process caches from leaking mocked records between tests"""
+    if webhook := sys.modules.get("app.api.webhook"):
+        from app.src.ledger import EventLedger
+
+        # fresh memory-only ledger, so tests neither share event ids nor reach the database
+        monkeypatch.setattr(webhook, "event_ledger", EventLedger(database=None))
+
+    yield
+
+    if deps := sys.modules.get("app.utils.deps"):
+        deps.auth_user_cache.invalidate()
+
+    if crud := sys.modules.get("app.src.crud"):
+        crud.profile_cache.invalidate()
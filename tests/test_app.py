@@ -17,4 +17,12 @@ def test_read_health():
 
     health_response = client.get("/health")
     assert response.status_code == health_response.status_code
-    assert response.json() == health_response.json()
\ No newline at end of file
+    assert response.json() == health_response.json()
+
+def test_read_metrics():
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE webhook_stage_duration_seconds histogram" in response.text
+    assert "# TYPE webhook_outcomes_total counter" in response.text
@@ -0,0 +1,94 @@
+# tests/test_cache.py
+"""
+Tests for the bounded TTL/LRU cache used for Firebase lookups.
+"""
+
+import time
+import asyncio
+import pytest
+
+from app.utils.cache import TTLCache
+
+
+def test_hit_and_miss_counters():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("uid_1", "record_1")
+
+    assert cache.get("uid_1") == "record_1"
+    assert cache.get("uid_2") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_eviction_when_full():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # a becomes most recently used
+    cache.set("c", 3)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    cache = TTLCache(maxsize=10, ttl=5)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    cache.set("uid_1", "record_1")
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 6)
+    assert cache.get("uid_1") is None
+    assert len(cache) == 0
+
+
+def test_explicit_invalidation():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    cache.invalidate("a")
+    assert "a" not in cache and "b" in cache
+
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_concurrent_loads_collapse_into_one_call():
+    cache = TTLCache(maxsize=10, ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "record"
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_load("uid_1", loader) for _ in range(10)))
+
+    assert asyncio.run(run()) == ["record"] * 10
+    assert len(calls) == 1
+
+
+def test_failed_loads_are_not_cached():
+    cache = TTLCache(maxsize=10, ttl=60)
+
+    async def failing():
+        raise ValueError("User not found")
+
+    async def succeeding():
+        return "record"
+
+    async def run():
+        with pytest.raises(ValueError):
+            await cache.get_or_load("uid_1", failing)
+        return await cache.get_or_load("uid_1", succeeding)
+
+    assert asyncio.run(run()) == "record"
+
+
+def test_zero_ttl_disables_cache():
+    cache = TTLCache(maxsize=10, ttl=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
@@ -0,0 +1,111 @@
+# tests/test_crud.py
+"""
+Tests for the crud helpers against a mocked Realtime Database client.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from app.src import crud
+from app.src.schema import UserProfile
+
+
+@pytest.fixture
+def database():
+    database = Mock()
+    database.get = AsyncMock(return_value=None)
+    database.set = AsyncMock()
+    database.update = AsyncMock()
+    database.delete = AsyncMock()
+    with patch("app.src.crud.get_database", return_value=database):
+        yield database
+
+
+@pytest.fixture
+def user():
+    user = Mock()
+    user.uid = "test_user_123"
+    user.email = "test@example.com"
+    user.display_name = "Test User"
+    user.tenant_id = None
+    user.provider_data = [Mock(provider_id="google.com")]
+    user.user_metadata.creation_timestamp = 1700000000000
+    return user
+
+
+def test_new_profile_is_written_through_to_cache(database, user):
+    profile = asyncio.run(crud.get_user_profile(user))
+
+    database.set.assert_awaited_once()
+    path, stored = database.set.await_args.args
+    assert path == "/profiles/test_user_123"
+    assert stored["userType"] == "member"
+    assert crud.profile_cache.get("test_user_123") is profile
+
+
+def test_migrated_profile_is_stored_where_it_is_read(database, user):
+    database.get.return_value = {"id": "test_user_123", "userType": "guest", "displayName": None, "createdAt": 0, "gender": "f"}
+
+    profile = asyncio.run(crud.get_user_profile(user))
+
+    path, stored = database.set.await_args.args
+    assert path == "/profiles/test_user_123"
+    assert stored["userType"] == "member" and stored["gender"] == "f"
+    assert crud.profile_cache.get("test_user_123") is profile
+
+    # what was stored validates as the same profile once the cache entry expires
+    assert UserProfile(**stored) == profile
+
+
+def test_cache_hit_skips_database_read(database, user):
+    database.get.return_value = {"id": "test_user_123", "userType": "member", "displayName": "Test User", "createdAt": 0}
+
+    async def run():
+        first = await crud.get_user_profile(user)
+        second = await crud.get_user_profile(user)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first is second
+    database.get.assert_awaited_once_with("/profiles/test_user_123")
+    database.set.assert_not_awaited()
+
+
+def test_checkout_is_one_multi_path_update(database):
+    record = {"id": "cs_test_123", "timestamp": 1700000000}
+    ledger = {"processed_events/evt_1": {"type": "checkout.session.completed", "user_id": "test_user_123"}}
+
+    asyncio.run(crud.commit_checkout(record, "test_user_123", 10, extra_updates=ledger))
+
+    database.update.assert_awaited_once_with("/", {
+        "transactions/test_user_123/1700000000": record,
+        "processed_events/evt_1": {"type": "checkout.session.completed", "user_id": "test_user_123"},
+        "accounts/test_user_123/tokenBalance": {".sv": {"increment": 10}},
+    })
+    database.set.assert_not_awaited()
+
+
+def test_coalesced_checkouts_sum_their_credits(database):
+    first = {"id": "cs_1", "timestamp": 1700000000}
+    second = {"id": "cs_2", "timestamp": 1700000001}
+    coalescer = crud.WriteCoalescer(crud._flush_checkouts, window=0.01, name="checkout")
+
+    async def run():
+        await asyncio.gather(
+            crud.commit_checkout(first, "test_user_123", 10, extra_updates={"processed_events/evt_1": {"user_id": "test_user_123"}}),
+            crud.commit_checkout(second, "test_user_123", 5, extra_updates={"processed_events/evt_2": {"user_id": "test_user_123"}}),
+        )
+
+    with patch("app.src.crud.checkout_writes", coalescer):
+        asyncio.run(run())
+
+    database.update.assert_awaited_once_with("/", {
+        "transactions/test_user_123/1700000000": first,
+        "processed_events/evt_1": {"user_id": "test_user_123"},
+        "transactions/test_user_123/1700000001": second,
+        "processed_events/evt_2": {"user_id": "test_user_123"},
+        "accounts/test_user_123/tokenBalance": {".sv": {"increment": 15}},
+    })
@@ -0,0 +1,120 @@
+# tests/test_event_ledger.py
+"""
+Tests for the processed-event ledger that deduplicates Stripe retries.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+from app.src.ledger import EventLedger
+
+
+def test_completed_event_is_duplicate_from_memory():
+    ledger = EventLedger(database=None)
+
+    async def run():
+        assert await ledger.begin("evt_1") is False
+        await ledger.complete("evt_1")
+        return await ledger.begin("evt_1")
+
+    assert asyncio.run(run()) is True
+    assert ledger.stats()["memory_hits"] == 1
+
+
+def test_released_event_can_be_processed_again():
+    ledger = EventLedger(database=None)
+
+    async def run():
+        assert await ledger.begin("evt_1") is False
+        ledger.release("evt_1")
+        return await ledger.begin("evt_1")
+
+    assert asyncio.run(run()) is False
+
+
+def test_concurrent_delivery_waits_for_first():
+    ledger = EventLedger(database=None)
+    results = []
+
+    async def deliver():
+        duplicate = await ledger.begin("evt_1")
+        results.append(duplicate)
+        if not duplicate:
+            await asyncio.sleep(0.01)
+            await ledger.complete("evt_1")
+
+    async def run():
+        await asyncio.gather(deliver(), deliver(), deliver())
+
+    asyncio.run(run())
+    assert sorted(results) == [False, True, True]
+    assert ledger.stats()["inflight_waits"] >= 2
+
+
+def test_persisted_event_is_duplicate_from_ledger():
+    database = Mock()
+    database.get = AsyncMock(return_value=True)
+    ledger = EventLedger(database=lambda: database)
+
+    assert asyncio.run(ledger.begin("evt_1")) is True
+    assert ledger.stats()["ledger_hits"] == 1
+    database.get.assert_awaited_once_with("processed_events/evt_1", shallow="true")
+
+
+def test_ledger_lookup_failure_lets_event_through():
+    database = Mock()
+    database.get = AsyncMock(side_effect=RuntimeError("unavailable"))
+    ledger = EventLedger(database=lambda: database)
+
+    assert asyncio.run(ledger.begin("evt_1")) is False
+
+
+def test_concurrent_deliveries_reserve_before_slow_ledger_lookup():
+    async def slow_lookup(path, **params):
+        await asyncio.sleep(0.01)
+        return None
+
+    database = Mock()
+    database.get = AsyncMock(side_effect=slow_lookup)
+    ledger = EventLedger(database=lambda: database)
+
+    async def deliver():
+        duplicate = await ledger.begin("evt_1")
+        if not duplicate:
+            await ledger.complete("evt_1", persist=False)
+        return duplicate
+
+    async def run():
+        return await asyncio.gather(deliver(), deliver())
+
+    assert sorted(asyncio.run(run())) == [False, True]
+    database.get.assert_awaited_once()
+
+
+def test_persisted_event_releases_its_reservation():
+    database = Mock()
+    database.get = AsyncMock(return_value=True)
+    ledger = EventLedger(database=lambda: database)
+
+    async def run():
+        return await asyncio.gather(ledger.begin("evt_1"), ledger.begin("evt_1"))
+
+    assert asyncio.run(run()) == [True, True]
+    assert ledger.stats()["ledger_hits"] == 1
+    assert ledger.stats()["memory_hits"] == 1
+
+
+def test_same_event_is_processed_once_per_endpoint():
+    database = Mock()
+    database.get = AsyncMock(return_value=None)
+    ledger = EventLedger(database=lambda: database)
+    tarot = EventLedger.key("evt_1", "tarotarotai", "premium")
+    notion = EventLedger.key("evt_1", "notion_app", "premium")
+
+    async def run():
+        assert await ledger.begin(tarot) is False
+        await ledger.complete(tarot, persist=False)
+        return await ledger.begin(notion), await ledger.begin(tarot)
+
+    assert asyncio.run(run()) == (False, True)
+    database.get.assert_awaited_with("processed_events/notion_app/premium/evt_1", shallow="true")
@@ -0,0 +1,124 @@
+# tests/test_id_tokens.py
+"""
+Tests for local Firebase ID token verification.
+Signing keys are injected through a key-set file so no network access is needed.
+"""
+
+import json
+import time
+import asyncio
+import datetime
+import pytest
+
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from google.auth import crypt, jwt
+
+from app.utils.idtoken import (
+    FirebaseTokenVerifier,
+    IdTokenError,
+    SigningKeyCache,
+    looks_like_id_token,
+    user_record_from_claims,
+)
+
+PROJECT_ID = "test-project"
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    """Generate an RSA key pair with a self-signed certificate"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    return private_pem, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+@pytest.fixture
+def verifier(tmp_path, signing_key):
+    _, cert_pem = signing_key
+    keys_file = tmp_path / "keys.json"
+    keys_file.write_text(json.dumps({"kid_1": cert_pem}))
+    return FirebaseTokenVerifier(PROJECT_ID, SigningKeyCache(keys_file=keys_file))
+
+
+def make_token(signing_key, **overrides):
+    private_pem, _ = signing_key
+    now = int(time.time())
+    claims = {
+        "iss": f"https://securetoken.google.com/{PROJECT_ID}",
+        "aud": PROJECT_ID,
+        "sub": "test_user_123",
+        "iat": now,
+        "exp": now + 3600,
+        "auth_time": now,
+        "email": "test@example.com",
+        "name": "Test User",
+        "firebase": {"identities": {"google.com": ["1234"]}, "sign_in_provider": "google.com"},
+    }
+    claims.update(overrides)
+    signer = crypt.RSASigner.from_string(private_pem, key_id="kid_1")
+    return jwt.encode(signer, claims).decode()
+
+
+def test_valid_token_verifies_offline(verifier, signing_key):
+    claims = asyncio.run(verifier.verify(make_token(signing_key)))
+
+    assert claims["uid"] == "test_user_123"
+    assert claims["email"] == "test@example.com"
+
+
+def test_wrong_audience_rejected(verifier, signing_key):
+    with pytest.raises(IdTokenError):
+        asyncio.run(verifier.verify(make_token(signing_key, aud="other-project")))
+
+
+def test_wrong_issuer_rejected(verifier, signing_key):
+    with pytest.raises(IdTokenError):
+        asyncio.run(verifier.verify(make_token(signing_key, iss="https://securetoken.google.com/other")))
+
+
+def test_expired_token_rejected(verifier, signing_key):
+    past = int(time.time()) - 7200
+    with pytest.raises(IdTokenError):
+        asyncio.run(verifier.verify(make_token(signing_key, iat=past, exp=past + 3600, auth_time=past)))
+
+
+def test_raw_uid_is_not_treated_as_token(signing_key):
+    assert looks_like_id_token(make_token(signing_key))
+    assert not looks_like_id_token("test_user_123")
+
+
+def test_user_record_from_claims(verifier, signing_key):
+    claims = asyncio.run(verifier.verify(make_token(signing_key)))
+    user = user_record_from_claims(claims)
+
+    assert user.uid == "test_user_123"
+    assert user.display_name == "Test User"
+    assert [p.provider_id for p in user.provider_data] == ["google.com"]
+
+
+def test_disk_cache_is_reused(tmp_path, signing_key):
+    _, cert_pem = signing_key
+    cache_path = tmp_path / "certs.json"
+    cache_path.write_text(json.dumps({"expires_at": time.time() + 3600, "keys": {"kid_1": cert_pem}}))
+
+    keys = SigningKeyCache(url="http://invalid.localhost", cache_path=cache_path)
+    assert asyncio.run(keys.get_keys()) == {"kid_1": cert_pem}
@@ -0,0 +1,60 @@
+# tests/test_lazy_imports.py
+"""
+Tests for the deferred module and object proxies used to cut cold-start time.
+"""
+
+import sys
+import threading
+from unittest.mock import patch
+
+from app.utils.lazy import LazyModule, LazyObject
+
+# a small stdlib module that nothing in the test run imports otherwise
+MODULE = "colorsys"
+
+
+def test_module_is_imported_on_first_attribute_use():
+    sys.modules.pop(MODULE, None)
+    loaded = []
+    proxy = LazyModule(MODULE, on_load=loaded.append)
+
+    assert MODULE not in sys.modules
+    assert proxy.rgb_to_hsv(1, 0, 0)[0] == 0.0
+    assert MODULE in sys.modules
+    assert loaded == [sys.modules[MODULE]]
+
+    proxy.hsv_to_rgb(0, 0, 0)
+    assert len(loaded) == 1
+
+
+def test_patching_through_the_proxy():
+    proxy = LazyModule("json")
+
+    with patch.object(proxy, "dumps", return_value="patched"):
+        assert proxy.dumps({}) == "patched"
+    assert proxy.dumps({}) == "{}"
+
+    # nested targets patch the real object
+    with patch.object(proxy.JSONDecoder, "decode", return_value="patched"):
+        assert sys.modules["json"].JSONDecoder().decode("{}") == "patched"
+
+
+def test_object_is_built_once_on_first_use():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return type("Config", (), {"cors": ["https://localhost"]})()
+
+    config = LazyObject(factory)
+    assert not config.loaded
+
+    threads = [threading.Thread(target=lambda: config.cors) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert config.loaded
+    assert config.cors == ["https://localhost"]
+    assert calls == [1]
@@ -0,0 +1,113 @@
+# tests/test_metrics.py
+"""
+Tests for the webhook stage histograms, outcome counters and their ASGI middleware.
+"""
+
+import asyncio
+import threading
+
+from app.utils.metrics import (
+    Collected,
+    Counter,
+    Histogram,
+    MetricsMiddleware,
+    OUTCOMES,
+    REGISTRY,
+    REQUEST_SECONDS,
+    STAGE_SECONDS,
+    label_request,
+    register,
+    render,
+    set_outcome,
+    timed,
+    track,
+)
+
+
+def test_histogram_buckets_and_text_format():
+    histogram = Histogram("test_seconds", "Test.", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, "signature")
+
+    lines = list(histogram.render())
+    assert lines[:2] == ["# HELP test_seconds Test.", "# TYPE test_seconds histogram"]
+    assert 'test_seconds_bucket{stage="signature",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="signature",le="1.0"} 3' in lines
+    assert 'test_seconds_bucket{stage="signature",le="+Inf"} 4' in lines
+    assert 'test_seconds_count{stage="signature"} 4' in lines
+    assert 'test_seconds_sum{stage="signature"} 6.05' in lines
+
+
+def test_counter_aggregates_thread_shards():
+    counter = Counter("test_total", "Test.", ("outcome",))
+
+    def work():
+        for _ in range(1000):
+            counter.inc('quo"ted')
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.value('quo"ted') == 4000
+    assert 'test_total{outcome="quo\\"ted"} 4000' in list(counter.render())
+
+
+def test_collected_metrics_are_read_when_rendered():
+    queue = {"depth": 3}
+    gauge = register(Collected("test_queue_depth", "Test.", ("queue",), lambda: [(("webhook",), queue["depth"])]))
+
+    assert list(gauge.render()) == [
+        "# HELP test_queue_depth Test.",
+        "# TYPE test_queue_depth gauge",
+        'test_queue_depth{queue="webhook"} 3',
+    ]
+    queue["depth"] = 0
+    try:
+        assert 'test_queue_depth{queue="webhook"} 0' in render()
+    finally:
+        REGISTRY.remove(gauge)
+
+
+def test_job_stages_are_labeled_when_finished():
+    @timed("get_user_profile")
+    async def get_user_profile():
+        return "profile"
+
+    async def job():
+        with track("tarotarotai", "checkout.session.completed"):
+            assert await get_user_profile() == "profile"
+            set_outcome("processed")
+
+    asyncio.run(job())
+
+    labels = ("tarotarotai", "checkout.session.completed")
+    assert STAGE_SECONDS.count("get_user_profile", *labels) >= 1
+    assert OUTCOMES.value(*labels, "processed") >= 1
+    assert "webhook_outcomes_total" in render()
+
+
+def test_middleware_times_requests_and_counts_outcomes():
+    async def endpoint(scope, receive, send):
+        label_request(service_app_id="notion", event_type="invoice.paid")
+        set_outcome("ignored")
+        await send({"type": "http.response.start", "status": scope["status"]})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def request(status):
+        async def send(message):
+            pass
+        await MetricsMiddleware(endpoint)({"type": "http", "path": "/webhook/notion", "status": status}, None, send)
+
+    labels = ("notion", "invoice.paid")
+    ignored, bad = OUTCOMES.value(*labels, "ignored"), OUTCOMES.value(*labels, "400")
+    timed_requests = REQUEST_SECONDS.count(*labels)
+
+    asyncio.run(request(200))
+    asyncio.run(request(400))
+
+    assert OUTCOMES.value(*labels, "ignored") == ignored + 1
+    assert OUTCOMES.value(*labels, "400") == bad + 1
+    assert REQUEST_SECONDS.count(*labels) == timed_requests + 2
@@ -0,0 +1,81 @@
+# tests/test_product_catalog.py
+"""
+Tests for hot reloading the product catalog with atomic snapshot swaps.
+"""
+
+import os
+import time
+from dataclasses import replace
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import setup
+from app.utils.catalog import ProductCatalog
+
+
+@pytest.fixture
+def config_path(tmp_path, monkeypatch):
+    """Product YAML folder loaded through setup.load_products, with its compiled artifacts kept in tmp_path"""
+    monkeypatch.setattr(setup, "runtime", replace(setup.runtime, catalog_cache=True, catalog_cache_dir=tmp_path / "compiled"))
+    path = tmp_path / "config"
+    path.mkdir()
+    return path
+
+
+def product(add_count, name="five_orbs"):
+    return f"- {{name: {name}, product_id: prod_five, price: 3.99, price_id: price_five, add_count: {add_count}, type: tokens}}\n"
+
+
+def write(path, text, bump=0):
+    path.write_text(text)
+    # make the change visible even within the filesystem's timestamp resolution
+    os.utime(path, (time.time() + bump, time.time() + bump))
+
+
+def test_reload_swaps_in_a_new_snapshot(config_path):
+    config = config_path / "tarotarotai.yml"
+    write(config, product(5))
+    catalog = ProductCatalog(lambda: setup.load_products(config_path), source=config_path)
+
+    before = catalog.snapshot
+    assert catalog["tarotarotai"]["five_orbs"].add_count == 5
+    assert not catalog.changed()
+
+    write(config, product(6), bump=10)
+    assert catalog.changed()
+    assert catalog.reload()
+
+    assert catalog.get("tarotarotai")["five_orbs"].add_count == 6
+    assert catalog.index.resolve("tarotarotai", price_id="price_five")[1].add_count == 6
+    # a request holding the old snapshot keeps a consistent view
+    assert before.apps["tarotarotai"]["five_orbs"].add_count == 5
+    assert catalog.stats()["version"] == 2
+    assert catalog.stats()["reloads"] == 1
+
+
+def test_invalid_config_keeps_the_last_good_version(config_path):
+    config = config_path / "tarotarotai.yml"
+    write(config, product(5))
+    catalog = ProductCatalog(lambda: setup.load_products(config_path), source=config_path)
+
+    write(config, "name: not a list\n", bump=10)
+    assert catalog.changed()
+    assert not catalog.reload()
+
+    assert catalog["tarotarotai"]["five_orbs"].add_count == 5
+    stats = catalog.stats()
+    assert stats["version"] == 1
+    assert stats["reload_failures"] == 1
+    assert "expected a list" in stats["last_error"]
+    # the broken file is not retried until it changes again
+    assert not catalog.changed()
+
+
+def test_catalog_is_read_only(config_path):
+    write(config_path / "tarotarotai.yml", product(5))
+    catalog = ProductCatalog(lambda: setup.load_products(config_path), source=config_path)
+
+    with pytest.raises(TypeError):
+        catalog["tarotarotai"]["ten_orbs"] = SimpleNamespace(add_count=10)
+    assert "ten_orbs" not in catalog["tarotarotai"]
@@ -0,0 +1,88 @@
+# tests/test_product_config.py
+"""
+Tests for product YAML validation and the compiled product config artifact.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from app.utils.products import (
+    ProductConfigError,
+    artifact_path,
+    compile_products,
+    parse_products,
+)
+
+CONFIG_PATH = Path(__file__).resolve().parent.parent / "app" / "config"
+
+
+@pytest.mark.parametrize("environment, add_counts", [
+    ("dev", {"five_orbs": 5, "ten_orbs": 10, "fifteen_orbs": 15}),
+    # not confirmed for the live prices yet, see the prod YAML
+    ("prod", {"five_orbs": None, "ten_orbs": None, "fifteen_orbs": None}),
+])
+def test_shipped_product_configs_are_valid(environment, add_counts):
+    apps = parse_products(CONFIG_PATH / environment)
+
+    orbs = apps["tarotarotai"]
+    assert {name: product.add_count for name, product in orbs.items()} == add_counts
+    assert all(product.type == "tokens" for product in orbs.values())
+
+
+def test_all_product_fields_are_loaded(tmp_path):
+    (tmp_path / "tarotarotai.yml").write_text(
+        "- name: five_orbs\n"
+        "  product_id: prod_five\n"
+        "  price: 3.99\n"
+        "  price_id: price_five\n"
+        "  lookup_key: orb_packet\n"
+        "  add_count: 5\n"
+        "- name: workspace\n"
+        "  product_id: prod_workspace\n"
+        "  price: 10\n"
+        "  type: saas\n"
+    )
+    apps = parse_products(tmp_path)
+
+    five = apps["tarotarotai"]["five_orbs"]
+    assert (five.price_id, five.lookup_key, five.add_count, five.type) == ("price_five", "orb_packet", 5, "tokens")
+    assert apps["tarotarotai"]["workspace"].price == 10.0
+
+
+@pytest.mark.parametrize("entry, message", [
+    ("- {name: five_orbs, product_id: prod_five, price: float, add_count: 5}", "'price' must be a non-negative number"),
+    ("- {name: five_orbs, product_id: prod_five, add_count: -5}", "'add_count' must be a positive integer"),
+    ("- {name: five_orbs, product_id: prod_five, add_count: 5, type: bundle}", "'type' must be one of"),
+    ("- {name: five_orbs, product_id: prod_five, add_count: 5, addcount: 5}", "unknown fields"),
+    ("- {name: five_orbs, add_count: 5}", "'product_id' is required"),
+    ("name: five_orbs", "expected a list of products"),
+])
+def test_invalid_products_are_rejected(tmp_path, entry, message):
+    (tmp_path / "tarotarotai.yml").write_text(entry + "\n")
+    with pytest.raises(ProductConfigError, match=message):
+        parse_products(tmp_path)
+
+
+def test_tokens_product_without_add_count_loads_unconfigured(tmp_path, capsys):
+    (tmp_path / "tarotarotai.yml").write_text("- {name: five_orbs, product_id: prod_five, price: 1}\n")
+
+    assert parse_products(tmp_path)["tarotarotai"]["five_orbs"].add_count is None
+    assert "has no add_count" in capsys.readouterr().out
+
+
+def test_compiled_artifact_is_reused_until_the_yaml_changes(tmp_path):
+    config_path = tmp_path / "config"
+    cache_dir = tmp_path / "compiled"
+    config_path.mkdir()
+    config = config_path / "tarotarotai.yml"
+    config.write_text("- {name: five_orbs, product_id: prod_five, add_count: 5}\n")
+
+    first = compile_products(config_path, cache_dir)
+    artifact = artifact_path(config_path, cache_dir)
+    assert artifact.exists()
+    assert compile_products(config_path, cache_dir) == first
+
+    config.write_text("- {name: five_orbs, product_id: prod_five, add_count: 6}\n")
+    assert artifact_path(config_path, cache_dir) != artifact
+    assert compile_products(config_path, cache_dir)["tarotarotai"]["five_orbs"].add_count == 6
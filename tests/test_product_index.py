@@ -0,0 +1,50 @@
+# tests/test_product_index.py
+"""
+Tests for resolving configured products by Stripe price, product and lookup key.
+"""
+
+from types import SimpleNamespace
+
+from app.utils.catalog import ProductIndex
+
+
+def product(price_id, product_id, lookup_key=None):
+    return SimpleNamespace(price_id=price_id, product_id=product_id, lookup_key=lookup_key, type="tokens")
+
+
+FIVE = product("price_five", "prod_five", "orb_packet")
+TEN = product("price_ten", "prod_ten", "orb_packet")
+SOLO = product("price_solo", "prod_solo", "solo_packet")
+
+APPS = {"tarotarotai": {"five_orbs": FIVE, "ten_orbs": TEN}, "other": {"solo": SOLO}}
+
+
+def test_resolves_by_each_identifier():
+    index = ProductIndex.build(APPS)
+
+    assert index.resolve("tarotarotai", price_id="price_ten") == ("ten_orbs", TEN)
+    assert index.resolve("tarotarotai", product_id="prod_five") == ("five_orbs", FIVE)
+    assert index.resolve("other", lookup_key="solo_packet") == ("solo", SOLO)
+    # identifiers are scoped to their service app
+    assert index.resolve("other", price_id="price_ten") is None
+
+
+def test_shared_lookup_keys_are_excluded():
+    index = ProductIndex.build(APPS)
+
+    assert index.resolve("tarotarotai", lookup_key="orb_packet") is None
+    assert ("tarotarotai", "lookup_key", "orb_packet") in index.ambiguous
+    # a more specific identifier still resolves
+    assert index.resolve("tarotarotai", price_id="price_five", lookup_key="orb_packet") == ("five_orbs", FIVE)
+
+
+def test_resolves_checkout_sessions_and_invoices():
+    index = ProductIndex.build(APPS)
+
+    session = {"id": "cs_test", "metadata": {"product_name": "ten_orbs"}}
+    assert index.resolve_object("tarotarotai", session) == ("ten_orbs", TEN)
+
+    invoice = {"id": "in_test", "lines": {"data": [{"price": {"id": "price_unknown", "product": "prod_five"}}]}}
+    assert index.resolve_object("tarotarotai", invoice) == ("five_orbs", FIVE)
+
+    assert index.resolve_object("tarotarotai", {"id": "cs_empty"}) is None
@@ -0,0 +1,41 @@
+# tests/test_profile_startup.py
+"""
+Tests for the startup profiler's parsing, summary and baseline comparison.
+"""
+
+from app.profile_startup import PHASE_MARKER, SetupStep, compare, parse_importtime, report, summarize
+
+OUTPUT = f"""import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     _json
+import time:       400 |        520 |   json.decoder
+import time:      1000 |       1520 | json
+import time:      3000 |       4520 | app.main
+{PHASE_MARKER}
+import time:       613 |        613 |   yaml._yaml
+import time:      5000 |       5613 | yaml
+"""
+
+
+def test_parse_importtime_splits_phases():
+    modules = parse_importtime(OUTPUT)
+
+    assert [m.name for m in modules] == ["_json", "json.decoder", "json", "app.main", "yaml._yaml", "yaml"]
+    assert modules[0].depth == 2 and modules[2].depth == 0
+    assert modules[1].package == "json"
+    assert {m.phase for m in modules[:4]} == {"app.main"}
+    assert {m.phase for m in modules[4:]} == {"deferred"}
+
+
+def test_summary_and_baseline_comparison():
+    steps = [SetupStep("setup_workspace", 0.02, True), SetupStep("setup_firebase", 0.001, False, "no credentials")]
+    profile = summarize(parse_importtime(OUTPUT), steps)
+
+    assert profile["import_us"] == {"app.main": 4520, "deferred": 5613}
+    assert list(profile["packages"]["app.main"]) == ["app", "json", "_json"]
+    assert "failed: no credentials" in report(profile)
+
+    baseline = summarize(parse_importtime(OUTPUT.replace("5000 |", "1000 |")), [SetupStep("setup_workspace", 0.01, True)])
+    changes = compare(profile, baseline)
+    assert len(changes) == 2
+    assert "yaml" in changes[0] and "+4.0" in changes[0]
+    assert "setup_workspace" in changes[1] and "+10.0" in changes[1]
@@ -0,0 +1,165 @@
+# tests/test_rtdb_client.py
+"""
+Tests for the async Realtime Database REST client.
+Uses httpx.MockTransport so no network or Firebase project is required.
+"""
+
+import json
+import asyncio
+import httpx
+import pytest
+
+from app.src.rtdb import RealtimeDatabase, RealtimeDatabaseError
+
+
+def make_database(handler):
+    database = RealtimeDatabase(
+        "https://test-db.firebaseio.com",
+        transport=httpx.MockTransport(handler),
+    )
+    # skip the OAuth exchange
+    database._token = "test_token"
+    database._token_expiry = float("inf")
+    return database
+
+
+def test_get_returns_json_value():
+    seen = []
+
+    def handler(request: httpx.Request):
+        seen.append(request)
+        return httpx.Response(200, json={"tokenBalance": 5})
+
+    async def run():
+        database = make_database(handler)
+        value = await database.get("/accounts/test_user_123")
+        await database.aclose()
+        return value
+
+    assert asyncio.run(run()) == {"tokenBalance": 5}
+    assert seen[0].method == "GET"
+    assert seen[0].url.path == "/accounts/test_user_123.json"
+    assert seen[0].headers["Authorization"] == "Bearer test_token"
+
+
+def test_set_and_update_send_silent_writes():
+    seen = []
+
+    def handler(request: httpx.Request):
+        seen.append(request)
+        return httpx.Response(204)
+
+    async def run():
+        database = make_database(handler)
+        await database.set("transactions/u1/123", {"id": "cs_test_123"})
+        await database.update("timeline/u1", {"a": 1})
+        await database.aclose()
+
+    asyncio.run(run())
+    assert [r.method for r in seen] == ["PUT", "PATCH"]
+    assert all(r.url.params["print"] == "silent" for r in seen)
+    assert json.loads(seen[0].content) == {"id": "cs_test_123"}
+
+
+def test_concurrent_requests_share_one_client():
+    def handler(request: httpx.Request):
+        return httpx.Response(200, content=b"null")
+
+    async def run():
+        database = make_database(handler)
+        await asyncio.gather(*(database.get(f"profiles/u{i}") for i in range(20)))
+        client = database._client
+        await database.get("profiles/u0")
+        assert database._client is client
+        await database.aclose()
+
+    asyncio.run(run())
+
+
+def test_error_status_raises():
+    def handler(request: httpx.Request):
+        return httpx.Response(401, json={"error": "Permission denied"})
+
+    async def run():
+        database = make_database(handler)
+        try:
+            await database.get("profiles/u1")
+        finally:
+            await database.aclose()
+
+    with pytest.raises(RealtimeDatabaseError) as exc:
+        asyncio.run(run())
+    assert exc.value.status_code == 401
+
+
+def test_increment_sends_server_value():
+    seen = []
+
+    def handler(request: httpx.Request):
+        seen.append(request)
+        return httpx.Response(200, json=15)
+
+    async def run():
+        database = make_database(handler)
+        value = await database.increment("accounts/u1/tokenBalance", 5)
+        await database.aclose()
+        return value
+
+    assert asyncio.run(run()) == 15
+    assert seen[0].method == "PUT"
+    assert json.loads(seen[0].content) == {".sv": {"increment": 5}}
+
+
+def test_transaction_retries_on_etag_conflict():
+    # server-side state: another writer bumps the balance once before our write lands
+    state = {"value": 10, "etag": "etag_1", "conflicts": 1}
+
+    def handler(request: httpx.Request):
+        if request.method == "GET":
+            return httpx.Response(200, json=state["value"], headers={"ETag": state["etag"]})
+
+        if request.headers["if-match"] != state["etag"] or state["conflicts"]:
+            state["conflicts"] = 0
+            state["value"], state["etag"] = 20, "etag_2"
+            return httpx.Response(412, json=state["value"], headers={"ETag": state["etag"]})
+
+        state["value"] = json.loads(request.content)
+        return httpx.Response(200, json=state["value"])
+
+    async def run():
+        database = make_database(handler)
+        value = await database.transaction("accounts/u1/tokenBalance", lambda current: (current or 0) + 5)
+        await database.aclose()
+        return value
+
+    assert asyncio.run(run()) == 25
+    assert state["value"] == 25
+
+
+def test_warm_up_opens_pooled_connections():
+    seen = []
+
+    def handler(request: httpx.Request):
+        seen.append(request)
+        return httpx.Response(200, json={"accounts": True})
+
+    async def run():
+        database = make_database(handler)
+        await database.warm_up(connections=3)
+        await database.aclose()
+
+    asyncio.run(run())
+    assert len(seen) == 3
+    assert all(r.method == "GET" and r.url.params["shallow"] == "true" for r in seen)
+
+
+def test_warm_up_tolerates_denied_root_reads():
+    def handler(request: httpx.Request):
+        return httpx.Response(401, json={"error": "Permission denied"})
+
+    async def run():
+        database = make_database(handler)
+        await database.warm_up()
+        await database.aclose()
+
+    asyncio.run(run())
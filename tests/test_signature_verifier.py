@@ -0,0 +1,121 @@
+# tests/test_signature_verifier.py
+"""
+Tests for webhook signing secret rotation and per-service-app secrets.
+"""
+
+import os
+import hmac
+import time
+import hashlib
+
+import pytest
+
+from app.src.events import EventSignatureError
+from app.src.signing import DEFAULT_SCOPE, SignatureVerifier
+
+PAYLOAD = b'{"id": "evt_test_123", "type": "checkout.session.completed"}'
+
+
+def sign(secret: str, payload: bytes = PAYLOAD) -> str:
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def test_old_and_new_secrets_are_accepted_during_rotation():
+    verifier = SignatureVerifier({DEFAULT_SCOPE: ["whsec_new", "whsec_old"]})
+
+    assert verifier.verify("notion", PAYLOAD, sign("whsec_old")).secret == "whsec_old"
+    assert verifier.verify("notion", PAYLOAD, sign("whsec_new")).secret == "whsec_new"
+    with pytest.raises(EventSignatureError):
+        verifier.verify("notion", PAYLOAD, sign("whsec_unknown"))
+
+    stats = verifier.stats()
+    assert stats["matches"][DEFAULT_SCOPE] == {"..._new": 1, "..._old": 1}
+    assert stats["rejected"] == 1
+
+
+def test_match_counts_are_labeled_by_configured_secret_index():
+    verifier = SignatureVerifier({DEFAULT_SCOPE: ["whsec_default"], "notion": ["whsec_new", "whsec_old"]})
+    verifier.verify("notion", PAYLOAD, sign("whsec_old"))
+    verifier.verify("notion", PAYLOAD, sign("whsec_old"))
+    verifier.verify("notion", PAYLOAD, sign("whsec_default"))
+
+    # most recently matched order does not move the labels
+    assert dict(verifier.match_counts()) == {
+        ("default", "0"): 0,
+        ("notion", "0"): 0,
+        ("notion", "1"): 2,
+        ("notion", "2"): 1,
+    }
+
+
+def test_most_recently_matched_secret_is_tried_first():
+    verifier = SignatureVerifier({DEFAULT_SCOPE: ["whsec_new", "whsec_old"]})
+    verifier.verify("notion", PAYLOAD, sign("whsec_old"))
+
+    assert [entry.secret for entry in verifier.candidates("notion")] == ["whsec_old", "whsec_new"]
+
+
+def test_service_app_secrets_do_not_apply_to_other_apps():
+    verifier = SignatureVerifier({DEFAULT_SCOPE: ["whsec_shared"], "notion": ["whsec_notion"]})
+
+    assert verifier.verify("notion", PAYLOAD, sign("whsec_notion")).secret == "whsec_notion"
+    assert verifier.verify("notion", PAYLOAD, sign("whsec_shared")).secret == "whsec_shared"
+    with pytest.raises(EventSignatureError):
+        verifier.verify("google_workspace", PAYLOAD, sign("whsec_notion"))
+
+
+def test_unknown_scopes_do_not_grow_the_cache():
+    verifier = SignatureVerifier({DEFAULT_SCOPE: ["whsec_shared"], "notion": ["whsec_notion"]})
+
+    for i in range(100):
+        with pytest.raises(EventSignatureError):
+            verifier.verify(f"forged_{i}", PAYLOAD, sign("whsec_unknown"))
+    verifier.verify("notion", PAYLOAD, sign("whsec_notion"))
+
+    assert set(verifier._order) == {DEFAULT_SCOPE, "notion"}
+
+
+def test_empty_secrets_are_never_accepted():
+    verifier = SignatureVerifier({DEFAULT_SCOPE: [""]})
+    with pytest.raises(EventSignatureError, match="No webhook signing secret"):
+        verifier.verify("notion", PAYLOAD, sign(""))
+
+
+def test_match_tries_single_secret_checks_in_order():
+    verifier = SignatureVerifier({DEFAULT_SCOPE: ["whsec_new", "whsec_old"]})
+    tried = []
+
+    def check(secret):
+        tried.append(secret)
+        if secret != "whsec_old":
+            raise ValueError("signature mismatch")
+        return "event"
+
+    assert verifier.match("notion", check) == "event"
+    assert tried == ["whsec_new", "whsec_old"]
+
+    tried.clear()
+    verifier.match("notion", check)
+    assert tried == ["whsec_old"]
+
+
+def test_secrets_file_is_reloaded_when_changed(tmp_path):
+    secrets_file = tmp_path / "webhook_secrets.yml"
+    secrets_file.write_text("notion:\n  - whsec_first\n")
+    verifier = SignatureVerifier({}, secrets_file=secrets_file, reload_interval=0)
+    assert verifier.verify("notion", PAYLOAD, sign("whsec_first"))
+
+    secrets_file.write_text("notion:\n  - whsec_second\n")
+    os.utime(secrets_file, (time.time() + 10, time.time() + 10))
+    assert verifier.verify("notion", PAYLOAD, sign("whsec_second"))
+    with pytest.raises(EventSignatureError):
+        verifier.verify("notion", PAYLOAD, sign("whsec_first"))
+
+    # a broken file keeps the last good secrets
+    secrets_file.write_text("notion: [")
+    os.utime(secrets_file, (time.time() + 20, time.time() + 20))
+    assert verifier.verify("notion", PAYLOAD, sign("whsec_second"))
+    assert verifier.stats()["reload_failures"] == 1
+    assert verifier.stats()["reloads"] == 2
@@ -0,0 +1,79 @@
+# tests/test_stripe_events.py
+"""
+Tests for the fast Stripe webhook verification and event views.
+"""
+
+import hmac
+import json
+import time
+import hashlib
+
+import pytest
+
+from app.src.events import (
+    EventSignatureError,
+    construct_event,
+    parse_event,
+)
+
+SECRET = "whsec_test"
+
+
+def sign(payload: bytes, secret: str = SECRET, timestamp: int | None = None) -> str:
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signature = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def make_payload(event_type="checkout.session.completed", obj=None) -> bytes:
+    obj = obj or {"id": "cs_test_123", "object": "checkout.session", "amount_total": 500, "currency": "usd", "timestamp": 1}
+    return json.dumps({"id": "evt_test_123", "type": event_type, "data": {"object": obj}}).encode()
+
+
+def test_valid_signature_returns_event_view():
+    payload = make_payload()
+    event = construct_event(payload, sign(payload), SECRET)
+
+    assert event["type"] == "checkout.session.completed"
+    assert event.id == "evt_test_123"
+    # item access behaves like stripe.StripeObject
+    assert event["data"]["object"].get("id") == "cs_test_123"
+    assert dict(event) == json.loads(payload)
+
+
+def test_any_matching_v1_signature_is_accepted():
+    payload = make_payload()
+    header = sign(payload, secret="whsec_old") + "," + sign(payload).split(",")[1]
+    assert construct_event(payload, header, SECRET).id == "evt_test_123"
+
+
+@pytest.mark.parametrize("header", ["", "t=abc,v1=00", "t=123", "v1=00"])
+def test_malformed_headers_are_rejected(header):
+    with pytest.raises(EventSignatureError):
+        construct_event(make_payload(), header, SECRET)
+
+
+def test_tampered_payload_is_rejected():
+    payload = make_payload()
+    with pytest.raises(EventSignatureError, match="No signatures found"):
+        construct_event(payload.replace(b"500", b"900"), sign(payload), SECRET)
+
+
+def test_stale_timestamp_is_rejected():
+    payload = make_payload()
+    with pytest.raises(EventSignatureError, match="tolerance"):
+        construct_event(payload, sign(payload, timestamp=int(time.time()) - 3600), SECRET)
+
+
+def test_parse_event_reuses_decoded_payload():
+    payload = make_payload()
+    data = json.loads(payload)
+
+    event = parse_event(b"not decoded again", data)
+    assert event.raw is data
+    assert event.type == "checkout.session.completed"
+
+
+def test_non_event_payload_is_rejected():
+    with pytest.raises(EventSignatureError, match="not a Stripe event"):
+        parse_event(b"[1, 2]")
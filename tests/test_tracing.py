@@ -0,0 +1,143 @@
+# tests/test_tracing.py
+"""
+Tests for request tracing: span nesting across tasks, head sampling,
+worker propagation and the ring buffer and OTLP file exporters.
+"""
+
+import json
+import asyncio
+
+import pytest
+
+from app.utils.tracing import (
+    OTLPFileExporter,
+    RingBufferExporter,
+    SpanContext,
+    TracingMiddleware,
+    configure_tracing,
+    current_context,
+    root_span,
+    span,
+    traced,
+)
+
+
+@pytest.fixture
+def ring():
+    exporter = RingBufferExporter()
+    configure_tracing(1.0, exporter)
+    yield exporter
+    configure_tracing()
+
+
+@traced()
+async def verify_signature():
+    await asyncio.sleep(0)
+
+
+async def handle_request():
+    with root_span("POST /webhook/{service_app_id}") as root:
+        # stages run as separate tasks and still nest under the root
+        await asyncio.gather(asyncio.create_task(verify_signature()), asyncio.create_task(verify_signature()))
+        with span("credit_tokens", tokens=5):
+            with span("rtdb.PATCH"):
+                pass
+        return root
+
+
+def test_spans_nest_across_tasks(ring):
+    root = asyncio.run(handle_request())
+
+    spans = {s.name: s for s in ring.spans}
+    assert len(ring.spans) == 5
+    assert {s.context.trace_id for s in ring.spans} == {root.context.trace_id}
+    assert spans["verify_signature"].parent_id == root.context.span_id
+    assert spans["rtdb.PATCH"].parent_id == spans["credit_tokens"].context.span_id
+    assert spans["credit_tokens"].attributes == {"tokens": 5}
+    assert ring.spans[-1] is root and root.parent_id is None
+
+
+def test_errors_are_recorded(ring):
+    with pytest.raises(ValueError):
+        with root_span("job"):
+            with span("rtdb.GET"):
+                raise ValueError("boom")
+
+    assert [s.error for s in ring.spans] == ["ValueError: boom", "ValueError: boom"]
+
+
+def test_unsampled_traces_create_no_spans():
+    exporter = RingBufferExporter()
+    configure_tracing(0.0, exporter)
+    try:
+        async def run():
+            with root_span("POST /webhook") as root:
+                await verify_signature()
+                with span("credit_tokens") as child:
+                    return root, child
+
+        assert asyncio.run(run()) == (None, None)
+        # an upstream sampling decision is honored
+        with root_span("job", parent=SpanContext("a" * 32, "b" * 16, sampled=False)) as root:
+            assert root is None
+            assert current_context().sampled is False
+        assert not exporter.spans
+    finally:
+        configure_tracing()
+
+
+def test_background_worker_continues_request_trace(ring):
+    async def run():
+        queue = asyncio.Queue()
+
+        async def worker():
+            trace = await queue.get()
+            with root_span("process_checkout_event", parent=trace, kind="internal"):
+                with span("rtdb.PATCH"):
+                    pass
+
+        task = asyncio.create_task(worker())
+        with root_span("POST /webhook") as root:
+            await queue.put(current_context())
+        await task
+        return root
+
+    root = asyncio.run(run())
+    job = next(s for s in ring.spans if s.name == "process_checkout_event")
+    assert job.context.trace_id == root.context.trace_id
+    assert job.parent_id == root.context.span_id
+
+
+def test_traceparent_round_trip():
+    context = SpanContext.from_traceparent("00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01")
+    assert context == SpanContext("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", True)
+    assert context.traceparent == "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+    assert SpanContext.from_traceparent("garbage") is None
+
+
+def test_otlp_file_exporter(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    configure_tracing(1.0, OTLPFileExporter(path))
+    try:
+        async def app(scope, receive, send):
+            with span("verify_signature"):
+                pass
+            await send({"type": "http.response.start", "status": 200})
+
+        async def send(message):
+            pass
+
+        headers = [(b"traceparent", b"00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01")]
+        scope = {"type": "http", "method": "POST", "path": "/webhook/notion", "headers": headers}
+        asyncio.run(TracingMiddleware(app)(scope, None, send))
+    finally:
+        configure_tracing()
+
+    request = json.loads(path.read_text().splitlines()[0])
+    spans = request["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    child, root = spans
+    assert root["name"] == "POST /webhook/notion" and root["kind"] == 2
+    assert root["traceId"] == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert root["parentSpanId"] == "00f067aa0ba902b7"
+    assert {"key": "http.status_code", "value": {"intValue": "200"}} in root["attributes"]
+    assert child["parentSpanId"] == root["spanId"] and child["status"] == {"code": 1}
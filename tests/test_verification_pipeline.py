@@ -0,0 +1,63 @@
+# tests/test_verification_pipeline.py
+"""
+Tests for concurrent verification stages used by verify_headers.
+"""
+
+import time
+import asyncio
+
+import pytest
+
+from app.utils.pipeline import run_stages
+
+
+def test_stages_run_concurrently_and_report_timings():
+    async def slow(value):
+        await asyncio.sleep(0.05)
+        return value
+
+    async def run():
+        timings = {}
+        start = time.perf_counter()
+        results = await run_stages({"identity": lambda: slow("user"), "signature": lambda: slow("event")}, timings)
+        return results, timings, time.perf_counter() - start
+
+    results, timings, elapsed = asyncio.run(run())
+    assert results == {"identity": "user", "signature": "event"}
+    assert set(timings) == {"identity", "signature"}
+    # bounded by the slowest stage, not the sum
+    assert elapsed < 0.09
+
+
+def test_first_failure_cancels_remaining_stages():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def fail():
+        raise ValueError("invalid signature")
+
+    async def run():
+        start = time.perf_counter()
+        with pytest.raises(ValueError, match="invalid signature"):
+            await run_stages({"identity": slow, "signature": fail})
+        return time.perf_counter() - start
+
+    assert asyncio.run(run()) < 1
+    assert cancelled == [True]
+
+
+def test_single_stage_runs_inline():
+    async def stage():
+        return asyncio.current_task().get_name()
+
+    async def run():
+        asyncio.current_task().set_name("request")
+        return await run_stages({"signature": stage})
+
+    assert asyncio.run(run()) == {"signature": "request"}
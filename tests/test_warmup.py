@@ -0,0 +1,71 @@
+# tests/test_warmup.py
+"""
+Tests for the startup warm-up stages behind the readiness probe.
+"""
+
+import asyncio
+
+from app.utils.warmup import WarmUp
+
+
+def test_stages_run_in_order_and_report_ready():
+    calls = []
+
+    async def stage(name):
+        calls.append(name)
+
+    warmup = WarmUp({"firebase": lambda: stage("firebase"), "rtdb": lambda: stage("rtdb")})
+    assert not warmup.ready
+
+    asyncio.run(warmup.run())
+
+    assert calls == ["firebase", "rtdb"]
+    assert warmup.ready
+    status = warmup.status()
+    assert status["ready"] and status["finished_at"] is not None
+    assert status["stages"]["rtdb"]["attempts"] == 1
+
+
+def test_failing_stage_is_retried_and_blocks_later_stages():
+    attempts = []
+    later = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("connection refused")
+
+    async def second():
+        later.append(len(attempts))
+
+    async def run():
+        warmup = WarmUp({"rtdb": flaky, "identity_toolkit": second}, retry_interval=0.001)
+        warmup.start()
+        await asyncio.sleep(0)
+        assert not warmup.ready
+        await warmup._task
+        return warmup
+
+    warmup = asyncio.run(run())
+    assert warmup.ready
+    assert warmup.results["rtdb"]["attempts"] == 3
+    assert "error" not in warmup.results["rtdb"]
+    assert later == [3]
+
+
+def test_stage_timeout_is_reported():
+    async def run():
+        warmup = WarmUp({"slow": lambda: asyncio.sleep(1)}, timeout=0.01, retry_interval=10)
+        warmup.start()
+        await asyncio.sleep(0.05)
+        status = warmup.status()
+        await warmup.stop()
+        return status
+
+    status = asyncio.run(run())
+    assert not status["ready"]
+    assert status["stages"]["slow"]["error"] == "TimeoutError"
+
+
+def test_no_stages_is_ready():
+    assert WarmUp({}).ready
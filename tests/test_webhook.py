@@ -86,8 +86,7 @@ def mock_platform_config():
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -95,8 +94,7 @@ def test_webhook_checkout_completed_success(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     mock_stripe_event_checkout_completed,
     mock_user_record,
@@ -197,7 +195,7 @@ def test_webhook_invalid_service_app(
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -205,7 +203,7 @@ def test_webhook_invoice_payment_succeeded(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
+    mock_commit_checkout,
     mock_platform,
     mock_stripe_event_invoice_succeeded,
     mock_user_record,
@@ -235,8 +233,7 @@ def test_webhook_invoice_payment_succeeded(
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -244,8 +241,7 @@ def test_webhook_product_type_tokens(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     mock_stripe_event_checkout_completed,
     mock_user_record,
@@ -278,7 +274,7 @@ def test_webhook_product_type_tokens(
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -286,7 +282,7 @@ def test_webhook_unsupported_product_type(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
+    mock_commit_checkout,
     mock_platform,
     mock_stripe_event_checkout_completed,
     mock_user_record,
@@ -315,3 +311,31 @@ def test_webhook_unsupported_product_type(
 
     assert response.status_code == 500
     assert "Unsupported product type" in response.json()["detail"]
+
+
+@patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
+@patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
+@patch("app.utils.deps.auth.get_user")
+@patch("app.utils.deps.stripe.Webhook.construct_event")
+def test_webhook_invalid_signature_never_loads_profile(
+    mock_construct_event,
+    mock_get_user,
+    mock_get_profile,
+    mock_stripe_event_checkout_completed,
+    mock_user_record,
+):
+    """Test an unsigned checkout payload cannot create or migrate a profile"""
+    mock_construct_event.side_effect = ValueError("Invalid signature")
+    mock_get_user.return_value = mock_user_record
+
+    response = client.post(
+        "/webhook/test_app/test_product",
+        json=mock_stripe_event_checkout_completed,
+        headers={
+            "stripe-signature": "t=123,v1=forged",
+            "x-firebase-user-auth": "test_user_123"
+        }
+    )
+
+    assert response.status_code == 400
+    mock_get_profile.assert_not_awaited()
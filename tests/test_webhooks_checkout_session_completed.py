@@ -59,8 +59,7 @@ def checkout_event_base():
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -68,8 +67,7 @@ def test_cs_completed_credits_five_orbs(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     checkout_event_base,
     mock_user_setup
@@ -98,14 +96,13 @@ def test_cs_completed_credits_five_orbs(
     )
 
     assert response.status_code == 200
-    mock_update_balance.assert_called_once_with("test_user_123", 5)
-    mock_store_transaction.assert_called_once()
+    mock_commit_checkout.assert_called_once()
+    assert mock_commit_checkout.call_args.args[1:3] == ("test_user_123", 5)
 
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -113,8 +110,7 @@ def test_cs_completed_unknown_price_no_credit(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     checkout_event_base,
     mock_user_setup
@@ -139,13 +135,12 @@ def test_cs_completed_unknown_price_no_credit(
 
     assert response.status_code == 404
     assert "Service app or product not found" in response.json()["detail"]
-    mock_update_balance.assert_not_called()
+    mock_commit_checkout.assert_not_called()
 
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -153,8 +148,7 @@ def test_cs_completed_missing_user_id_no_credit(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     checkout_event_base,
     mock_user_setup
@@ -181,13 +175,12 @@ def test_cs_completed_missing_user_id_no_credit(
     )
 
     assert response.status_code == 400
-    mock_update_balance.assert_not_called()
+    mock_commit_checkout.assert_not_called()
 
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -195,8 +188,7 @@ def test_cs_completed_idempotent_on_event_id(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     checkout_event_base,
     mock_user_setup
@@ -237,15 +229,13 @@ def test_cs_completed_idempotent_on_event_id(
     assert response1.status_code == 200
     assert response2.status_code == 200
 
-    # Note: In current implementation, idempotency would need to be added
-    # This test documents expected behavior
-    # mock_update_balance.assert_called_once()  # Should only be called once
+    assert response2.json()["duplicate"] is True
+    mock_commit_checkout.assert_called_once()
 
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -253,8 +243,7 @@ def test_cs_completed_does_not_double_credit_with_pi_succeeded(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     mock_user_setup
 ):
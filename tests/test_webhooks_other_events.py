@@ -35,8 +35,7 @@ def mock_user_setup():
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -44,8 +43,7 @@ def test_subscription_events_no_wallet_mutation(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     mock_user_setup
 ):
@@ -68,7 +66,7 @@ def test_subscription_events_no_wallet_mutation(
     mock_platform.account.webhook_secret = "whsec_test"
 
     for event_type in subscription_events:
-        mock_update_balance.reset_mock()
+        mock_commit_checkout.reset_mock()
 
         event = {
             "id": f"evt_sub_{event_type}",
@@ -96,13 +94,16 @@ def test_subscription_events_no_wallet_mutation(
 
         assert response.status_code == 200
         # Correctly validates no wallet mutation for subscription events
-        mock_update_balance.assert_not_called()
+        mock_commit_checkout.assert_not_called()
+
+    # unhandled event types exit before any Firebase lookup
+    mock_get_user.assert_not_called()
+    mock_get_profile.assert_not_called()
 
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -110,8 +111,7 @@ def test_invoice_paid_no_wallet_mutation(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     mock_user_setup
 ):
@@ -153,13 +153,13 @@ def test_invoice_paid_no_wallet_mutation(
 
     assert response.status_code == 200
     # invoice.payment_succeeded is included in CHECKOUT_LINKS, so it DOES credit tokens
-    mock_update_balance.assert_called_once_with("test_user_123", 100)
+    mock_commit_checkout.assert_called_once()
+    assert mock_commit_checkout.call_args.args[1:3] == ("test_user_123", 100)
 
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -167,8 +167,7 @@ def test_invoice_payment_failed_no_wallet_mutation(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     mock_user_setup
 ):
@@ -210,13 +209,12 @@ def test_invoice_payment_failed_no_wallet_mutation(
 
     assert response.status_code == 200
     # Current implementation correctly doesn't credit for failed invoice events
-    mock_update_balance.assert_not_called()
+    mock_commit_checkout.assert_not_called()
 
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -224,8 +222,7 @@ def test_charge_refunded_policy_applied(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     mock_user_setup
 ):
@@ -271,13 +268,12 @@ def test_charge_refunded_policy_applied(
     # This test documents expected behavior for future implementation
     assert response.status_code == 200
     # Future: Should deduct tokens or flag account
-    # mock_update_balance.assert_called_with("test_user_123", -100)
+    # assert mock_commit_checkout.call_args.args[1:3] == ("test_user_123", -100)
 
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -285,8 +281,7 @@ def test_dispute_created_flags_account(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     mock_user_setup
 ):
@@ -333,3 +328,42 @@ def test_dispute_created_flags_account(
     assert response.status_code == 200
     # Future: Should flag account or send notification
     # mock_flag_account.assert_called_with("test_user_123", "dispute_created")
+
+
+@patch("app.api.webhook.platform")
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
+@patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
+@patch("app.utils.deps.auth.get_user")
+@patch("app.utils.deps.stripe.Webhook.construct_event")
+def test_unhandled_event_needs_no_firebase_auth_header(
+    mock_construct_event,
+    mock_get_user,
+    mock_get_profile,
+    mock_commit_checkout,
+    mock_platform,
+):
+    """Test that events without a registered handler are acknowledged without identity resolution"""
+    mock_product = Mock()
+    mock_product.type = "tokens"
+    mock_product.add_count = 100
+
+    event = {
+        "id": "evt_pi_created",
+        "type": "payment_intent.created",
+        "data": {"object": {"id": "pi_test_123", "amount": 1000}}
+    }
+
+    mock_construct_event.return_value = event
+    mock_platform.apps = {"test_app": {"test_product": mock_product}}
+
+    response = client.post(
+        "/webhook/test_app/test_product",
+        json=event,
+        headers={"stripe-signature": "t=123,v1=sig"}
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"received": True}
+    mock_get_user.assert_not_called()
+    mock_get_profile.assert_not_called()
+    mock_commit_checkout.assert_not_called()
@@ -10,6 +10,7 @@ from unittest.mock import Mock, patch, AsyncMock
 from fastapi.testclient import TestClient
 from app.main import app
 from app.src.schema import UserProfile
+from app.utils.catalog import ProductIndex
 from firebase_admin._user_mgt import UserRecord
 
 client = TestClient(app)
@@ -35,8 +36,7 @@ def mock_user_setup():
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -44,8 +44,7 @@ def test_webhook_valid_service_app_and_product_success(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     mock_user_setup
 ):
@@ -93,14 +92,13 @@ def test_webhook_valid_service_app_and_product_success(
 
     assert response.status_code == 200
     assert response.json() == {"status": 200, "message": "Socket Completed."}
-    mock_update_balance.assert_called_once_with("test_user_123", 10)
-    mock_store_transaction.assert_called_once()
+    mock_commit_checkout.assert_called_once()
+    assert mock_commit_checkout.call_args.args[1:3] == ("test_user_123", 10)
 
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -108,8 +106,7 @@ def test_webhook_invalid_service_app_id_returns_404(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     mock_user_setup
 ):
@@ -152,14 +149,12 @@ def test_webhook_invalid_service_app_id_returns_404(
     assert "Service app or product not found" in response.json()["detail"]
     assert "invalid_app_id/5_orbs" in response.json()["detail"]
     # Ensure no wallet mutation occurred
-    mock_update_balance.assert_not_called()
-    mock_store_transaction.assert_not_called()
+    mock_commit_checkout.assert_not_called()
 
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -167,8 +162,7 @@ def test_webhook_invalid_product_id_returns_404(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     mock_user_setup
 ):
@@ -217,14 +211,12 @@ def test_webhook_invalid_product_id_returns_404(
     assert "Service app or product not found" in response.json()["detail"]
     assert "tarotarotai/100_orbs" in response.json()["detail"]
     # Ensure no wallet mutation occurred
-    mock_update_balance.assert_not_called()
-    mock_store_transaction.assert_not_called()
+    mock_commit_checkout.assert_not_called()
 
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -232,8 +224,7 @@ def test_webhook_both_invalid_service_app_and_product_returns_404(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     mock_user_setup
 ):
@@ -272,14 +263,12 @@ def test_webhook_both_invalid_service_app_and_product_returns_404(
     assert response.status_code == 404
     assert "Service app or product not found" in response.json()["detail"]
     assert "nonexistent_app/nonexistent_product" in response.json()["detail"]
-    mock_update_balance.assert_not_called()
-    mock_store_transaction.assert_not_called()
+    mock_commit_checkout.assert_not_called()
 
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -287,8 +276,7 @@ def test_webhook_multiple_apps_with_same_product_names(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     mock_user_setup
 ):
@@ -336,9 +324,9 @@ def test_webhook_multiple_apps_with_same_product_names(
     )
 
     assert response1.status_code == 200
-    mock_update_balance.assert_called_with("test_user_123", 5)
+    assert mock_commit_checkout.call_args.args[1:3] == ("test_user_123", 5)
 
-    mock_update_balance.reset_mock()
+    mock_commit_checkout.reset_mock()
 
     # Test notion_app/premium
     response2 = client.post(
@@ -351,13 +339,12 @@ def test_webhook_multiple_apps_with_same_product_names(
     )
 
     assert response2.status_code == 200
-    mock_update_balance.assert_called_with("test_user_123", 100)
+    assert mock_commit_checkout.call_args.args[1:3] == ("test_user_123", 100)
 
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -365,8 +352,7 @@ def test_webhook_special_characters_in_path_params(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     mock_user_setup
 ):
@@ -407,13 +393,13 @@ def test_webhook_special_characters_in_path_params(
     )
 
     assert response.status_code == 200
-    mock_update_balance.assert_called_once_with("test_user_123", 15)
+    mock_commit_checkout.assert_called_once()
+    assert mock_commit_checkout.call_args.args[1:3] == ("test_user_123", 15)
 
 
 @patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
 @patch("app.api.webhook.platform")
-@patch("app.api.webhook.update_user_token_balance", new_callable=AsyncMock)
-@patch("app.api.webhook.store_transaction_record", new_callable=AsyncMock)
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
 @patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
 @patch("app.utils.deps.auth.get_user")
 @patch("app.utils.deps.stripe.Webhook.construct_event")
@@ -421,8 +407,7 @@ def test_webhook_empty_service_app_dict_returns_404(
     mock_construct_event,
     mock_get_user,
     mock_get_profile,
-    mock_store_transaction,
-    mock_update_balance,
+    mock_commit_checkout,
     mock_platform,
     mock_user_setup
 ):
@@ -462,4 +447,101 @@ def test_webhook_empty_service_app_dict_returns_404(
     assert response.status_code == 404
     assert "Service app or product not found" in response.json()["detail"]
     assert "empty_app/any_product" in response.json()["detail"]
-    mock_update_balance.assert_not_called()
+    mock_commit_checkout.assert_not_called()
+
+
+@patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
+@patch("app.api.webhook.platform")
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
+@patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
+@patch("app.utils.deps.auth.get_user")
+@patch("app.utils.deps.stripe.Webhook.construct_event")
+def test_single_app_url_resolves_product_from_line_items(
+    mock_construct_event,
+    mock_get_user,
+    mock_get_profile,
+    mock_commit_checkout,
+    mock_platform,
+    mock_user_setup
+):
+    """Test the service app URL resolves the product by price_id instead of a path segment"""
+    mock_user, mock_profile = mock_user_setup
+
+    five_orbs = Mock(type="tokens", add_count=5, price_id="price_five", product_id="prod_five", lookup_key="orb_packet")
+    ten_orbs = Mock(type="tokens", add_count=10, price_id="price_ten", product_id="prod_ten", lookup_key="orb_packet")
+    mock_platform.apps = {"tarotarotai": {"five_orbs": five_orbs, "ten_orbs": ten_orbs}}
+    mock_platform.index = ProductIndex.build(mock_platform.apps)
+
+    checkout_event = {
+        "id": "evt_test_single_url",
+        "type": "checkout.session.completed",
+        "data": {
+            "object": {
+                "id": "cs_test_123",
+                "line_items": {"data": [{"price": {"id": "price_ten", "lookup_key": "orb_packet"}}]},
+                "timestamp": int(time.time())
+            }
+        }
+    }
+
+    mock_construct_event.return_value = checkout_event
+    mock_get_user.return_value = mock_user
+    mock_get_profile.return_value = mock_profile
+
+    response = client.post(
+        "/webhook/tarotarotai",
+        json=checkout_event,
+        headers={
+            "stripe-signature": "t=123,v1=sig",
+            "x-firebase-user-auth": "test_user_123"
+        }
+    )
+
+    assert response.status_code == 200
+    mock_commit_checkout.assert_called_once()
+    assert mock_commit_checkout.call_args.args[1:3] == ("test_user_123", 10)
+
+
+@patch("app.src.crud.firebase_admin._apps", {"[DEFAULT]": Mock()})
+@patch("app.api.webhook.platform")
+@patch("app.api.webhook.commit_checkout", new_callable=AsyncMock)
+@patch("app.utils.deps.get_user_profile", new_callable=AsyncMock)
+@patch("app.utils.deps.auth.get_user")
+@patch("app.utils.deps.stripe.Webhook.construct_event")
+def test_single_app_url_rejects_unmatched_checkout(
+    mock_construct_event,
+    mock_get_user,
+    mock_get_profile,
+    mock_commit_checkout,
+    mock_platform,
+    mock_user_setup
+):
+    """Test the service app URL returns 400 when only an ambiguous lookup_key identifies the product"""
+    mock_user, mock_profile = mock_user_setup
+
+    five_orbs = Mock(type="tokens", add_count=5, price_id="price_five", product_id="prod_five", lookup_key="orb_packet")
+    ten_orbs = Mock(type="tokens", add_count=10, price_id="price_ten", product_id="prod_ten", lookup_key="orb_packet")
+    mock_platform.apps = {"tarotarotai": {"five_orbs": five_orbs, "ten_orbs": ten_orbs}}
+    mock_platform.index = ProductIndex.build(mock_platform.apps)
+
+    checkout_event = {
+        "id": "evt_test_single_url_unmatched",
+        "type": "checkout.session.completed",
+        "data": {"object": {"id": "cs_test_123", "metadata": {"lookup_key": "orb_packet"}, "timestamp": int(time.time())}}
+    }
+
+    mock_construct_event.return_value = checkout_event
+    mock_get_user.return_value = mock_user
+    mock_get_profile.return_value = mock_profile
+
+    response = client.post(
+        "/webhook/tarotarotai",
+        json=checkout_event,
+        headers={
+            "stripe-signature": "t=123,v1=sig",
+            "x-firebase-user-auth": "test_user_123"
+        }
+    )
+
+    assert response.status_code == 400
+    mock_commit_checkout.assert_not_called()
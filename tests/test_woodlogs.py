@@ -0,0 +1,134 @@
+# tests/test_woodlogs.py
+"""
+Tests for woodlogs output modes: Cloud Logging JSON and the background queue writer.
+"""
+
+import sys
+import json
+import logging
+import threading
+
+import pytest
+
+from app.utils import woodlogs
+from app.utils.woodlogs import (
+    CloudLoggingFormatter,
+    LogSampler,
+    configure_logging,
+    get_logger,
+    parse_sample_rates,
+    shutdown_logging,
+)
+
+
+def make_record(**extra):
+    logger = logging.getLogger("tests.woodlogs.record")
+    return logger.makeRecord(logger.name, logging.WARNING, __file__, 10, "Credited %d tokens", (5,), None, extra=extra)
+
+
+def test_json_formatter_keeps_extra_fields():
+    entry = json.loads(CloudLoggingFormatter().format(make_record(event_id="evt_1", user_id="user_1")))
+
+    assert entry["severity"] == "WARNING"
+    assert entry["message"] == "Credited 5 tokens"
+    assert entry["event_id"] == "evt_1" and entry["user_id"] == "user_1"
+    assert entry["logging.googleapis.com/sourceLocation"]["line"] == 10
+    assert "args" not in entry and "msg" not in entry
+
+
+def test_json_formatter_includes_stack_trace():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger = logging.getLogger("tests.woodlogs.record")
+        record = logger.makeRecord(logger.name, logging.ERROR, __file__, 1, "failed", (), sys.exc_info())
+
+    entry = json.loads(CloudLoggingFormatter().format(record))
+    assert "ValueError: boom" in entry["stack_trace"]
+
+
+def test_queue_mode_formats_off_the_calling_thread(capsys):
+    logger = get_logger("tests.woodlogs.queue")
+    formatted_on = []
+
+    class RecordingFormatter(CloudLoggingFormatter):
+        def format(self, record):
+            formatted_on.append(threading.current_thread())
+            return super().format(record)
+
+    try:
+        configure_logging("json", use_queue=True)
+        woodlogs._listener.handlers[0].setFormatter(RecordingFormatter())
+        logger.info("Webhook received: %s", "checkout.session.completed", extra={"event_id": "evt_2"})
+        shutdown_logging()
+    finally:
+        configure_logging("text")
+
+    line = capsys.readouterr().out.strip().splitlines()[-1]
+    assert json.loads(line)["event_id"] == "evt_2"
+    assert formatted_on and formatted_on[0] is not threading.current_thread()
+
+
+def test_disabled_level_skips_argument_formatting():
+    logger = get_logger("tests.woodlogs.level")
+
+    class Expensive:
+        def __str__(self):
+            raise AssertionError("formatted a disabled record")
+
+    try:
+        configure_logging("text", level="WARNING")
+        logger.info("stages: %s", Expensive())
+        assert not logger.isEnabledFor(logging.INFO)
+    finally:
+        configure_logging("text", level="INFO")
+
+
+def sampled(sampler, logger_name, msg, level=logging.INFO, count=1):
+    logger = logging.getLogger(logger_name)
+    record = logger.makeRecord(logger_name, level, __file__, 1, msg, ("x",), None)
+    return [sampler.filter(record) for _ in range(count)]
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates("app.api.webhook=0.1; Webhook received: %s=0.05;") == {
+        "app.api.webhook": 0.1,
+        "Webhook received: %s": 0.05,
+    }
+    with pytest.raises(ValueError):
+        parse_sample_rates("app.api.webhook=2")
+
+
+def test_sampling_by_template_and_parent_logger():
+    sampler = LogSampler({"app.api": 0.25, "Webhook received: %s": 0.1})
+
+    kept = sampled(sampler, "app.api.webhook", "Webhook received: %s", count=30)
+    assert kept.count(True) == 3 and kept[0] and kept[10] and kept[20]
+
+    assert sampled(sampler, "app.api.webhook", "Processing checkout event", count=8).count(True) == 2
+    assert all(sampled(sampler, "app.src.crud", "Profile loaded", count=5))
+
+
+def test_rate_limit_and_errors_always_pass():
+    sampler = LogSampler(rate_limit=0.001, burst=3)
+
+    assert sampled(sampler, "app.api.webhook", "Event type not processed: %s", count=5) == [True] * 3 + [False] * 2
+    assert all(sampled(sampler, "app.api.webhook", "Event type not processed: %s", level=logging.ERROR, count=5))
+    assert sampler.suppressed_total == 2
+
+
+def test_suppression_summary(capsys):
+    logger = get_logger("tests.woodlogs.sampling")
+    try:
+        configure_logging("json", sample_rates={"tests.woodlogs.sampling": 0.5}, summary_interval=3600)
+        for _ in range(6):
+            logger.info("Webhook received: %s", "invoice.paid")
+        shutdown_logging()
+    finally:
+        configure_logging("text")
+
+    entries = [json.loads(line) for line in capsys.readouterr().out.strip().splitlines()]
+    assert [e["message"] for e in entries].count("Webhook received: invoice.paid") == 3
+    summary = entries[-1]
+    assert summary["suppressed"] == 3 and summary["template"] == "Webhook received: %s"
+    assert summary["message"] == "3 similar messages suppressed: Webhook received: %s"
@@ -0,0 +1,89 @@
+# tests/test_worker_pool.py
+"""
+Tests for the bounded worker pool behind acknowledge-then-process mode.
+"""
+
+import asyncio
+
+from app.utils.workers import WorkerPool
+
+
+def test_submitted_items_are_processed_and_drained():
+    handled = []
+
+    async def handler(item):
+        await asyncio.sleep(0.001)
+        handled.append(item)
+
+    async def run():
+        pool = WorkerPool(handler, workers=4, maxsize=100)
+        for i in range(50):
+            assert await pool.submit(i)
+        await pool.drain(timeout=5)
+        return pool
+
+    pool = asyncio.run(run())
+    assert sorted(handled) == list(range(50))
+    assert pool.stats()["processed"] == 50
+    assert pool.stats()["depth"] == 0
+    assert not pool.running
+
+
+def test_full_queue_applies_backpressure():
+    async def run():
+        gate = asyncio.Event()
+
+        async def handler(item):
+            await gate.wait()
+
+        pool = WorkerPool(handler, workers=1, maxsize=1, put_timeout=0.01)
+        assert await pool.submit("a")  # taken by the worker
+        await asyncio.sleep(0)
+        assert await pool.submit("b")  # fills the queue
+        accepted = await pool.submit("c")
+        gate.set()
+        await pool.drain(timeout=5)
+        return accepted, pool.stats()
+
+    accepted, stats = asyncio.run(run())
+    assert accepted is False
+    assert stats["rejected"] == 1
+
+
+def test_oldest_lag_tracks_the_front_of_the_queue():
+    async def run():
+        gate = asyncio.Event()
+
+        async def handler(item):
+            await gate.wait()
+
+        pool = WorkerPool(handler, workers=1, maxsize=10)
+        empty = pool.oldest_lag
+        await pool.submit("a")  # taken by the worker
+        await asyncio.sleep(0)
+        await pool.submit("b")
+        await asyncio.sleep(0.02)
+        waiting = pool.oldest_lag
+        gate.set()
+        await pool.drain(timeout=5)
+        return empty, waiting, pool.oldest_lag
+
+    empty, waiting, drained = asyncio.run(run())
+    assert empty == 0.0
+    assert waiting >= 0.02
+    assert drained == 0.0
+
+
+def test_handler_failures_are_counted():
+    async def handler(item):
+        raise RuntimeError("database unavailable")
+
+    async def run():
+        pool = WorkerPool(handler, workers=1, maxsize=10)
+        await pool.submit("a")
+        await pool.drain(timeout=5)
+        return pool.stats()
+
+    stats = asyncio.run(run())
+    assert stats["failed"] == 1
+    assert stats["lag_max_seconds"] >= 0
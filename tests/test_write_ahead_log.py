@@ -0,0 +1,177 @@
+# tests/test_write_ahead_log.py
+"""
+Tests for the local write-ahead log of verified webhook events.
+"""
+
+import json
+import asyncio
+
+from app.src.wal import WriteAheadLog
+
+
+def test_concurrent_appends_share_group_commits(tmp_path):
+    async def run():
+        wal = WriteAheadLog(tmp_path, fsync=False)
+        await wal.open()
+        seqs = await asyncio.gather(*(wal.append({"event_id": f"evt_{i}"}) for i in range(100)))
+        stats = wal.stats()
+        await wal.close()
+        return seqs, stats
+
+    seqs, stats = asyncio.run(run())
+    assert len(set(seqs)) == 100
+    assert stats["pending"] == 100
+    assert stats["commits"] < 100
+
+
+def test_pending_events_survive_restart(tmp_path):
+    async def first_run():
+        wal = WriteAheadLog(tmp_path, fsync=False)
+        await wal.open()
+        done = await wal.append({"event_id": "evt_done"})
+        await wal.append({"event_id": "evt_pending"})
+        await wal.mark_done(done)
+        await wal.close()
+
+    async def second_run():
+        wal = WriteAheadLog(tmp_path, fsync=False)
+        await wal.open()
+        replayed = []
+
+        async def handler(data):
+            replayed.append(data["event_id"])
+            return True
+
+        await wal.replay(handler, min_age=0)
+        stats = wal.stats()
+        await wal.close()
+        return replayed, stats
+
+    asyncio.run(first_run())
+    replayed, stats = asyncio.run(second_run())
+    assert replayed == ["evt_pending"]
+    assert stats["pending"] == 0
+
+
+def test_failed_replay_stays_pending(tmp_path):
+    async def run():
+        wal = WriteAheadLog(tmp_path, fsync=False)
+        await wal.open()
+        seq = await wal.append({"event_id": "evt_1"})
+        wal.release(seq)
+
+        async def handler(data):
+            return False
+
+        replayed = await wal.replay(handler, min_age=0)
+        stats = wal.stats()
+        await wal.close()
+        return replayed, stats
+
+    replayed, stats = asyncio.run(run())
+    assert replayed == 0
+    assert stats["pending"] == 1
+
+
+def test_in_flight_events_are_not_replayed(tmp_path):
+    async def run():
+        wal = WriteAheadLog(tmp_path, fsync=False)
+        await wal.open()
+        await wal.append({"event_id": "evt_1"})
+
+        async def handler(data):
+            raise AssertionError("claimed event must not be replayed")
+
+        replayed = await wal.replay(handler, min_age=0)
+        await wal.close()
+        return replayed
+
+    assert asyncio.run(run()) == 0
+
+
+def test_compaction_removes_finished_segments(tmp_path):
+    async def run():
+        wal = WriteAheadLog(tmp_path, segment_max_bytes=1, fsync=False)
+        await wal.open()
+        seqs = [await wal.append({"event_id": f"evt_{i}"}) for i in range(3)]
+        for seq in seqs:
+            await wal.mark_done(seq)
+        removed = await wal.compact()
+        await wal.close()
+        return removed, wal.directory
+
+    removed, directory = asyncio.run(run())
+    assert removed > 0
+    assert len(list(directory.glob("*.wal"))) == 1
+
+
+def test_processes_sharing_a_directory_keep_separate_logs(tmp_path):
+    async def run():
+        first = WriteAheadLog(tmp_path, fsync=False)
+        second = WriteAheadLog(tmp_path, fsync=False)
+        await first.open()
+        await second.open()
+        seq = await first.append({"event_id": "evt_1"})
+        first.release(seq)
+
+        async def handler(data):
+            raise AssertionError("another process's event must not be replayed")
+
+        replayed = await second.replay(handler, min_age=0)
+        directories = first.directory, second.directory
+        await first.close()
+        await second.close()
+        return replayed, directories
+
+    replayed, (first, second) = asyncio.run(run())
+    assert replayed == 0
+    assert first != second and first.parent == second.parent == tmp_path
+
+
+def test_resolved_user_replaces_logged_auth_token(tmp_path):
+    async def first_run():
+        wal = WriteAheadLog(tmp_path, fsync=False)
+        await wal.open()
+        seq = await wal.append({"event_id": "evt_1", "user_id": None, "auth_token": "eyJ.id.token"})
+        await wal.record_user(seq, "test_user_123")
+        await wal.close()
+
+    async def second_run():
+        wal = WriteAheadLog(tmp_path, fsync=False)
+        await wal.open()
+        replayed = []
+
+        async def handler(data):
+            replayed.append(data)
+            return True
+
+        await wal.replay(handler, min_age=0)
+        await wal.close()
+        return replayed
+
+    asyncio.run(first_run())
+    assert asyncio.run(second_run()) == [{"event_id": "evt_1", "user_id": "test_user_123", "auth_token": None}]
+
+
+def test_event_is_dead_lettered_after_max_attempts(tmp_path):
+    async def run():
+        wal = WriteAheadLog(tmp_path, max_attempts=3, fsync=False)
+        await wal.open()
+        seq = await wal.append({"event_id": "evt_1"})
+        wal.release(seq)
+
+        async def handler(data):
+            return False
+
+        for _ in range(3):
+            await wal.replay(handler, min_age=0)
+        stats = wal.stats()
+        await wal.close()
+        return stats, wal.directory
+
+    stats, directory = asyncio.run(run())
+    assert stats["pending"] == 0
+    assert stats["dead_lettered"] == 1
+    dead = [json.loads(line) for line in (directory / "dead-letter.jsonl").read_text().splitlines()]
+    assert dead[0]["data"] == {"event_id": "evt_1"}
+    assert dead[0]["attempts"] == 3
@@ -0,0 +1,87 @@
+# tests/test_write_coalescer.py
+"""
+Tests for per-key write coalescing used in front of token balance credits.
+"""
+
+import asyncio
+
+from app.utils.batching import WriteCoalescer
+
+
+def test_writes_for_one_key_are_merged_into_one_flush():
+    flushed = []
+
+    async def flush(key, amounts):
+        flushed.append((key, list(amounts)))
+        return sum(amounts)
+
+    async def run():
+        coalescer = WriteCoalescer(flush, window=0.01, max_batch=100)
+        results = await asyncio.gather(*(coalescer.submit("user_a", 5) for _ in range(10)), coalescer.submit("user_b", 1))
+        return results, coalescer.stats()
+
+    results, stats = asyncio.run(run())
+    assert sorted(flushed) == [("user_a", [5] * 10), ("user_b", [1])]
+    assert results == [50] * 10 + [1]
+    assert stats["flushes"] == 2
+    assert stats["largest_batch"] == 10
+
+
+def test_full_batch_flushes_before_the_window():
+    flushes = []
+
+    async def flush(key, amounts):
+        flushes.append(len(amounts))
+
+    async def run():
+        coalescer = WriteCoalescer(flush, window=60, max_batch=3)
+        await asyncio.wait_for(asyncio.gather(*(coalescer.submit("user_a", 1) for _ in range(3))), timeout=1)
+
+    asyncio.run(run())
+    assert flushes == [3]
+
+
+def test_failed_flush_is_reported_to_every_waiter():
+    async def flush(key, amounts):
+        raise RuntimeError("database unavailable")
+
+    async def run():
+        coalescer = WriteCoalescer(flush, window=0.005)
+        results = await asyncio.gather(*(coalescer.submit("user_a", 1) for _ in range(3)), return_exceptions=True)
+        return results, coalescer.stats()
+
+    results, stats = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert stats["failed"] == 1
+
+
+def test_zero_window_writes_immediately():
+    flushes = []
+
+    async def flush(key, amounts):
+        flushes.append(amounts)
+        return amounts[0]
+
+    async def run():
+        coalescer = WriteCoalescer(flush, window=0)
+        return await asyncio.gather(coalescer.submit("user_a", 1), coalescer.submit("user_a", 2))
+
+    assert asyncio.run(run()) == [1, 2]
+    assert flushes == [[1], [2]]
+
+
+def test_flush_all_writes_open_batches():
+    flushed = []
+
+    async def flush(key, amounts):
+        flushed.append(amounts)
+
+    async def run():
+        coalescer = WriteCoalescer(flush, window=60)
+        waiter = asyncio.create_task(coalescer.submit("user_a", 1))
+        await asyncio.sleep(0)
+        await coalescer.flush_all()
+        await waiter
+
+    asyncio.run(run())
+    assert flushed == [[1]]